@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from core.db import set_sqlite_pragmas
+        from core.metrics import install_query_metrics
+        from core.slowlog import install_slow_query_log
+
+        connection_created.connect(set_sqlite_pragmas, dispatch_uid='core_sqlite_pragmas')
+        connection_created.connect(install_query_metrics, dispatch_uid='core_query_metrics')
+        connection_created.connect(install_slow_query_log, dispatch_uid='core_slow_query_log')
@@ -0,0 +1,238 @@
+from django.http import JsonResponse, HttpResponse
+
+from asgiref.sync import sync_to_async
+
+from ninja import NinjaAPI
+
+from core.models import Part
+from core.search import SearchResult, fts_query, search_queryset, parameter_search
+from core.cache import cached_response
+from core.conditional import async_conditional_part, async_conditional_catalog
+from core.serializers import part_rows, row_encoder, parse_fields
+from core.counts import acached_count, count_mode, COUNT_NONE
+from core.export import aexport_stream
+from core.paging import apaginate_queryset, apaginate_without_count, page_size_or_default
+from core.responses import (
+    PAGE_SIZE, error_response, invalid_search_response, invalid_fields_response,
+    invalid_cursor_response, invalid_list_params_response, invalid_words_params_response, invalid_export_format_response, no_words_response,
+    page_data, page_dict, acursor_data, json_response, search_page_response, export_response, common_words, words_params, part_words_response,
+)
+from core.views import PartSchema, create_part, update_part_by_sku, delete_part_by_sku
+from core.writer import awrite
+
+from urllib.parse import quote
+
+import json
+import traceback
+import logging
+
+# The async API (settings.API_MODE = 'async', served by an ASGI server)
+# It has the same paths of core.views.api; the paths not declared here
+# (docs, bulk, skus, filter, facets) are served by the sync API
+api = NinjaAPI(
+    title = 'Parts Unlimited Project (async)',
+    description =  'API DEMO - Parts Unlimited',
+    urls_namespace = 'api_async',
+    docs_url = None,
+    openapi_url = None,
+)
+
+async def apage_data(queryset, url, page=1, page_size=None, fields=None, count=None, count_key=None):
+    '''
+    The async version of core.responses.page_data (Django's async ORM)
+    The full-text search results are paginated in a thread (raw SQL on the FTS5 table, not querysets)
+    '''
+    if isinstance(queryset, SearchResult):
+        return await sync_to_async(page_data)(queryset, url, page, page_size, fields, count, count_key)
+    _fields = parse_fields(fields)
+    mode = count_mode(count)
+    pg_size = page_size_or_default(page_size, PAGE_SIZE)
+    rows = part_rows(queryset, _fields)
+    if mode == COUNT_NONE:
+        items, has_next = await apaginate_without_count(rows, page, pg_size)
+        data = page_dict(items, None, url, page, page_size, fields, count, has_next)
+        return data, None, _fields
+
+    total = await acached_count(queryset, count_key, mode) if count_key else None
+    items, pages, total = await apaginate_queryset(rows, page, pg_size, total)
+    data = page_dict(items, pages, url, page, page_size, fields, count)
+    return data, total, _fields
+
+@api.get('/parts')
+@async_conditional_catalog
+@cached_response()
+async def parts(request, page=1, page_size:int = None, cursor:str = None, fields:str = None, count:str = None):
+    parts = Part.objects.all()
+    invalid = invalid_list_params_response(fields, count)
+    if invalid:
+        return invalid
+
+    if cursor is not None:
+        try:
+            data, _fields = await acursor_data(parts, cursor, page_size, fields)
+        except ValueError:
+            return invalid_cursor_response()
+        return json_response(data, _fields)
+
+    data, _, _fields = await apage_data(parts, '/api/parts', page, page_size, fields, count, count_key='parts')
+    response = json_response(data, _fields)
+    return response
+
+@api.get('/part/sku={sku}')
+@async_conditional_part
+@cached_response(sku_arg='sku')
+async def parts_by_sku(request, sku, fields:str = None):
+    response = HttpResponse()
+    try:
+        _fields = parse_fields(fields)
+        row = await part_rows(Part.objects.filter(sku=sku), _fields).afirst()
+        if row is None:
+            raise Part.DoesNotExist()
+        response = HttpResponse(row_encoder(_fields)(row), content_type='application/json')
+    except ValueError:
+        response = invalid_fields_response()
+    except Part.DoesNotExist:
+        response.status_code = 404
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+
+    return response
+
+@api.get('/parts/param={param}/value={value}')
+@async_conditional_catalog
+@cached_response()
+async def parts_by_parameters(request, param, value, page=1, page_size:int = None, cursor:str = None, fields:str = None, count:str = None):
+    response = HttpResponse()
+    url = '/api/parts/param={param}/value={value}'.format(param=param, value=value)
+    try:
+        invalid = invalid_search_response(param, value)
+        if invalid:
+            return invalid
+        parts = parameter_search(param, value, cursor)
+        invalid = invalid_list_params_response(fields, count)
+        if invalid:
+            return invalid
+
+        if cursor is not None:
+            try:
+                data, _fields = await acursor_data(parts, cursor, page_size, fields)
+            except ValueError:
+                return invalid_cursor_response()
+            return json_response(data, _fields)
+
+        count_key = 'param:{param}={value}'.format(param=param, value=value)
+        data, total, _fields = await apage_data(parts, url, page, page_size, fields, count, count_key)
+        return search_page_response(data, total, _fields)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.get('/parts/search')
+@async_conditional_catalog
+@cached_response()
+async def search_parts(request, q:str, page=1, page_size:int = None, fields:str = None, count:str = None):
+    '''
+    Full-text search on the parts names and descriptions, ordered by relevance
+    '''
+    response = HttpResponse()
+    try:
+        expression = fts_query(q)
+        if not expression:
+            return no_words_response()
+        invalid = invalid_list_params_response(fields, count)
+        if invalid:
+            return invalid
+
+        url = '/api/parts/search?q=' + quote(q)
+        data, _, _fields = await apage_data(SearchResult(expression), url, page, page_size, fields, count, 'search:' + q)
+        response = json_response(data, _fields)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.get('/parts/export')
+async def export_parts(request, format:str = 'ndjson', param:str = None, value:str = None):
+    '''
+    Streams the whole catalog (or the parts found by param/value) as NDJSON or CSV
+    The blocks come from an async generator: the ASGI handler reads a sync iterator whole before sending it
+    '''
+    invalid = invalid_export_format_response(format)
+    if invalid:
+        return invalid
+    invalid = invalid_search_response(param, value)
+    if invalid:
+        return invalid
+    parts = search_queryset(param, value)
+    return export_response(aexport_stream(parts, format), format)
+
+@api.post('/part/new')
+async def new_part(request, part: PartSchema):
+    response = HttpResponse()
+    try:
+        data = json.loads(request.body)
+        # the mutations are run as in the sync views (batched by the group commit writer when WRITE_COALESCING is on)
+        response = JsonResponse(data=await awrite(create_part, data), safe=False)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response = error_response(_exception)
+    return response
+
+@api.put('/part/sku={sku}')
+async def update_part(request, sku, part:PartSchema):
+    response = HttpResponse()
+    try:
+        data = json.loads(request.body)
+        response = JsonResponse(data=await awrite(update_part_by_sku, sku, data), safe=False)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response = error_response(_exception)
+    return response
+
+@api.delete('/part/sku={sku}')
+async def delete_part(request, sku):
+    response = HttpResponse()
+    try:
+        response = JsonResponse(data=await awrite(delete_part_by_sku, sku))
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+    return response
+
+@api.get('/parts/mostcommonwords')
+@async_conditional_catalog
+@cached_response()
+async def most_common_words(request, min_size:str = None, limit:str = None):
+    '''
+    Return the most common words in all parts
+    '''
+    try:
+        min_size, limit = words_params(min_size, limit)
+    except ValueError:
+        return invalid_words_params_response()
+    res = {}
+    async for k, v in common_words(min_size, limit):
+        res[k] = v
+    response = JsonResponse(data=res)
+    return response
+
+@api.get('part/sku={sku}/mostcommonwords')
+@async_conditional_part
+@cached_response(sku_arg='sku')
+async def most_commom_words_by_part(request, sku, min_size:str = None, limit:str = None):
+    '''
+    Return the most common words in a especific part description
+    '''
+    try:
+        min_size, limit = words_params(min_size, limit)
+    except ValueError:
+        return invalid_words_params_response()
+    part = await Part.objects.filter(sku=sku).afirst()
+    return part_words_response(part, sku, min_size, limit)
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Part
+from core.errors import error_dict
+from core.words import update_word_counts
+from core.cache import invalidate_parts
+from core.serializers import part_rows, PART_FIELDS
+
+BATCH_SIZE = getattr(settings, 'BULK_BATCH_SIZE', 500)
+UPSERT_FIELDS = ('name', 'description', 'weight_ounces', 'is_active')
+
+def item_error(index:int, item:dict, _error:dict) -> dict:
+    '''
+    Returns the error of an item of a batch: the {error, field} structure with the item index and sku
+    '''
+    return dict(_error, index=index, sku=item.get('sku'))
+
+def existent_skus(skus:list, batch_size:int = None) -> set:
+    '''
+    Returns the skus (of a list) that already exist on database; one IN query per batch
+    '''
+    b_size = batch_size if batch_size else BATCH_SIZE
+    skus = list(skus)
+    existent = set()
+    for start in range(0, len(skus), b_size):
+        existent.update(
+            Part.objects.filter(sku__in=skus[start:start + b_size]).values_list('sku', flat=True)
+        )
+    return existent
+
+def parts_by_skus(skus:list, batch_size:int = None, rows:bool = False, fields:tuple = PART_FIELDS) -> dict:
+    '''
+    Returns a dict {sku: part} of the parts found; one IN query (on the sku unique index) per batch
+    If rows, the parts are rows (tuples) of the fields instead of model instances
+    '''
+    b_size = batch_size if batch_size else BATCH_SIZE
+    skus = list(dict.fromkeys(skus))
+    parts = {}
+    for start in range(0, len(skus), b_size):
+        batch = skus[start:start + b_size]
+        if not rows:
+            parts.update(Part.objects.in_bulk(batch, field_name='sku'))
+            continue
+        queryset = Part.objects.filter(sku__in=batch).order_by()
+        parts.update(
+            (row[0], row[1:]) for row in part_rows(queryset, ('sku', ) + tuple(fields))
+        )
+    return parts
+
+def build_parts(items:list) -> tuple:
+    '''
+    Returns the valid parts of a list of dicts and the errors of the invalid ones
+    The parts are validated with the same rules of Part.save
+    '''
+    parts, errors, seen = [], [], set()
+    for index, item in enumerate(items):
+        try:
+            if item.get('sku') in seen:
+                raise Exception('Part sku is repeated in the batch')
+            part = Part(**item)
+            part.validate()
+        except Exception as _exception:
+            errors.append(item_error(index, item, error_dict(_exception)))
+            continue
+        seen.add(part.sku)
+        parts.append((index, part))
+    return parts, errors
+
+def create_parts(items:list, batch_size:int = None) -> tuple:
+    '''
+    Creates the parts of a list of dicts
+    The skus are checked with IN queries, the parts are validated in memory
+    and inserted with bulk_create in a single transaction.
+    Returns the created parts and the errors per item ({index, sku, error, field})
+    '''
+    b_size = batch_size if batch_size else BATCH_SIZE
+    parts, errors = build_parts(items)
+    existent = existent_skus([part.sku for _, part in parts], b_size)
+    new_parts = []
+    for index, part in parts:
+        if part.sku in existent:
+            errors.append(item_error(index, items[index], {'error': 'Part sku already exists', 'field': 'sku'}))
+            continue
+        new_parts.append(part)
+
+    with transaction.atomic():
+        created = Part.objects.bulk_create(new_parts, batch_size=b_size)
+        update_word_counts([], [part.description for part in created])
+        invalidate_parts([part.sku for part in created])
+    errors.sort(key=lambda e: e['index'])
+    return created, errors
+
+def upsert_parts(items:list, batch_size:int = None) -> tuple:
+    '''
+    Creates or updates (by sku) the parts of a list of dicts
+    Each batch costs one IN query and at most one bulk_create and one bulk_update, in a transaction.
+    Only the fields sent in the items are compared; the unchanged parts are not written
+    and the updated ones have the updated_at refreshed.
+    Returns the counts of created, updated and unchanged parts and the errors per item
+    '''
+    b_size = batch_size if batch_size else BATCH_SIZE
+    parts, errors = build_parts(items)
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    for start in range(0, len(parts), b_size):
+        batch = parts[start:start + b_size]
+        existent = Part.objects.in_bulk([part.sku for _, part in batch], field_name='sku')
+        now = timezone.now()
+        to_create, to_update, old_descriptions = [], [], []
+        for index, part in batch:
+            current = existent.get(part.sku)
+            if current is None:
+                to_create.append(part)
+                continue
+            fields = [f for f in UPSERT_FIELDS if f in items[index]]
+            changed = [f for f in fields if getattr(current, f) != getattr(part, f)]
+            if not changed:
+                counts['unchanged'] += 1
+                continue
+            old_descriptions.append(current.description)
+            for f in changed:
+                setattr(current, f, getattr(part, f))
+            current.updated_at = now
+            to_update.append(current)
+
+        with transaction.atomic():
+            Part.objects.bulk_create(to_create, batch_size=b_size)
+            Part.objects.bulk_update(to_update, UPSERT_FIELDS + ('updated_at', ), batch_size=b_size)
+            update_word_counts(
+                old_descriptions,
+                [part.description for part in to_create] + [part.description for part in to_update]
+            )
+            if to_create or to_update:
+                invalidate_parts([part.sku for part in to_create] + [part.sku for part in to_update])
+        counts['created'] += len(to_create)
+        counts['updated'] += len(to_update)
+    return counts, errors
@@ -0,0 +1,177 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from asgiref.sync import sync_to_async
+
+from core.metrics import metrics
+
+from contextlib import contextmanager
+from functools import wraps
+
+import asyncio
+import threading
+import uuid
+
+CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+# the cache of the generations (not culled with the responses; the responses cache if not configured)
+GENERATION_CACHE_ALIAS = getattr(settings, 'GENERATION_CACHE_ALIAS', 'generations')
+KEY_PREFIX = 'parts'
+CATALOG_GENERATION_KEY = KEY_PREFIX + ':generation'
+SKU_GENERATION_KEY = KEY_PREFIX + ':generation:sku:{sku}'
+
+def response_cache():
+    return caches[CACHE_ALIAS]
+
+def generation_cache():
+    if GENERATION_CACHE_ALIAS not in settings.CACHES:
+        return response_cache()
+    return caches[GENERATION_CACHE_ALIAS]
+
+def new_generation() -> str:
+    # a new random value (instead of an increment) never collides with concurrent writers
+    return uuid.uuid4().hex
+
+def generation(key:str) -> str:
+    '''
+    Returns the current generation of a key, creating it if needed
+    '''
+    cache = generation_cache()
+    value = cache.get(key)
+    if value is None:
+        value = new_generation()
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key) or value
+    return value
+
+async def ageneration(key:str) -> str:
+    '''
+    The async version of generation (the cache's async API)
+    '''
+    cache = generation_cache()
+    value = await cache.aget(key)
+    if value is None:
+        value = new_generation()
+        if not await cache.aadd(key, value, timeout=None):
+            value = await cache.aget(key) or value
+    return value
+
+def catalog_generation() -> str:
+    '''
+    Returns the generation of the catalog; it changes on any part's write
+    '''
+    return generation(CATALOG_GENERATION_KEY)
+
+async def acatalog_generation() -> str:
+    return await ageneration(CATALOG_GENERATION_KEY)
+
+def sku_generation(sku:str) -> str:
+    '''
+    Returns the generation of a part; it changes on the writes of the part
+    '''
+    return generation(SKU_GENERATION_KEY.format(sku=sku))
+
+def bump_generations(skus:list):
+    # the part's generations are deleted: the next read creates a new one (as a bump does), and a delete
+    # is much cheaper than a write for the file based cache (eg.: the thousands of skus of an import)
+    generation_cache().set(CATALOG_GENERATION_KEY, new_generation(), timeout=None)
+    generation_cache().delete_many([SKU_GENERATION_KEY.format(sku=sku) for sku in set(skus)])
+
+# the invalidations collected by deferred_invalidation (by thread)
+_deferred = threading.local()
+
+def invalidate_parts(skus:list):
+    '''
+    Invalidates the cached responses of the catalog (lists, searches, words) and of the parts with the skus
+    It is done now and again after the transaction commits, so the readers can not cache
+    the data read before the commit under the new generation
+    '''
+    skus = [sku for sku in skus if sku]
+    deferred = getattr(_deferred, 'skus', None)
+    if deferred is not None:
+        deferred.update(skus)
+        return
+    bump_generations(skus)
+    transaction.on_commit(lambda: bump_generations(skus))
+
+@contextmanager
+def deferred_invalidation():
+    '''
+    Collects the invalidations of a block (eg.: a batch of writes in one transaction)
+    and does them once at its end; the block must contain the whole transaction
+    '''
+    _deferred.skus = set()
+    try:
+        yield
+    finally:
+        skus, _deferred.skus = _deferred.skus, None
+        if skus:
+            bump_generations(skus)
+
+def request_key(request) -> str:
+    query = '&'.join(
+        '{k}={v}'.format(k=k, v=v) for k, values in sorted(request.GET.lists()) for v in values
+    )
+    return request.path + '?' + query
+
+def cached_lookup(request, kwargs, sku_arg:str = None) -> tuple:
+    '''
+    Returns the cache key of a request and the cached response (or None)
+    '''
+    if sku_arg:
+        _generation = sku_generation(kwargs.get(sku_arg))
+    else:
+        _generation = catalog_generation()
+    key = KEY_PREFIX + ':response:' + _generation + ':' + request_key(request)
+    cached = response_cache().get(key)
+    if cached is None:
+        metrics.observe_cache('miss')
+        return key, None
+
+    metrics.observe_cache('hit')
+    status, content_type, content = cached
+    response = HttpResponse(content, status=status, content_type=content_type)
+    response['X-Cache'] = 'HIT'
+    return key, response
+
+def cache_store(key:str, response):
+    if response.status_code == 200 and not response.streaming:
+        response_cache().set(key, (response.status_code, response['Content-Type'], response.content), CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+
+def cache_enabled(request) -> bool:
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True) and request.method == 'GET'
+
+def cached_response(sku_arg:str = None):
+    '''
+    Caches the successful responses of a GET view by path and query parameters
+    The entries of the views with a sku_arg are invalidated by the writes of that part,
+    the others by any part's write.
+    The responses have the X-Cache header (HIT or MISS). It works with sync and async views
+    '''
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not cache_enabled(request):
+                    return await view(request, *args, **kwargs)
+                key, response = await sync_to_async(cached_lookup)(request, kwargs, sku_arg)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    await sync_to_async(cache_store)(key, response)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not cache_enabled(request):
+                return view(request, *args, **kwargs)
+            key, response = cached_lookup(request, kwargs, sku_arg)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                cache_store(key, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from asgiref.sync import sync_to_async
+
+from calendar import timegm
+from functools import wraps
+
+from core.cache import catalog_generation, sku_generation
+from core.models import Part
+
+def part_version(request, sku:str):
+    '''
+    Returns the (id, last modification) of a part, or None if it does not exist
+    Only these columns are read (no model instance); the value is kept in the request
+    '''
+    versions = request.__dict__.setdefault('_part_versions', {})
+    if sku not in versions:
+        row = Part.objects.filter(sku=sku).order_by().values_list('id', 'created_at', 'updated_at').first()
+        versions[sku] = (row[0], row[2] or row[1]) if row else None
+    return versions[sku]
+
+def part_etag(request, sku, *args, **kwargs):
+    version = part_version(request, sku)
+    if version is None:
+        return None
+    _id, modified_at = version
+    # the sku generation also changes on the writes that do not touch updated_at
+    return '"part-{id}-{modified}-{generation}"'.format(
+        id=_id, modified=modified_at.timestamp(), generation=sku_generation(sku)
+    )
+
+def part_last_modified(request, sku, *args, **kwargs):
+    version = part_version(request, sku)
+    return version[1] if version else None
+
+def catalog_etag(request, *args, **kwargs):
+    # the catalog generation changes on any part's write (see core.cache)
+    return '"catalog-{generation}"'.format(generation=catalog_generation())
+
+# Conditional GET (If-None-Match/If-Modified-Since) decorators
+conditional_part = condition(etag_func=part_etag, last_modified_func=part_last_modified)
+conditional_catalog = condition(etag_func=catalog_etag)
+
+def async_condition(etag_func=None, last_modified_func=None):
+    '''
+    The async version of django.views.decorators.http.condition
+    The validators are computed in a thread (they may query the database)
+    '''
+    def decorator(view):
+        def validators(request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag else None
+            last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+            last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+            return etag, last_modified
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+async_conditional_part = async_condition(etag_func=part_etag, last_modified_func=part_last_modified)
+async_conditional_catalog = async_condition(etag_func=catalog_etag)
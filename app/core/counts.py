@@ -0,0 +1,86 @@
+from django.conf import settings
+
+from core.cache import response_cache, catalog_generation, acatalog_generation, KEY_PREFIX
+
+import hashlib
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+COUNT_MODE_DEFAULT = getattr(settings, 'COUNT_MODE_DEFAULT', COUNT_EXACT)
+COUNT_CACHE_TIMEOUT = getattr(settings, 'COUNT_CACHE_TIMEOUT', 3600)
+# how long a count can be used by the estimate mode after it was computed
+COUNT_ESTIMATE_TIMEOUT = getattr(settings, 'COUNT_ESTIMATE_TIMEOUT', 300)
+
+def count_mode(mode:str = None) -> str:
+    '''
+    Returns a valid count mode (COUNT_MODE_DEFAULT if not defined)
+    Raises ValueError if the mode is not valid
+    '''
+    if not mode:
+        return COUNT_MODE_DEFAULT
+    if mode not in COUNT_MODES:
+        raise ValueError(mode)
+    return mode
+
+def count_key(filter_key:str) -> str:
+    return hashlib.md5(filter_key.encode()).hexdigest()
+
+def estimate_count_key(filter_key:str) -> str:
+    return KEY_PREFIX + ':count:estimate:' + count_key(filter_key)
+
+def exact_count_key(filter_key:str, generation:str) -> str:
+    return KEY_PREFIX + ':count:' + generation + ':' + count_key(filter_key)
+
+def cached_count(queryset, filter_key:str, mode:str = COUNT_EXACT):
+    '''
+    Returns the count of a queryset (or a SearchResult) by a key of its filter (eg.: 'param:name=Part')
+    The exact counts are cached by the catalog generation, so any part's write invalidates them;
+    the estimate mode uses the last count of the filter (up to COUNT_ESTIMATE_TIMEOUT old), even after writes.
+    Returns None in the none mode
+    '''
+    if mode == COUNT_NONE:
+        return None
+    if not getattr(settings, 'COUNT_CACHE_ENABLED', True):
+        return queryset.count()
+
+    cache = response_cache()
+    estimate_key = estimate_count_key(filter_key)
+    if mode == COUNT_ESTIMATE:
+        count = cache.get(estimate_key)
+        if count is not None:
+            return count
+
+    exact_key = exact_count_key(filter_key, catalog_generation())
+    count = cache.get(exact_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(exact_key, count, COUNT_CACHE_TIMEOUT)
+        cache.set(estimate_key, count, COUNT_ESTIMATE_TIMEOUT)
+    return count
+
+async def acached_count(queryset, filter_key:str, mode:str = COUNT_EXACT):
+    '''
+    The async version of cached_count, for querysets (the async ORM and the cache's async API)
+    '''
+    if mode == COUNT_NONE:
+        return None
+    if not getattr(settings, 'COUNT_CACHE_ENABLED', True):
+        return await queryset.acount()
+
+    cache = response_cache()
+    estimate_key = estimate_count_key(filter_key)
+    if mode == COUNT_ESTIMATE:
+        count = await cache.aget(estimate_key)
+        if count is not None:
+            return count
+
+    exact_key = exact_count_key(filter_key, await acatalog_generation())
+    count = await cache.aget(exact_key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(exact_key, count, COUNT_CACHE_TIMEOUT)
+        await cache.aset(estimate_key, count, COUNT_ESTIMATE_TIMEOUT)
+    return count
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db.models.sql.datastructures import BaseTable
+
+import re
+
+# The pragmas that can be set by settings.SQLITE_PRAGMAS
+SQLITE_PRAGMA_NAMES = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+def pragma_statements(pragmas:dict) -> list:
+    '''
+    Returns the PRAGMA statements of a {name: value} dict
+    Raises ValueError if a name or a value is not valid
+    '''
+    statements = []
+    for name, value in pragmas.items():
+        if name not in SQLITE_PRAGMA_NAMES or not PRAGMA_VALUE.match(str(value)):
+            raise ValueError('Invalid SQLite pragma: {name} = {value}'.format(name=name, value=value))
+        statements.append('PRAGMA {name} = {value}'.format(name=name, value=value))
+    return statements
+
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    '''
+    connection_created receiver: sets the settings.SQLITE_PRAGMAS on each new SQLite connection
+    '''
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
+
+class IndexedTable(BaseTable):
+    '''
+    The table of a query read through an index: FROM table INDEXED BY index
+    SQLite fails the query if the index can not be used, instead of choosing another one
+    (the other databases read the table as usual)
+    '''
+    def __init__(self, table_name, alias, index):
+        super().__init__(table_name, alias)
+        self.index = index
+
+    def as_sqlite(self, compiler, connection):
+        sql, params = self.as_sql(compiler, connection)
+        return sql + ' INDEXED BY ' + connection.ops.quote_name(self.index), params
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(self.table_name, change_map.get(self.table_alias, self.table_alias), self.index)
+
+    @property
+    def identity(self):
+        return self.__class__, self.table_name, self.table_alias, self.index
+
+def indexed_by(queryset, index:str):
+    '''
+    Returns the queryset reading its table through an index (see IndexedTable)
+    '''
+    queryset = queryset.all()
+    alias = queryset.query.get_initial_alias()
+    table = queryset.query.alias_map[alias]
+    queryset.query.alias_map[alias] = IndexedTable(table.table_name, table.table_alias, index)
+    return queryset
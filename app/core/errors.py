@@ -0,0 +1,21 @@
+ERROR_FIELDS = ('name', 'weight_ounces', 'description', 'sku')
+
+def error_field(error:str) -> str:
+    '''
+    Returns the Part's field related to an error message (or '' if there is none)
+    '''
+    _error = error.lower()
+    for field in ERROR_FIELDS:
+        if field in _error:
+            return field
+    return ''
+
+def error_dict(_exception) -> dict:
+    '''
+    Returns the {error, field} structure of an exception
+    '''
+    _error = str(_exception).lower()
+    return {
+        'error': _error,
+        'field': error_field(_error)
+    }
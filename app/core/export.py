@@ -0,0 +1,90 @@
+from django.conf import settings
+
+from asgiref.sync import sync_to_async
+
+from core.serializers import PART_FIELDS, part_rows, row_encoder, row_dict
+
+from itertools import islice
+
+import csv
+
+EXPORT_FIELDS = PART_FIELDS
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+LINES_PER_WRITE = 500
+
+class Echo:
+    '''
+    A file-like object that just returns what is written (used by csv.writer)
+    '''
+    def write(self, value):
+        return value
+
+def export_rows(queryset, chunk_size:int = None):
+    '''
+    Yields the parts of the queryset as rows (tuples of the EXPORT_FIELDS)
+    The rows are read in chunks, so the memory is constant for any catalog size
+    '''
+    rows = part_rows(queryset.order_by('id'), EXPORT_FIELDS)
+    return rows.iterator(chunk_size=chunk_size or CHUNK_SIZE)
+
+async def aexport_rows(queryset, chunk_size:int = None):
+    '''
+    The async version of export_rows: each chunk is read in a thread
+    (QuerySet.aiterator runs the values_list queries in the event loop on Django 4.2)
+    '''
+    size = chunk_size or CHUNK_SIZE
+    rows = export_rows(queryset, size)
+    read_chunk = sync_to_async(lambda: list(islice(rows, size)))
+    while True:
+        chunk = await read_chunk()
+        if not chunk:
+            return
+        for row in chunk:
+            yield row
+
+def export_encoder(export_format:str) -> tuple:
+    '''
+    Returns the header of a format ('' if it has none) and the function that encodes a row as a line
+    '''
+    if export_format == 'ndjson':
+        encode = row_encoder(EXPORT_FIELDS)
+        return '', lambda row: encode(row) + '\n'
+    writer = csv.writer(Echo())
+    def encode_csv(row):
+        part = row_dict(row, EXPORT_FIELDS)
+        return writer.writerow([part[f] for f in EXPORT_FIELDS])
+    return writer.writerow(EXPORT_FIELDS), encode_csv
+
+def export_stream(queryset, export_format:str, chunk_size:int = None):
+    '''
+    Yields the encoded export of the queryset
+    The lines are grouped in small blocks; the first block is sent as soon as it is ready
+    '''
+    header, encode = export_encoder(export_format)
+    block = [header] if header else []
+    for row in export_rows(queryset, chunk_size):
+        block.append(encode(row))
+        if len(block) >= LINES_PER_WRITE:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+async def aexport_stream(queryset, export_format:str, chunk_size:int = None):
+    '''
+    The async version of export_stream, for the ASGI server: a sync iterator would be read
+    whole (into memory) before the response is sent
+    '''
+    header, encode = export_encoder(export_format)
+    block = [header] if header else []
+    async for row in aexport_rows(queryset, chunk_size):
+        block.append(encode(row))
+        if len(block) >= LINES_PER_WRITE:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
@@ -0,0 +1,85 @@
+from django.db.models import CharField, Count
+from django.db.models.functions import Substr
+
+from bisect import bisect_right
+
+# Faceted counts of the parts (see /api/parts/facets)
+# Each facet is one GROUP BY query on an index: is_active (core_part_active_idx),
+# weight_ounces (core_part_weight_name_idx) and the day of creation (core_part_created_day_idx);
+# the weight buckets and the months/years are summed from those few groups
+WEIGHT_BUCKETS_DEFAULT = '0,5,10,20,50,100,200,500'
+MAX_WEIGHT_BUCKETS = 50
+CREATED_INTERVALS = {
+    'day': 10, # the length of the date prefix (YYYY-MM-DD)
+    'month': 7,
+    'year': 4,
+}
+
+def weight_edges(buckets:str) -> list:
+    '''
+    Returns the edges of a comma separated list of weights in ascending order (eg.: "0,10,20")
+    Raises ValueError if it is not valid
+    '''
+    edges = [int(edge) for edge in (buckets or WEIGHT_BUCKETS_DEFAULT).split(',')]
+    if not 0 < len(edges) <= MAX_WEIGHT_BUCKETS or any(a >= b for a, b in zip(edges, edges[1:])) or edges[0] < 0:
+        raise ValueError(buckets)
+    return edges
+
+def created_interval(interval:str) -> str:
+    '''
+    Returns the interval of the creation dates buckets; raises ValueError if it is not valid
+    '''
+    interval = interval or 'day'
+    if interval not in CREATED_INTERVALS:
+        raise ValueError(interval)
+    return interval
+
+def active_counts(queryset) -> dict:
+    '''
+    Returns the number of parts by is_active
+    '''
+    rows = queryset.order_by().values_list('is_active').annotate(count=Count('id'))
+    return {str(is_active): count for is_active, count in rows}
+
+def weight_histogram(queryset, edges:list) -> list:
+    '''
+    Returns the number of parts by weight bucket: from an edge (included) to the next one (excluded);
+    the last bucket has no end. The weights below the first edge are not counted
+    '''
+    buckets = [{'from': edge, 'to': end, 'count': 0} for edge, end in zip(edges, edges[1:] + [None])]
+    rows = queryset.order_by().values_list('weight_ounces').annotate(count=Count('id'))
+    for weight, count in rows:
+        index = bisect_right(edges, weight) - 1
+        if index >= 0:
+            buckets[index]['count'] += count
+    return buckets
+
+def created_histogram(queryset, interval:str) -> list:
+    '''
+    Returns the number of parts created by day, month or year (UTC), in ascending order; the dates without parts are omitted
+    '''
+    size = CREATED_INTERVALS[interval]
+    rows = queryset.order_by().annotate(
+        day=Substr('created_at', 1, 10, output_field=CharField())
+    ).values_list('day').annotate(count=Count('id')).order_by('day')
+    buckets = []
+    for day, count in rows:
+        date = day[:size]
+        if buckets and buckets[-1]['date'] == date:
+            buckets[-1]['count'] += count
+        else:
+            buckets.append({'date': date, 'count': count})
+    return buckets
+
+def facets(queryset, edges:list, interval:str) -> dict:
+    '''
+    Returns the facets of the parts of a queryset: the total, the counts by is_active,
+    the weight histogram and the creation dates histogram
+    '''
+    active = active_counts(queryset)
+    return {
+        'count': sum(active.values()),
+        'is_active': active,
+        'weight_ounces': weight_histogram(queryset, edges),
+        'created_at': created_histogram(queryset, interval),
+    }
@@ -0,0 +1,171 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.db import indexed_by
+
+from datetime import datetime, time, timezone as datetime_timezone
+
+# Multi-predicate filters of the parts (see /api/parts/filter), eg.: ?is_active=1&weight_ounces__gte=10&name__prefix=Heavy
+# Only the fields and lookups of FILTER_LOOKUPS are accepted, and all of them are compiled to one query read
+# through the index of the ordering (see ORDER_INDEXES); the prefixes are ranges (name >= 'Heavy' AND name < 'Heavz'), as LIKE does not use
+# the indexes in SQLite (so the prefixes are case sensitive)
+FILTER_LOOKUPS = {
+    'weight_ounces': ('exact', 'gte', 'gt', 'lte', 'lt'),
+    'created_at': ('gte', 'gt', 'lte', 'lt'),
+    'updated_at': ('gte', 'gt', 'lte', 'lt'),
+    'is_active': ('exact', ),
+    'name': ('exact', 'prefix'),
+    'sku': ('exact', 'prefix'),
+}
+INTEGER_FIELDS = ('weight_ounces', 'is_active')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+# the orderings of an index (the id is the tie-breaker of the cursors, see core.paging.cursor_ordering);
+# the descending ones end with -id, so the index (and its rowid) is read backwards without a sort
+ORDER_BY = {
+    'name': ('name', '-created_at'),
+    '-name': ('-name', 'created_at', '-id'),
+    'weight_ounces': ('weight_ounces', 'name', '-created_at'),
+    '-weight_ounces': ('-weight_ounces', '-name', 'created_at', '-id'),
+    'sku': ('sku', ),
+    '-sku': ('-sku', '-id'),
+    'created_at': ('created_at', ),
+    '-created_at': ('-created_at', '-id'),
+    'updated_at': ('updated_at', ),
+    '-updated_at': ('-updated_at', '-id'),
+}
+
+# The index strategy: the parts are read through the index of the ordering, named to SQLite (INDEXED BY, see
+# core.db.IndexedTable), so they come in order (no sort) and a page stops after its rows.
+# The indexes of each ordering field, with the fields they seek by equality before it, the most specific first
+# (eg.: weight_ounces=10&order_by=name reads core_part_weight_name_idx from weight_ounces=10, in the name order).
+# An ordering is accepted when its index seeks one of the filters (the ordering field or an equality field):
+# the other filters are checked on the rows of that range; otherwise the parts of the filters would be read
+# from the whole index (eg.: created_at__gte with order_by=weight_ounces) and the ordering is rejected
+ORDER_INDEXES = {
+    'name': (('core_part_weight_name_idx', ('weight_ounces', )), ('core_part_name_created_idx', ())),
+    'weight_ounces': (('core_part_weight_name_idx', ()), ),
+    'sku': (('sqlite_autoindex_core_part_1', ()), ), # the unique sku index
+    'created_at': (('core_part_created_idx', ()), ),
+    'updated_at': (('core_part_updated_idx', ()), ),
+}
+# is_active has only two values, so seeking it does not narrow the parts (core_part_active_idx serves the facets);
+# it is always checked on the rows read from the index of the ordering, and it needs no index to be accepted
+RESIDUAL_FIELDS = ('is_active', )
+
+def filter_choices() -> str:
+    return ', '.join(
+        field + ' (' + ', '.join(lookups) + ')' for field, lookups in FILTER_LOOKUPS.items()
+    )
+
+def filter_value(field:str, value:str):
+    '''
+    Returns the value of a filter converted to the field type; raises ValueError if it is not valid
+    The dates are the start of the day and the datetimes without timezone are in UTC
+    '''
+    if field in INTEGER_FIELDS:
+        return int(value)
+    if field in DATETIME_FIELDS:
+        _datetime = parse_datetime(value)
+        if _datetime is None:
+            _date = parse_date(value)
+            if _date is None:
+                raise ValueError(value)
+            _datetime = datetime.combine(_date, time.min)
+        if timezone.is_naive(_datetime):
+            _datetime = timezone.make_aware(_datetime, datetime_timezone.utc)
+        return _datetime
+    if not value:
+        raise ValueError(value)
+    return value
+
+def prefix_range(field:str, prefix:str) -> dict:
+    '''
+    Returns the range filter of the values starting with a prefix
+    '''
+    last = ord(prefix[-1])
+    if last >= 0x10FFFF:
+        return {field + '__gte': prefix}
+    return {field + '__gte': prefix, field + '__lt': prefix[:-1] + chr(last + 1)}
+
+def parse_filters(params:dict) -> dict:
+    '''
+    Returns the filter args of the {field__lookup: value} params (a field alone is an exact match)
+    Raises KeyError if a field or a lookup is not in FILTER_LOOKUPS, ValueError if a value is not valid
+    '''
+    args = {}
+    for key, value in params.items():
+        field, _, lookup = key.partition('__')
+        lookup = lookup or 'exact'
+        if lookup not in FILTER_LOOKUPS.get(field, ()):
+            raise KeyError(key)
+        try:
+            _value = filter_value(field, value)
+        except (TypeError, ValueError):
+            raise ValueError(key)
+        if lookup == 'prefix':
+            args.update(prefix_range(field, _value))
+        elif lookup == 'exact':
+            args[field] = _value
+        else:
+            args[field + '__' + lookup] = _value
+    return args
+
+def filter_queryset(queryset, args:dict, index:str = None):
+    '''
+    Returns the queryset filtered by the args (see parse_filters), read through the index (see filter_index)
+    '''
+    if index:
+        queryset = indexed_by(queryset, index)
+    return queryset.filter(**args)
+
+# without order_by, the parts are in the order of the index of the first filtered field (else in the model ordering),
+# so the index that seeks the filter also gives the order (no sort)
+DEFAULT_ORDER_BY_FIELDS = ('sku', 'name', 'weight_ounces', 'created_at', 'updated_at')
+
+def default_order_by(args:dict) -> str:
+    '''
+    Returns the ordering of the index of the filter args
+    '''
+    filtered = {key.partition('__')[0] for key in args}
+    for field in DEFAULT_ORDER_BY_FIELDS:
+        if field in filtered:
+            return field
+    return 'name'
+
+def order_by_fields(order_by:str, args:dict = None) -> tuple:
+    '''
+    Returns the fields of an ordering (by default the one of the filter args); raises ValueError if it is not valid
+    '''
+    order_by = order_by or default_order_by(args or {})
+    if order_by not in ORDER_BY:
+        raise ValueError(order_by)
+    return ORDER_BY[order_by]
+
+def filter_index(order_by:str, args:dict = None) -> str:
+    '''
+    Returns the index that reads the parts of the filter args in an ordering (by default the one of the filter args),
+    see ORDER_INDEXES; raises ValueError if the index does not seek any of the filters
+    '''
+    args = args or {}
+    field = (order_by or default_order_by(args)).lstrip('-')
+    exact = {key for key in args if '__' not in key}
+    filtered = {key.partition('__')[0] for key in args} - set(RESIDUAL_FIELDS)
+    for index, equal_fields in ORDER_INDEXES[field]:
+        if set(equal_fields) <= exact:
+            if filtered and not filtered & (set(equal_fields) | {field}):
+                raise ValueError(order_by)
+            return index
+
+def indexed_orders(args:dict) -> list:
+    '''
+    Returns the orderings whose index seeks the filter args
+    '''
+    orders = []
+    for order_by in ORDER_BY:
+        try:
+            filter_index(order_by, args)
+        except ValueError:
+            continue
+        orders.append(order_by)
+    return orders
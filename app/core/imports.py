@@ -0,0 +1,200 @@
+from django.conf import settings
+
+from core.bulk import upsert_parts
+from core.cache import deferred_invalidation
+from core.errors import error_dict
+
+import csv
+import json
+import os
+
+IMPORT_FIELDS = ('name', 'sku', 'description', 'weight_ounces', 'is_active')
+INTEGER_FIELDS = ('weight_ounces', 'is_active')
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+BATCH_SIZE = getattr(settings, 'IMPORT_BATCH_SIZE', 5000)
+
+class Lines:
+    '''
+    The decoded lines of a binary file from an offset; offset is the position after the last line read
+    (csv.reader may read many lines for a record, so the position is kept here)
+    '''
+    def __init__(self, _file, offset:int = 0):
+        self.file = _file
+        self.file.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8-sig')
+
+def file_format(path:str) -> str:
+    '''
+    Returns the format of a file by its extension; raises ValueError if it is not known
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValueError('The format is not valid. The coiches are: ' + ', '.join(IMPORT_FORMATS))
+    return IMPORT_FORMATS[extension]
+
+def csv_header(_file) -> tuple:
+    '''
+    Returns the columns of a CSV file and the offset after them
+    '''
+    lines = Lines(_file)
+    return next(csv.reader(lines), []), lines.offset
+
+def read_records(_file, _format:str, offset:int = 0, header:list = None):
+    '''
+    Yields the records of a file from an offset: (the record as read, its item dict or None, the error or None, the offset after it)
+    The invalid records (eg.: bad JSON) have an error instead of an item
+    '''
+    lines = Lines(_file, offset)
+    if _format == 'ndjson':
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError('The line is not a JSON object')
+            except ValueError as _exception:
+                yield line.rstrip('\n'), None, str(_exception), lines.offset
+                continue
+            yield item, item, None, lines.offset
+        return
+
+    for values in csv.reader(lines):
+        if not values:
+            continue
+        if len(values) != len(header):
+            yield values, None, 'The row has {n} values and the header {h} columns'.format(n=len(values), h=len(header)), lines.offset
+            continue
+        item = dict(zip(header, values))
+        yield item, item, None, lines.offset
+
+def clean_item(item:dict) -> dict:
+    '''
+    Returns the part fields of a record (the other fields, eg.: id of an export, are ignored)
+    with the integer fields converted; raises ValueError if one is not an integer
+    '''
+    cleaned = {}
+    for field in IMPORT_FIELDS:
+        if field not in item or item[field] is None:
+            continue
+        value = item[field]
+        if field in INTEGER_FIELDS:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError('{field} must be an integer'.format(field=field))
+        cleaned[field] = value
+    return cleaned
+
+def import_batch(records:list) -> tuple:
+    '''
+    Upserts (by sku) a batch of records in one transaction (see core.bulk.upsert_parts)
+    Returns the counts (created, updated, unchanged) and the rejected records with their errors
+    '''
+    rejected, items, sources = [], [], []
+    for source, item in records:
+        try:
+            items.append(clean_item(item))
+            sources.append(source)
+        except ValueError as _exception:
+            rejected.append(dict(error_dict(_exception), record=source))
+    # the parts are invalidated once, after the batch's transaction
+    with deferred_invalidation():
+        counts, errors = upsert_parts(items, batch_size=max(1, len(items)))
+    for _error in errors:
+        rejected.append({'error': _error['error'], 'field': _error['field'], 'record': sources[_error['index']]})
+    return counts, rejected
+
+class Checkpoint:
+    '''
+    The progress of an import (the offset of the file after the last committed batch and the counts),
+    kept in a JSON file so an interrupted import can be resumed
+    '''
+    def __init__(self, path:str, source:str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.size = os.path.getsize(source)
+        self.offset = 0
+        self.counts = {'read': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'rejected': 0}
+
+    def load(self) -> bool:
+        '''
+        Loads the saved progress; returns False if there is none
+        Raises ValueError if it is of another file (or the file was changed)
+        '''
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as _file:
+            data = json.load(_file)
+        if data['source'] != self.source or data['size'] != self.size:
+            raise ValueError('The checkpoint {path} is of another file'.format(path=self.path))
+        self.offset = data['offset']
+        self.counts = data['counts']
+        return True
+
+    def save(self):
+        data = {'source': self.source, 'size': self.size, 'offset': self.offset, 'counts': self.counts}
+        with open(self.path + '.tmp', 'w') as _file:
+            json.dump(data, _file)
+        os.replace(self.path + '.tmp', self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def import_file(path:str, checkpoint:Checkpoint, errors_file, batch_size:int = None, progress=None) -> dict:
+    '''
+    Imports the parts of a CSV or NDJSON file from the checkpoint's offset, a batch (one transaction) at a time;
+    the memory is bounded by the batch size
+    The checkpoint is saved after each committed batch; a batch interrupted before its commit is imported again
+    when resumed (the upserts of the committed rows do not change them)
+    The rejected records are written to errors_file as JSON lines ({error, field, record})
+    Returns the counts
+    '''
+    b_size = batch_size if batch_size else BATCH_SIZE
+    _format = file_format(path)
+    with open(path, 'rb') as _file:
+        header, offset = (csv_header(_file) if _format == 'csv' else (None, 0))
+        records = read_records(_file, _format, max(offset, checkpoint.offset), header)
+        batch, rejected, end = [], [], checkpoint.offset
+        for source, item, error, end in records:
+            checkpoint.counts['read'] += 1
+            if error:
+                rejected.append({'error': error, 'field': '', 'record': source})
+            else:
+                batch.append((source, item))
+            if len(batch) + len(rejected) >= b_size:
+                commit_batch(batch, rejected, end, checkpoint, errors_file)
+                batch, rejected = [], []
+                if progress:
+                    progress(checkpoint)
+        commit_batch(batch, rejected, end, checkpoint, errors_file)
+        if progress:
+            progress(checkpoint)
+    return checkpoint.counts
+
+def commit_batch(batch:list, rejected:list, offset:int, checkpoint:Checkpoint, errors_file):
+    counts, _rejected = import_batch(batch) if batch else ({}, [])
+    rejected = rejected + _rejected
+    for name, count in counts.items():
+        checkpoint.counts[name] += count
+    checkpoint.counts['rejected'] += len(rejected)
+    for record in rejected:
+        errors_file.write(json.dumps(record, default=str) + '\n')
+    errors_file.flush()
+    checkpoint.offset = offset
+    checkpoint.save()
@@ -0,0 +1,229 @@
+import asyncio
+import math
+import time
+
+from urllib.parse import urlsplit
+
+def percentile(values, p:float) -> float:
+    '''
+    Returns the p (0-100) percentile of a list of values (nearest rank)
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def latency_summary(latencies) -> dict:
+    '''
+    Returns the p50/p95/p99/max of a list of latencies (in seconds) as milliseconds
+    '''
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+async def read_response(reader) -> tuple:
+    '''
+    Reads a HTTP/1.1 response (Content-Length or chunked body)
+    Returns its status, headers (lowercase names) and body
+    '''
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunks.append((await reader.readexactly(size + 2))[:size])
+            if not size:
+                break
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('connection', '').lower() == 'close':
+        body = await reader.read()
+    else:
+        body = b''
+    return status, headers, body
+
+async def keep_alive_client(host, port, paths, requests:int, start, result:dict):
+    '''
+    Opens one connection, waits for the start event and sends its requests (one at a time)
+    on the same connection
+    '''
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        result['connect_errors'] += 1
+        return
+    result['connected'] += 1
+    await start.wait()
+    try:
+        for i in range(requests):
+            path = paths[i % len(paths)]
+            request = 'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.format(path=path, host=host)
+            sent_at = time.perf_counter()
+            writer.write(request.encode('latin-1'))
+            await writer.drain()
+            status, _, _ = await read_response(reader)
+            result['latencies'].append(time.perf_counter() - sent_at)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+        result['errors'] += 1
+    finally:
+        writer.close()
+
+async def run_load(url:str, paths, clients:int = 500, requests:int = 10) -> dict:
+    '''
+    Opens the clients' keep-alive connections, then all of them send their requests at the same time
+    Returns the throughput and latency percentiles
+    '''
+    address = urlsplit(url)
+    host, port = address.hostname, address.port or 80
+    result = {'connected': 0, 'connect_errors': 0, 'errors': 0, 'latencies': [], 'statuses': {}}
+    start = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(keep_alive_client(host, port, paths, requests, start, result))
+        for _ in range(clients)
+    ]
+    # all the connections are opened before the first request
+    while result['connected'] + result['connect_errors'] < clients:
+        await asyncio.sleep(0.01)
+    started_at = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - started_at
+
+    latencies = result.pop('latencies')
+    result['requests'] = len(latencies)
+    result['seconds'] = round(seconds, 3)
+    result['requests_per_second'] = round(len(latencies) / seconds, 1) if seconds else 0.0
+    result.update(latency_summary(latencies))
+    return result
+
+def load(url:str, paths, clients:int = 500, requests:int = 10) -> dict:
+    return asyncio.run(run_load(url, paths, clients, requests))
+
+class ConnectionPool:
+    '''
+    Keep-alive connections to a server, up to max_connections requests at a time
+    (the connections closed by the server are opened again)
+    '''
+    def __init__(self, host:str, port:int, max_connections:int = 256):
+        self.host = host
+        self.port = port
+        self.idle = []
+        self.slots = asyncio.Semaphore(max_connections)
+
+    async def request(self, method:str, path:str, body:bytes = None) -> tuple:
+        '''
+        Sends a request and returns the status, headers and body of the response
+        '''
+        async with self.slots:
+            if self.idle:
+                reader, writer = self.idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            head = '{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n'.format(
+                method=method, path=path, host=self.host
+            )
+            if body is not None:
+                head += 'Content-Type: application/json\r\nContent-Length: {length}\r\n'.format(length=len(body))
+            try:
+                writer.write(head.encode('latin-1') + b'\r\n' + (body or b''))
+                await writer.drain()
+                status, headers, content = await read_response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+            else:
+                self.idle.append((reader, writer))
+            return status, headers, content
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+async def run_open_loop(url:str, requests, rate:float, duration:float, max_connections:int = 256) -> dict:
+    '''
+    Sends the requests (an iterator of (category, method, path, body)) at a target rate (requests by second),
+    without waiting for the responses (open loop)
+    The latencies are measured from the time each request was scheduled, so a saturated server
+    shows its queueing time too
+    Returns the results by category (latencies, statuses, errors)
+    '''
+    address = urlsplit(url)
+    pool = ConnectionPool(address.hostname, address.port or 80, max_connections)
+    loop = asyncio.get_running_loop()
+    results = {}
+    tasks = []
+
+    async def send(category, method, path, body, scheduled):
+        result = results.setdefault(category, {'latencies': [], 'statuses': {}, 'errors': 0, 'error_messages': {}})
+        try:
+            status, _, _ = await pool.request(method, path, body)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+            if status >= 400:
+                result['errors'] += 1
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as _exception:
+            result['errors'] += 1
+            message = type(_exception).__name__
+            result['error_messages'][message] = result['error_messages'].get(message, 0) + 1
+        result['latencies'].append(loop.time() - scheduled)
+
+    start = loop.time()
+    total = int(rate * duration)
+    for i, (category, method, path, body) in zip(range(total), requests):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(category, method, path, body, scheduled)))
+    await asyncio.gather(*tasks)
+    seconds = loop.time() - start
+    pool.close()
+
+    summary = {}
+    for category, result in sorted(results.items()):
+        summary[category] = open_loop_summary(result, seconds)
+    everything = {'latencies': [], 'statuses': {}, 'errors': 0, 'error_messages': {}}
+    for result in results.values():
+        everything['latencies'] += result['latencies']
+        everything['errors'] += result['errors']
+        for status, count in result['statuses'].items():
+            everything['statuses'][status] = everything['statuses'].get(status, 0) + count
+        for message, count in result['error_messages'].items():
+            everything['error_messages'][message] = everything['error_messages'].get(message, 0) + count
+    summary['total'] = open_loop_summary(everything, seconds)
+    summary['total']['target_rate'] = rate
+    return summary
+
+def open_loop_summary(result:dict, seconds:float) -> dict:
+    latencies = result['latencies']
+    return {
+        'requests': len(latencies),
+        'throughput': round((len(latencies) - result['errors']) / seconds, 1) if seconds else 0.0,
+        'errors': result['errors'],
+        'error_rate': round(result['errors'] / len(latencies), 4) if latencies else 0.0,
+        'statuses': {str(k): v for k, v in sorted(result['statuses'].items())},
+        'error_messages': result['error_messages'],
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'p999_ms': round(percentile(latencies, 99.9) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
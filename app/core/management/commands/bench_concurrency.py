@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.loadgen import load
+
+import json
+
+DEFAULT_PATHS = [
+    '/api/parts',
+    '/api/parts?page=2&page_size=20',
+    '/api/parts/mostcommonwords',
+    '/api/parts/search?q=part',
+]
+
+class Command(BaseCommand):
+    help = 'Sends requests from many simultaneous keep-alive clients to a running server (sync or async mode)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='the address of the running server')
+        parser.add_argument('--clients', type=int, default=500, help='how many simultaneous connections')
+        parser.add_argument('--requests', type=int, default=10, help='how many requests by connection')
+        parser.add_argument('--path', action='append', dest='paths', help='a path to request (repeatable)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        result = load(options['url'], paths, options['clients'], options['requests'])
+        self.stdout.write(json.dumps(result, indent=2))
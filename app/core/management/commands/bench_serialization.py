@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import JsonResponse
+
+from core.models import Part
+from core.serializers import part_rows, encode_rows
+
+import time
+
+class Command(BaseCommand):
+    help = 'Compares the serialization of parts by Part.to_dict (JsonResponse) and by the rows serializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='how many parts are serialized')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def timed(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            missing = rows - Part.objects.count()
+            if missing > 0:
+                # temporary parts, rolled back at the end
+                Part.objects.bulk_create([
+                    Part(name='Bench part {i}'.format(i=i), sku='BENCH-{i}'.format(i=i),
+                         description='A "benchmark" part description {i}'.format(i=i), weight_ounces=i % 50)
+                    for i in range(missing)
+                ], batch_size=1000)
+            queryset = Part.objects.all()[:rows]
+
+            # queryset.all() is a new queryset (without the results cache) by run
+            to_dict_time, to_dict_content = self.timed(
+                lambda: JsonResponse([p.to_dict() for p in queryset.all()], safe=False).content, options['repeat']
+            )
+            rows_time, rows_content = self.timed(
+                lambda: encode_rows(part_rows(queryset.all())).encode(), options['repeat']
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write('{rows} parts (best of {repeat})'.format(rows=rows, repeat=options['repeat']))
+        self.stdout.write('to_dict + JsonResponse: {t:.4f}s'.format(t=to_dict_time))
+        self.stdout.write('rows serializer:        {t:.4f}s ({speedup:.1f}x)'.format(t=rows_time, speedup=to_dict_time / rows_time))
+        self.stdout.write('same output: {same}'.format(same=to_dict_content == rows_content))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from core.models import Part
+from core.views import create_part
+from core.writer import write, WRITER_STATS
+
+import threading
+import time
+
+BENCH_SKU = 'BENCH-WRITE-{mode}-{i}'
+
+class Command(BaseCommand):
+    help = 'Compares the throughput of a burst of part creations with and without the group commit writer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writes', type=int, default=1000, help='how many parts are created')
+        parser.add_argument('--threads', type=int, default=50, help='how many simultaneous writers')
+
+    def burst(self, mode, writes, threads):
+        errors = []
+        def writer(index):
+            for i in range(index, writes, threads):
+                try:
+                    write(create_part, {
+                        'name': 'Bench part', 'sku': BENCH_SKU.format(mode=mode, i=i),
+                        'description': 'A benchmark part', 'weight_ounces': 1, 'is_active': 1
+                    })
+                except Exception as _exception:
+                    errors.append(_exception)
+            connections.close_all()
+
+        workers = [threading.Thread(target=writer, args=(index,)) for index in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - start, len(errors)
+
+    def handle(self, *args, **options):
+        writes, threads = options['writes'], options['threads']
+        try:
+            with override_settings(WRITE_COALESCING=False):
+                direct, direct_errors = self.burst('direct', writes, threads)
+            with override_settings(WRITE_COALESCING=True):
+                batches = WRITER_STATS['batches']
+                coalesced, coalesced_errors = self.burst('coalesced', writes, threads)
+                batches = WRITER_STATS['batches'] - batches
+        finally:
+            for part in Part.objects.filter(sku__startswith='BENCH-WRITE-'):
+                part.delete()
+
+        self.stdout.write('{writes} writes by {threads} threads'.format(writes=writes, threads=threads))
+        self.stdout.write('direct:    {t:.3f}s ({rate:.0f} writes/s, {errors} errors)'.format(
+            t=direct, rate=(writes - direct_errors) / direct, errors=direct_errors
+        ))
+        self.stdout.write('coalesced: {t:.3f}s ({rate:.0f} writes/s, {errors} errors, {batches} commits)'.format(
+            t=coalesced, rate=(writes - coalesced_errors) / coalesced, errors=coalesced_errors, batches=batches
+        ))
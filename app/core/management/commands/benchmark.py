@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.models import Part
+from core.seed import SEED, catalog_path, generate_block, seed_catalog
+from core.loadgen import percentile
+
+import django
+import json
+import os
+import platform
+import sqlite3
+import time
+import tracemalloc
+
+DEFAULT_SIZES = '1000,10000,100000,1000000'
+BENCH_PREFIX = 'BENCH-'
+
+def part_data(sku:str, name:str = 'Bench part') -> dict:
+    return {'name': name, 'sku': sku, 'description': 'A benchmark part for the heavy load tests', 'weight_ounces': 7, 'is_active': 1}
+
+def bulk_data(i:int, name:str = 'Bench part') -> list:
+    return [part_data('{prefix}BULK-{i}-{j}'.format(prefix=BENCH_PREFIX, i=i, j=j), name) for j in range(100)]
+
+def streamed(response):
+    # consumes the streaming responses (the time of an export is the time of its whole body)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+def cases(size:int, page_size:int = 10) -> list:
+    '''
+    Returns the benchmark cases: (name, request(client, i)[, max repeat])
+    The write cases use the run index i: the parts created by "create" are updated and deleted by the next cases
+    '''
+    name, sku, description, weight_ounces, _, _ = generate_block(0)[0]
+    word = description.split()[1]
+    skus = ','.join(row[1] for row in generate_block(0)[:min(size, 20)])
+    last_page = max(1, -(-size // page_size))
+    json_type = 'application/json'
+    new_sku = lambda i: '{prefix}NEW-{i}'.format(prefix=BENCH_PREFIX, i=i)
+    return [
+        ('list', lambda c, i: c.get('/api/parts')),
+        ('list_page_size_100', lambda c, i: c.get('/api/parts?page_size=100')),
+        ('deep_page', lambda c, i: c.get('/api/parts?page={page}'.format(page=last_page))),
+        ('cursor_page', lambda c, i: c.get('/api/parts?cursor=')),
+        ('search_name', lambda c, i: c.get('/api/parts/param=name/value=' + name)),
+        ('search_sku', lambda c, i: c.get('/api/parts/param=sku/value=' + sku)),
+        ('search_weight_ounces', lambda c, i: c.get('/api/parts/param=weight_ounces/value={w}'.format(w=weight_ounces))),
+        ('search_description', lambda c, i: c.get('/api/parts/param=description/value=' + word)),
+        ('full_text_search', lambda c, i: c.get('/api/parts/search?q=' + word)),
+        ('sku_get', lambda c, i: c.get('/api/part/sku=' + sku)),
+        ('skus_get', lambda c, i: c.get('/api/parts/skus=' + skus)),
+        ('skus_post', lambda c, i: c.post('/api/parts/skus', {'skus': skus.split(',')}, content_type=json_type)),
+        ('export_ndjson', lambda c, i: streamed(c.get('/api/parts/export?format=ndjson')), 3),
+        ('most_common_words', lambda c, i: c.get('/api/parts/mostcommonwords')),
+        ('part_most_common_words', lambda c, i: c.get('/api/part/sku={sku}/mostcommonwords'.format(sku=sku))),
+        ('create', lambda c, i: c.post('/api/part/new', part_data(new_sku(i)), content_type=json_type)),
+        ('update', lambda c, i: c.put('/api/part/sku=' + new_sku(i), part_data(new_sku(i), 'Bench part updated'), content_type=json_type)),
+        ('delete', lambda c, i: c.delete('/api/part/sku=' + new_sku(i))),
+        ('bulk_create_100', lambda c, i: c.post('/api/parts/bulk', bulk_data(i), content_type=json_type)),
+        ('bulk_upsert_100', lambda c, i: c.put('/api/parts/bulk', bulk_data(i, 'Bench part updated'), content_type=json_type)),
+        ('metrics', lambda c, i: c.get('/api/metrics')),
+    ]
+
+def measure(client, request, repeat:int) -> dict:
+    '''
+    Times repeat requests (p50/p95), then one more request counts the queries and the peak memory
+    '''
+    latencies = []
+    status = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        response = request(client, i)
+        latencies.append(time.perf_counter() - start)
+        status = response.status_code
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as context:
+        request(client, repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'queries': len(context.captured_queries),
+        'peak_kb': round(peak / 1024, 1),
+        'status': status,
+    }
+
+def compare(results:dict, baseline:dict, tolerance:float) -> list:
+    '''
+    Returns the cases slower (p50) than the baseline by more than the tolerance: (size, case, baseline ms, ms, ratio)
+    '''
+    regressions = []
+    for size, _cases in results.items():
+        for case, result in _cases.items():
+            base = baseline.get(size, {}).get(case)
+            if not base or not base['p50_ms']:
+                continue
+            ratio = result['p50_ms'] / base['p50_ms']
+            if ratio > tolerance:
+                regressions.append((size, case, base['p50_ms'], result['p50_ms'], round(ratio, 2)))
+    return regressions
+
+class Command(BaseCommand):
+    help = 'Times every endpoint (p50/p95, queries, peak memory) on deterministic catalogs of many sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma separated catalog sizes')
+        parser.add_argument('--repeat', type=int, default=20, help='how many requests by case')
+        parser.add_argument('--seed', type=int, default=SEED)
+        parser.add_argument('--db-dir', default=None, help='where the catalogs are kept (a SQLite file by size and seed)')
+        parser.add_argument('--in-place', action='store_true', help='seed and run on the current database (one size only)')
+        parser.add_argument('--case', action='append', dest='cases', help='run only this case (repeatable)')
+        parser.add_argument('--cache', action='store_true', help='keep the response and count caches enabled')
+        parser.add_argument('--output', default=None, help='write the results (JSON) to this file')
+        parser.add_argument('--baseline', default=None, help='compare the results with a previous output')
+        parser.add_argument('--tolerance', type=float, default=1.25, help='the p50 ratio to the baseline reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def use_catalog(self, size:int, seed:int, db_dir:str):
+        '''
+        Switches the default database to the catalog file of the size (migrated and seeded if needed)
+        '''
+        os.makedirs(db_dir, exist_ok=True)
+        connections.close_all()
+        connection.settings_dict['NAME'] = catalog_path(db_dir, size, seed)
+        call_command('migrate', verbosity=0, interactive=False)
+
+    def run_size(self, size:int, options:dict) -> dict:
+        start = time.perf_counter()
+        inserted = seed_catalog(size, options['seed'])
+        self.stdout.write('{size} parts ({inserted} seeded in {t:.1f}s)'.format(size=size, inserted=inserted, t=time.perf_counter() - start))
+
+        client = Client()
+        results = {}
+        for case in cases(size):
+            name, request = case[0], case[1]
+            if options['cases'] and name not in options['cases']:
+                continue
+            repeat = min(options['repeat'], case[2]) if len(case) > 2 else options['repeat']
+            results[name] = measure(client, request, repeat)
+            self.stdout.write('  {name:<24} p50 {p50_ms:>9.3f}ms  p95 {p95_ms:>9.3f}ms  {queries:>3} queries  {peak_kb:>10.1f}KB  [{status}]'.format(
+                name=name, **results[name]
+            ))
+        for part in Part.objects.filter(sku__startswith=BENCH_PREFIX):
+            part.delete()
+        return results
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        if options['in_place'] and len(sizes) != 1:
+            raise CommandError('Only one size can be run in place')
+        db_dir = options['db_dir'] or os.path.join(settings.BASE_DIR, '_bench')
+        overrides = {
+            'DEBUG': False,
+            'ALLOWED_HOSTS': ['testserver'],
+            'WRITE_COALESCING': False,
+            'SLOW_QUERY_ENABLED': False,
+            'METRICS_ENABLED': False,
+        }
+        if not options['cache']:
+            overrides.update(RESPONSE_CACHE_ENABLED=False, COUNT_CACHE_ENABLED=False)
+
+        results = {}
+        database = connection.settings_dict['NAME']
+        try:
+            with override_settings(**overrides):
+                for size in sizes:
+                    if not options['in_place']:
+                        self.use_catalog(size, options['seed'], db_dir)
+                    results[str(size)] = self.run_size(size, options)
+        finally:
+            if not options['in_place']:
+                connections.close_all()
+                connection.settings_dict['NAME'] = database
+
+        output = {
+            'meta': {
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'cache': options['cache'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'machine': platform.machine(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as _file:
+                json.dump(output, _file, indent=2)
+            self.stdout.write('Results written to ' + options['output'])
+
+        if options['baseline']:
+            with open(options['baseline']) as _file:
+                baseline = json.load(_file)['results']
+            regressions = compare(results, baseline, options['tolerance'])
+            for size, case, base, current, ratio in regressions:
+                self.stdout.write('REGRESSION {size} {case}: {base}ms -> {current}ms (x{ratio})'.format(
+                    size=size, case=case, base=base, current=current, ratio=ratio
+                ))
+            if not regressions:
+                self.stdout.write('No regressions (tolerance x{tolerance})'.format(tolerance=options['tolerance']))
+            if regressions and options['fail_on_regression']:
+                raise CommandError('{n} regressions'.format(n=len(regressions)))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import Checkpoint, file_format, import_file
+
+import os
+import time
+
+class Command(BaseCommand):
+    help = 'Imports (creates or updates by sku) the parts of a CSV or NDJSON file, resuming from its checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='a .csv, .ndjson or .jsonl file (the format of the export)')
+        parser.add_argument('--batch-size', type=int, default=None, help='records by transaction')
+        parser.add_argument('--errors', default=None, help='the rejected records file (default: <file>.errors.ndjson)')
+        parser.add_argument('--checkpoint', default=None, help='the progress file (default: <file>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and import from the start')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.isfile(path):
+            raise CommandError('The file {path} does not exist'.format(path=path))
+        try:
+            file_format(path)
+        except ValueError as _exception:
+            raise CommandError(str(_exception))
+
+        checkpoint = Checkpoint(options['checkpoint'] or path + '.checkpoint', path)
+        resumed = False
+        if not options['restart']:
+            try:
+                resumed = checkpoint.load()
+            except ValueError as _exception:
+                raise CommandError(str(_exception) + ' (use --restart)')
+        if resumed:
+            self.stdout.write('Resuming at byte {offset} ({read} records read)'.format(offset=checkpoint.offset, **checkpoint.counts))
+
+        start = time.perf_counter()
+        read = checkpoint.counts['read']
+        def progress(checkpoint):
+            seconds = time.perf_counter() - start
+            self.stdout.write('{percent:>6.1%}  {read} read  {created} created  {updated} updated  {unchanged} unchanged  {rejected} rejected  {rate:.0f} records/s'.format(
+                percent=checkpoint.offset / checkpoint.size if checkpoint.size else 1,
+                rate=(checkpoint.counts['read'] - read) / seconds if seconds else 0, **checkpoint.counts
+            ))
+
+        errors_path = options['errors'] or path + '.errors.ndjson'
+        with open(errors_path, 'a' if resumed else 'w') as errors_file:
+            counts = import_file(path, checkpoint, errors_file, options['batch_size'], progress)
+        checkpoint.remove()
+
+        seconds = time.perf_counter() - start
+        self.stdout.write('Imported in {seconds:.1f}s: {created} created, {updated} updated, {unchanged} unchanged, {rejected} rejected'.format(
+            seconds=seconds, **counts
+        ))
+        if counts['rejected']:
+            self.stdout.write('The rejected records were written to ' + errors_path)
@@ -0,0 +1,247 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.loadgen import run_open_loop
+from core.seed import SEED, BLOCK_SIZE, catalog_path, generate_parts, seed_catalog
+
+from urllib.parse import quote
+
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+DEFAULT_MIX = 'read=70,search=20,write=10'
+LOCKED_ERROR = 'OperationalError: database is locked'
+# the log records start with their level (the default format of logging.basicConfig)
+RECORD_START = re.compile(r'^(?=(?:DEBUG|INFO|WARNING|ERROR|CRITICAL):)', re.MULTILINE)
+LOAD_PREFIX = 'LOAD-'
+
+def parse_mix(mix:str) -> dict:
+    '''
+    Returns the weights of a mix like "read=70,search=20,write=10"
+    '''
+    weights = {}
+    for item in mix.split(','):
+        category, _, weight = item.partition('=')
+        if category not in ('read', 'search', 'write') or not weight.isdigit():
+            raise ValueError(item)
+        weights[category] = int(weight)
+    if not sum(weights.values()):
+        raise ValueError(mix)
+    return weights
+
+def request_mix(mix:dict, size:int, seed:int = SEED):
+    '''
+    Yields the requests (category, method, path, body) of a mix, on the parts of the seeded catalog of a size
+    The writes create parts (LOAD- skus), update them or the catalog's and delete the created ones
+    '''
+    rng = random.Random(seed)
+    rows = list(generate_parts(min(size, BLOCK_SIZE), seed))
+    last_page = max(1, min(100, size // 10))
+    categories, weights = list(mix), list(mix.values())
+    created = []
+    for n in range(sys.maxsize):
+        category = rng.choices(categories, weights)[0]
+        name, sku, description, weight_ounces, _, _ = rng.choice(rows)
+        word = rng.choice(description.split()).lower()
+        if category == 'read':
+            yield category, 'GET', rng.choice([
+                '/api/parts',
+                '/api/parts?page={page}'.format(page=rng.randint(1, last_page)),
+                '/api/part/sku=' + sku,
+                '/api/parts/mostcommonwords',
+            ]), None
+        elif category == 'search':
+            yield category, 'GET', rng.choice([
+                '/api/parts/param=name/value=' + quote(name),
+                '/api/parts/param=description/value=' + quote(word),
+                '/api/parts/param=weight_ounces/value={w}'.format(w=weight_ounces),
+                '/api/parts/search?q=' + quote(word),
+            ]), None
+        else:
+            action = rng.choices(['create', 'update', 'delete'], [5, 4, 1])[0]
+            if action == 'delete' and created:
+                yield category, 'DELETE', '/api/part/sku=' + created.pop(0), None
+                continue
+            if action == 'update':
+                sku = created[-1] if created and rng.random() < 0.5 else sku
+            else:
+                sku = '{prefix}{seed}-{n}'.format(prefix=LOAD_PREFIX, seed=seed, n=n)
+                created.append(sku)
+            body = json.dumps({
+                'name': name, 'sku': sku, 'description': description,
+                'weight_ounces': rng.randint(1, 500), 'is_active': 1,
+            }).encode()
+            if action == 'update':
+                yield category, 'PUT', '/api/part/sku=' + sku, body
+            else:
+                yield category, 'POST', '/api/part/new', body
+
+def count_locked_errors(log_path:str) -> int:
+    '''
+    Returns how many records (tracebacks) with "database is locked" the server logged at LOG_PATH
+    '''
+    count = 0
+    for path in glob.glob(os.path.join(log_path, '*.log')):
+        with open(path, errors='replace') as _file:
+            records = RECORD_START.split(_file.read())
+        count += sum(1 for record in records if LOCKED_ERROR in record)
+    return count
+
+def free_port() -> int:
+    with socket.socket() as _socket:
+        _socket.bind(('127.0.0.1', 0))
+        return _socket.getsockname()[1]
+
+class Command(BaseCommand):
+    help = 'Starts the app with gunicorn and sends a mix of reads, searches and writes at target rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rates', default='25,50,100', help='comma separated target rates (requests by second), one step each')
+        parser.add_argument('--duration', type=float, default=20, help='seconds by step')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='weights of the read, search and write requests')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--worker-class', default='sync', help='sync, gthread or uvicorn.workers.UvicornWorker')
+        parser.add_argument('--threads', type=int, default=1, help='threads by worker (gthread)')
+        parser.add_argument('--env', action='append', default=[], help='KEY=VALUE setting of the server (repeatable)')
+        parser.add_argument('--size', type=int, default=10000, help='parts of the seeded catalog')
+        parser.add_argument('--seed', type=int, default=SEED)
+        parser.add_argument('--db-dir', default=None, help='where the catalogs are kept (see the benchmark command)')
+        parser.add_argument('--max-connections', type=int, default=256, help='simultaneous requests of the generator')
+        parser.add_argument('--url', default=None, help='load a running server instead of starting one')
+        parser.add_argument('--output', default=None, help='write the results (JSON) to this file')
+
+    def prepare_catalog(self, size:int, seed:int, db_dir:str) -> str:
+        '''
+        Returns the catalog file of the size (migrated and seeded if needed)
+        '''
+        os.makedirs(db_dir, exist_ok=True)
+        database = connection.settings_dict['NAME']
+        connections.close_all()
+        connection.settings_dict['NAME'] = catalog_path(db_dir, size, seed)
+        try:
+            call_command('migrate', verbosity=0, interactive=False)
+            seed_catalog(size, seed)
+        finally:
+            connections.close_all()
+            connection.settings_dict['NAME'] = database
+        return catalog_path(db_dir, size, seed)
+
+    def start_server(self, workdir:str, options:dict) -> tuple:
+        '''
+        Starts gunicorn on a copy of the catalog (the writes do not change the catalog)
+        Returns the process and its url
+        '''
+        db_dir = options['db_dir'] or os.path.join(settings.BASE_DIR, '_bench')
+        database = os.path.join(workdir, 'db.sqlite3')
+        shutil.copyfile(self.prepare_catalog(options['size'], options['seed'], db_dir), database)
+
+        env = dict(os.environ)
+        env.update(
+            DB_NAME=database,
+            LOG_PATH=os.path.join(workdir, 'logs'),
+            METRICS_DIR=os.path.join(workdir, 'metrics'),
+            CACHE_LOCATION=os.path.join(workdir, 'cache'),
+            SLOW_QUERY_LOG=os.path.join(workdir, 'slow_queries.log'),
+        )
+        os.makedirs(env['LOG_PATH'])
+        application = 'parts_unlimited.wsgi:application'
+        if 'uvicorn' in options['worker_class'].lower():
+            env['API_MODE'] = 'async'
+            application = 'parts_unlimited.asgi:application'
+        for item in options['env']:
+            key, _, value = item.partition('=')
+            env[key] = value
+
+        url = 'http://127.0.0.1:{port}'.format(port=free_port())
+        command = [
+            sys.executable, '-m', 'gunicorn', application,
+            '--bind', url[len('http://'):],
+            '--workers', str(options['workers']),
+            '--worker-class', options['worker_class'],
+            '--threads', str(options['threads']),
+            '--keep-alive', '5',
+        ]
+        stderr = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=stderr, stderr=subprocess.STDOUT)
+        stderr.close()
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                with open(os.path.join(workdir, 'gunicorn.log')) as _file:
+                    raise CommandError('The server did not start:\n' + _file.read()[-2000:])
+            try:
+                urllib.request.urlopen(url + '/api/parts?count=none', timeout=5).read()
+                return process, url
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError('The server did not answer in 60 seconds')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            rates = [float(rate) for rate in options['rates'].split(',') if rate]
+        except ValueError:
+            raise CommandError('The mix is not valid. Eg.: ' + DEFAULT_MIX)
+
+        workdir = tempfile.mkdtemp(prefix='load_test-')
+        process = None
+        url = options['url']
+        log_path = os.path.join(workdir, 'logs')
+        try:
+            if url is None:
+                process, url = self.start_server(workdir, options)
+            requests = request_mix(mix, options['size'], options['seed'])
+            steps = []
+            for rate in rates:
+                locked = count_locked_errors(log_path)
+                result = asyncio.run(run_open_loop(url, requests, rate, options['duration'], options['max_connections']))
+                # only known of the started server (its log)
+                if process is not None:
+                    result['total']['database_locked'] = count_locked_errors(log_path) - locked
+                steps.append(result)
+                self.stdout.write('{rate:>8.1f} req/s target'.format(rate=rate))
+                for category, summary in result.items():
+                    self.stdout.write(
+                        '  {category:<8} {requests:>7} requests {throughput:>8.1f}/s  p50 {p50_ms:>9.2f}ms  p99 {p99_ms:>9.2f}ms  '
+                        'p99.9 {p999_ms:>9.2f}ms  errors {error_rate:.2%}'.format(category=category, **summary)
+                    )
+                if process is not None:
+                    self.stdout.write('  database is locked: {locked}'.format(locked=result['total']['database_locked']))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(30)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        output = {
+            'meta': {
+                'workers': options['workers'],
+                'worker_class': options['worker_class'],
+                'threads': options['threads'],
+                'env': options['env'],
+                'mix': mix,
+                'size': options['size'],
+                'duration': options['duration'],
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'steps': steps,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as _file:
+                json.dump(output, _file, indent=2)
+            self.stdout.write('Results written to ' + options['output'])
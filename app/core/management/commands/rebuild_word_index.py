@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Part, WordFrequency
+from core.words import word_counts
+
+class Command(BaseCommand):
+    help = 'Rebuilds the word frequency table from the parts descriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        descriptions = Part.objects.values_list('description', flat=True).iterator(chunk_size=options['chunk_size'])
+        counts = word_counts(descriptions)
+        with transaction.atomic():
+            WordFrequency.objects.all().delete()
+            WordFrequency.objects.bulk_create(
+                [WordFrequency(word=w, length=len(w), count=c) for w, c in counts.items()],
+                batch_size=options['batch_size']
+            )
+        self.stdout.write('{words} words indexed'.format(words=len(counts)))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import invalidate_parts
+from core.seed import SEED, bulk_load, seed_catalog, seeded_count
+
+import os
+import time
+
+class Command(BaseCommand):
+    help = 'Inserts the parts of a deterministic catalog (the same seed and count always give the same parts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='how many parts the seeded catalog must have')
+        parser.add_argument('--seed', type=int, default=SEED)
+        parser.add_argument('--batch-size', type=int, default=50000, help='parts by executemany (and transaction)')
+        parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='processes generating the parts')
+        parser.add_argument('--no-bulk-load', action='store_true', help='keep the indexes, triggers and pragmas while inserting')
+
+    def handle(self, *args, **options):
+        if options['count'] < 0 or options['batch_size'] < 1:
+            raise CommandError('The count and the batch size must be positive')
+        existent = seeded_count()
+        missing = options['count'] - existent
+        if missing <= 0:
+            self.stdout.write('The catalog already has {existent} seeded parts'.format(existent=existent))
+            return
+
+        start = time.perf_counter()
+        def progress(inserted):
+            seconds = time.perf_counter() - start
+            self.stdout.write('{inserted:>10}/{missing} parts  {rate:>8.0f} parts/s'.format(
+                inserted=inserted, missing=missing, rate=inserted / seconds if seconds else 0
+            ))
+
+        if options['no_bulk_load']:
+            inserted = seed_catalog(options['count'], options['seed'], options['batch_size'], progress, options['jobs'])
+        else:
+            with bulk_load():
+                inserted = seed_catalog(options['count'], options['seed'], options['batch_size'], progress, options['jobs'])
+                loaded = time.perf_counter()
+            self.stdout.write('Indexes built in {t:.1f}s'.format(t=time.perf_counter() - loaded))
+        invalidate_parts([])
+
+        seconds = time.perf_counter() - start
+        self.stdout.write('{inserted} parts inserted in {seconds:.1f}s ({rate:.0f} parts/min)'.format(
+            inserted=inserted, seconds=seconds, rate=inserted / seconds * 60
+        ))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slowlog import read_slow_queries, worst_queries
+
+import os
+
+class Command(BaseCommand):
+    help = 'Summarizes the slow query log: the worst query fingerprints by total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='the log file (default: settings.SLOW_QUERY_LOG)')
+        parser.add_argument('--limit', type=int, default=10, help='how many fingerprints are listed')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.SLOW_QUERY_LOG
+        if not os.path.exists(path):
+            raise CommandError('The slow query log does not exist: ' + path)
+
+        worst = worst_queries(read_slow_queries(path), options['limit'])
+        if not worst:
+            self.stdout.write('No slow queries')
+            return
+        for item in worst:
+            self.stdout.write('[{fingerprint}] {count} queries, total {total_ms}ms, mean {mean_ms}ms, max {max_ms}ms'.format(**item))
+            self.stdout.write('  views: ' + (', '.join(item['views']) or '-'))
+            self.stdout.write('  ' + item['query'])
+            for detail in item['plan']:
+                self.stdout.write('    ' + detail)
@@ -0,0 +1,332 @@
+from django.conf import settings
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from collections import defaultdict
+from contextvars import ContextVar
+
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+# Request metrics (route latency, SQL queries, response bytes, status codes, response cache hits) in Prometheus text format
+# Each process keeps its metrics in memory and writes them to its own file at METRICS_DIR;
+# /api/metrics sums the files of all the processes (eg.: the gunicorn workers)
+# A process touches its file on every flush interval, even without new metrics, so the files not written for
+# METRICS_FILE_TIMEOUT seconds are of processes that are gone (eg.: restarted workers): they are removed
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = 'unmatched'
+ROUTE_PARAM = re.compile(r'<(?:\w+:)?(\w+)>')
+
+# the query stats of the current request (see query_metrics)
+current_request = ContextVar('current_request', default=None)
+
+def metrics_dir() -> str:
+    return getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, '_metrics'))
+
+def metrics_file_timeout() -> float:
+    return getattr(settings, 'METRICS_FILE_TIMEOUT', 60.0)
+
+def route_of(request) -> str:
+    '''
+    Returns the route template of a request (eg.: /api/part/sku={sku}), not the requested url
+    '''
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return UNMATCHED_ROUTE
+    return '/' + ROUTE_PARAM.sub(r'{\1}', match.route)
+
+class Metrics:
+    '''
+    The metrics of this process
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        # a new file by process, even if a pid is reused
+        self.filename = '{pid}-{token}.json'.format(pid=self.pid, token=uuid.uuid4().hex[:8])
+        self.requests = defaultdict(int)
+        self.durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+        self.response_bytes = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.query_seconds = defaultdict(float)
+        self.cache = defaultdict(int)
+        self.dirty = False
+        self.flusher = None
+
+    def check_process(self):
+        if self.pid != os.getpid():
+            # forked (eg.: gunicorn --preload): the parent's metrics are not of this process
+            self.reset()
+
+    def observe(self, route:str, method:str, status:int, seconds:float, size:int, queries:int, query_seconds:float):
+        with self.lock:
+            self.check_process()
+            key = route + '\t' + method
+            self.requests[key + '\t' + str(status)] += 1
+            histogram = self.durations[key]
+            index = len(DURATION_BUCKETS)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    index = i
+                    break
+            histogram[index] += 1
+            histogram[-1] += seconds
+            self.response_bytes[key] += size
+            self.queries[key] += queries
+            self.query_seconds[key] += query_seconds
+            self.dirty = True
+        self.start_flusher()
+
+    def observe_cache(self, result:str):
+        '''
+        Counts a lookup of the response cache (result: hit or miss, see core.cache)
+        '''
+        with self.lock:
+            self.check_process()
+            self.cache[result] += 1
+            self.dirty = True
+        self.start_flusher()
+
+    def data(self) -> dict:
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'durations': {k: list(v) for k, v in self.durations.items()},
+                'response_bytes': dict(self.response_bytes),
+                'queries': dict(self.queries),
+                'query_seconds': dict(self.query_seconds),
+                'cache': dict(self.cache),
+            }
+
+    def flush(self):
+        '''
+        Writes the metrics of this process to its file (atomically)
+        Without new metrics the file is only touched (it is still of a running process)
+        '''
+        directory = metrics_dir()
+        path = os.path.join(directory, self.filename)
+        if not self.dirty:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.dirty = False
+        with open(path + '.tmp', 'w') as _file:
+            json.dump(self.data(), _file)
+        os.replace(path + '.tmp', path)
+
+    def start_flusher(self):
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+        with self.lock:
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self.run_flusher, name='metrics-flusher', daemon=True)
+                self.flusher.start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+            self.flush()
+
+metrics = Metrics()
+atexit.register(metrics.flush)
+
+def query_metrics(execute, sql, params, many, context):
+    '''
+    Execute wrapper (installed on every connection): counts the queries of the current request and their time
+    '''
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['queries'] += 1
+        stats['query_seconds'] += time.perf_counter() - start
+
+def install_query_metrics(sender, connection, **kwargs):
+    '''
+    connection_created receiver: installs query_metrics on the new connection
+    '''
+    if query_metrics not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_metrics)
+
+class MetricsMiddleware:
+    '''
+    Records the latency, the SQL queries, the response size and the status of each request by route
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        stats, token, start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+        stats, token, start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request, response, stats, start)
+        return response
+
+    def start(self, request):
+        # the request is also used by the slow query log (core.slowlog) to know the view
+        stats = {'queries': 0, 'query_seconds': 0.0, 'request': request}
+        return stats, current_request.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, start):
+        if response.streaming:
+            # the body (and its queries) is read after the view returns: the request is recorded at the end of the stream
+            response.streaming_content = self.measured_stream(request, response, stats, start)
+            return
+        self.record(request, response, stats, start, len(response.content))
+
+    def record(self, request, response, stats, start, size):
+        metrics.observe(
+            route_of(request), request.method, response.status_code, time.perf_counter() - start, size,
+            stats['queries'], stats['query_seconds']
+        )
+
+    def measured_stream(self, request, response, stats, start):
+        '''
+        Returns the streaming content of a response counting its bytes and the queries run to read each block
+        '''
+        content = response.streaming_content
+        if response.is_async:
+            async def stream():
+                size = 0
+                try:
+                    iterator = aiter(content)
+                    while True:
+                        token = current_request.set(stats)
+                        try:
+                            block = await anext(iterator)
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            current_request.reset(token)
+                        size += len(block)
+                        yield block
+                finally:
+                    self.record(request, response, stats, start, size)
+            return stream()
+
+        def stream():
+            size = 0
+            try:
+                iterator = iter(content)
+                while True:
+                    token = current_request.set(stats)
+                    try:
+                        block = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        current_request.reset(token)
+                    size += len(block)
+                    yield block
+            finally:
+                self.record(request, response, stats, start, size)
+        return stream()
+
+def collect() -> dict:
+    '''
+    Returns the sum of the metrics of all the processes (the files at METRICS_DIR)
+    The files of the processes that are gone are removed (see METRICS_FILE_TIMEOUT)
+    '''
+    metrics.flush()
+    expired = time.time() - metrics_file_timeout()
+    total = {'requests': defaultdict(int), 'durations': {}, 'response_bytes': defaultdict(int),
+             'queries': defaultdict(int), 'query_seconds': defaultdict(float), 'cache': defaultdict(int)}
+    for path in glob.glob(os.path.join(metrics_dir(), '*.json')):
+        try:
+            if os.path.basename(path) != metrics.filename and os.path.getmtime(path) < expired:
+                os.remove(path)
+                continue
+            with open(path) as _file:
+                data = json.load(_file)
+        except (OSError, ValueError):
+            continue
+        for name in ('requests', 'response_bytes', 'queries', 'query_seconds', 'cache'):
+            for key, value in data.get(name, {}).items():
+                total[name][key] += value
+        for key, histogram in data.get('durations', {}).items():
+            current = total['durations'].get(key)
+            total['durations'][key] = [a + b for a, b in zip(current, histogram)] if current else list(histogram)
+    return total
+
+def escape_label(value:str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(names:tuple, key:str, **extra) -> str:
+    pairs = list(zip(names, key.split('\t'))) + list(extra.items())
+    return '{' + ','.join('{n}="{v}"'.format(n=n, v=escape_label(v)) for n, v in pairs) + '}'
+
+def render(total:dict) -> str:
+    '''
+    Returns the metrics in the Prometheus text format
+    '''
+    lines = []
+    def header(name, kind, description):
+        lines.append('# HELP {name} {description}'.format(name=name, description=description))
+        lines.append('# TYPE {name} {kind}'.format(name=name, kind=kind))
+
+    header('http_requests_total', 'counter', 'Requests by route, method and status.')
+    for key, value in sorted(total['requests'].items()):
+        lines.append('http_requests_total{labels} {value}'.format(labels=labels(('route', 'method', 'status'), key), value=value))
+
+    header('http_request_duration_seconds', 'histogram', 'Request latency by route and method.')
+    for key, histogram in sorted(total['durations'].items()):
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS + ('+Inf',), histogram[:-1]):
+            cumulative += count
+            lines.append('http_request_duration_seconds_bucket{labels} {value}'.format(
+                labels=labels(('route', 'method'), key, le=bound), value=cumulative
+            ))
+        lines.append('http_request_duration_seconds_sum{labels} {value}'.format(labels=labels(('route', 'method'), key), value=histogram[-1]))
+        lines.append('http_request_duration_seconds_count{labels} {value}'.format(labels=labels(('route', 'method'), key), value=cumulative))
+
+    for name, kind, description, values in (
+        ('http_response_bytes_total', 'counter', 'Response body bytes by route and method.', total['response_bytes']),
+        ('db_queries_total', 'counter', 'SQL queries by route and method.', total['queries']),
+        ('db_query_duration_seconds_total', 'counter', 'Time spent in SQL queries by route and method.', total['query_seconds']),
+    ):
+        header(name, kind, description)
+        for key, value in sorted(values.items()):
+            lines.append('{name}{labels} {value}'.format(name=name, labels=labels(('route', 'method'), key), value=value))
+
+    header('response_cache_lookups_total', 'counter', 'Response cache lookups by result (hit or miss).')
+    for key, value in sorted(total['cache'].items()):
+        lines.append('response_cache_lookups_total{labels} {value}'.format(labels=labels(('result', ), key), value=value))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+from core.words import word_counts
+
+
+def populate_word_frequency(apps, schema_editor):
+    Part = apps.get_model("core", "Part")
+    WordFrequency = apps.get_model("core", "WordFrequency")
+    counts = word_counts(Part.objects.values_list("description", flat=True).iterator())
+    WordFrequency.objects.bulk_create(
+        [WordFrequency(word=w, length=len(w), count=c) for w, c in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_rename_weight_onces_part_weight_ounces"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WordFrequency",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("word", models.CharField(max_length=1024, unique=True)),
+                ("length", models.PositiveIntegerField(default=0)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-count", "word"], name="core_word_count_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(populate_word_frequency, migrations.RunPython.noop),
+    ]
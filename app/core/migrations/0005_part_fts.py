@@ -0,0 +1,35 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_wordfrequency"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE core_part_fts USING fts5(name, description, content='core_part', content_rowid='id');",
+                """CREATE TRIGGER core_part_fts_insert AFTER INSERT ON core_part BEGIN
+                    INSERT INTO core_part_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+                END;""",
+                """CREATE TRIGGER core_part_fts_delete AFTER DELETE ON core_part BEGIN
+                    INSERT INTO core_part_fts(core_part_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                END;""",
+                """CREATE TRIGGER core_part_fts_update AFTER UPDATE OF name, description ON core_part BEGIN
+                    INSERT INTO core_part_fts(core_part_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                    INSERT INTO core_part_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+                END;""",
+                "INSERT INTO core_part_fts(core_part_fts) VALUES ('rebuild');",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS core_part_fts_update;",
+                "DROP TRIGGER IF EXISTS core_part_fts_delete;",
+                "DROP TRIGGER IF EXISTS core_part_fts_insert;",
+                "DROP TABLE IF EXISTS core_part_fts;",
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_part_fts"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(
+                fields=["name", "-created_at"], name="core_part_name_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(
+                fields=["weight_ounces", "name", "-created_at"],
+                name="core_part_weight_name_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:13
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_part_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(fields=["is_active"], name="core_part_active_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(
+                django.db.models.functions.text.Substr("created_at", 1, 10),
+                models.F("created_at"),
+                name="core_part_created_day_idx",
+            ),
+        ),
+    ]
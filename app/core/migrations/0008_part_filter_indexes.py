@@ -0,0 +1,21 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_part_facet_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(fields=["created_at"], name="core_part_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="part",
+            index=models.Index(fields=["updated_at"], name="core_part_updated_idx"),
+        ),
+    ]
@@ -1,8 +1,13 @@
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Substr
 from django.utils import timezone
 
+from core.words import update_word_counts
+from core.cache import invalidate_parts
+
 class Base(models.Model):
     '''
     A Base model
@@ -33,7 +38,10 @@ class Part(Base):
             name=self.name,
             sku=self.sku
         )
-    def save(self, *args, **kwargs):
+    def validate(self):
+        '''
+        Verify the part values; raises an Exception with the error message
+        '''
         if not self.name:
             raise Exception('Name can not be empty')
         if not self.sku:
@@ -42,8 +50,50 @@ class Part(Base):
             raise Exception('weight_ounces must be bigger than 0')
         if self.description and len(self.description) > Part.DESCRIPTION_MAX_LENGHT:
             raise Exception('Description can not be bigger the 1024 chars')
-        
-        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'description' in field_names:
+            instance._loaded_description = instance.description
+        if 'sku' in field_names:
+            instance._loaded_sku = instance.sku
+        return instance
+
+    def loaded_description(self) -> str:
+        '''
+        Returns the description stored on database (before any change in this instance)
+        '''
+        if self._state.adding:
+            return ''
+        if not hasattr(self, '_loaded_description'):
+            return Part.objects.filter(pk=self.pk).values_list('description', flat=True).first() or ''
+        return self._loaded_description
+
+    def save(self, *args, **kwargs):
+        self.validate()
+        update_fields = kwargs.get('update_fields')
+        skus = [getattr(self, '_loaded_sku', None), self.sku]
+        if update_fields is not None and 'description' not in update_fields:
+            super().save(*args, **kwargs)
+            invalidate_parts(skus)
+            return
+
+        old_description = self.loaded_description()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            update_word_counts([old_description], [self.description])
+            invalidate_parts(skus)
+        self._loaded_description = self.description
+        self._loaded_sku = self.sku
+
+    def delete(self, *args, **kwargs):
+        old_description = self.loaded_description()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            update_word_counts([old_description], [])
+            invalidate_parts([getattr(self, '_loaded_sku', None), self.sku])
+        return result
 
     def to_dict(self):
         return {
@@ -58,4 +108,33 @@ class Part(Base):
         } 
     class Meta:
         ordering = ('name', '-created_at', )
+        indexes = [
+            # the default ordering (listing, name search and the cursor pagination)
+            models.Index(fields=['name', '-created_at'], name='core_part_name_created_idx'),
+            # weight search in the default ordering
+            models.Index(fields=['weight_ounces', 'name', '-created_at'], name='core_part_weight_name_idx'),
+            # the facets (core/facets.py): the counts by is_active and by day of creation
+            models.Index(fields=['is_active'], name='core_part_active_idx'),
+            models.Index(Substr('created_at', 1, 10), F('created_at'), name='core_part_created_day_idx'),
+            # the ranges and orderings of the filters (core/filters.py)
+            models.Index(fields=['created_at'], name='core_part_created_idx'),
+            models.Index(fields=['updated_at'], name='core_part_updated_idx'),
+        ]
 
+
+class WordFrequency(models.Model):
+    '''
+    Frequency of the words in the parts descriptions
+    It is kept updated by the Part writes (see core.words.update_word_counts)
+    '''
+    word = models.CharField(max_length=1024, unique=True)
+    length = models.PositiveIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return '{word}: {count}'.format(word=self.word, count=self.count)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count', 'word'], name='core_word_count_idx'),
+        ]
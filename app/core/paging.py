@@ -1,31 +1,222 @@
 from django.conf import settings
+from django.db.models import Q
+
+import base64
+import json
 
 PAGE_SIZE_DEFAULT = 50
 PAGE_SIZE = getattr(settings, 'PAGE_SIZE', PAGE_SIZE_DEFAULT)
+MAX_PAGE_SIZE = getattr(settings, 'MAX_PAGE_SIZE', 500)
+
+def page_size_or_default(page_size:int = None, default:int = None) -> int:
+    '''
+    Returns a valid page size
+    The value is limited to MAX_PAGE_SIZE; falls back to default (or PAGE_SIZE) when not defined
+    '''
+    if not page_size or page_size < 1:
+        return default if default else PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+def pages_of(count:int, page_size:int) -> int:
+    '''
+    Returns the number of pages of count items (at least 1)
+    '''
+    how_many_pages = int(count / page_size if not count % page_size else (count / page_size) + 1)
+    return how_many_pages if how_many_pages > 1 else 1
 
-def paginate_items(items:list, page_size:int = None) -> dict:
-    '''
-    Returns a dict with paginated items     
-    If page_size is not defined: page_size =  settings.PAGE_SIZE or PAGE_SIZE_DEFAULT(5)
-    '''
-    pg_size = page_size if page_size else PAGE_SIZE    
-    paginated_result = {}
-    how_many_pages = int(len(items) / pg_size if not len(items) % pg_size else (len(items) / pg_size) + 1)
-    
-    if how_many_pages < 1:
-        how_many_pages = 1
-    
-    if how_many_pages == 1:
-        paginated_result[1] = items
-        return paginated_result, how_many_pages
-    
-    for i in list(range(0, how_many_pages)):        
-        start = (i*pg_size)
-        end = (pg_size * (i+1))
-        if end > len(items):
-            end = len(items) - 1
-        
-        __items = items[start:end]
-        paginated_result[i+1] = __items
-    
-    return paginated_result, how_many_pages
\ No newline at end of file
+def paginate_queryset(queryset, page:int = 1, page_size:int = None, count:int = None) -> tuple:
+    '''
+    Returns the items of the requested page, the number of pages and the number of items
+    Only the requested page is fetched from database (LIMIT/OFFSET) and
+    the items are counted with a single COUNT query (unless the count is given, see core.counts).
+    If the page is out of range the items are None
+    '''
+    pg_size = page_size if page_size else PAGE_SIZE
+    if count is None:
+        count = queryset.count()
+    how_many_pages = pages_of(count, pg_size)
+
+    if page < 1 or page > how_many_pages:
+        return None, how_many_pages, count
+
+    start = (page - 1) * pg_size
+    items = list(queryset[start:start + pg_size])
+    return items, how_many_pages, count
+
+async def apaginate_queryset(queryset, page:int = 1, page_size:int = None, count:int = None) -> tuple:
+    '''
+    The async version of paginate_queryset (Django's async ORM)
+    '''
+    pg_size = page_size if page_size else PAGE_SIZE
+    if count is None:
+        count = await queryset.acount()
+    how_many_pages = pages_of(count, pg_size)
+
+    if page < 1 or page > how_many_pages:
+        return None, how_many_pages, count
+
+    start = (page - 1) * pg_size
+    items = [item async for item in queryset[start:start + pg_size]]
+    return items, how_many_pages, count
+
+def paginate_without_count(queryset, page:int = 1, page_size:int = None) -> tuple:
+    '''
+    Returns the items of the requested page and if there is a next page, without counting the items
+    (one more item is fetched to know about the next page)
+    '''
+    pg_size = page_size if page_size else PAGE_SIZE
+    if page < 1:
+        return None, False
+    start = (page - 1) * pg_size
+    items = list(queryset[start:start + pg_size + 1])
+    return items[:pg_size], len(items) > pg_size
+
+async def apaginate_without_count(queryset, page:int = 1, page_size:int = None) -> tuple:
+    pg_size = page_size if page_size else PAGE_SIZE
+    if page < 1:
+        return None, False
+    start = (page - 1) * pg_size
+    items = [item async for item in queryset[start:start + pg_size + 1]]
+    return items[:pg_size], len(items) > pg_size
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+def cursor_ordering(queryset) -> list:
+    '''
+    Returns the ordering used by the keyset pagination:
+    the queryset ordering (or the model's Meta.ordering) with the id as tie-breaker
+    '''
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    if not [o for o in ordering if o.lstrip('-') in ('id', 'pk')]:
+        ordering.append('id')
+    return ordering
+
+def encode_cursor(item, ordering:list, direction:str) -> str:
+    '''
+    Returns an opaque cursor with the values of the ordering fields of the item
+    '''
+    values = []
+    for o in ordering:
+        value = getattr(item, o.lstrip('-'))
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    token = json.dumps({'d': direction, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor:str, model, ordering:list) -> tuple:
+    '''
+    Returns the direction and the values of a cursor
+    Raises ValueError if the cursor is not valid
+    '''
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(token)
+        direction, values = data['d'], data['v']
+        if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or len(values) != len(ordering):
+            raise ValueError
+        values = [
+            model._meta.get_field(o.lstrip('-')).to_python(v) for o, v in zip(ordering, values)
+        ]
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return direction, values
+
+def keyset_condition(field:str, lookup:str, value, nullable:bool) -> Q:
+    '''
+    Returns the condition field <lookup> value (gt, gte, lt, lte or exact) in the order of the database,
+    where NULL comes before any value (as SQLite sorts them); the NULLs are considered only if the field is nullable
+    '''
+    if not nullable:
+        return Q(**{field + '__' + lookup: value})
+    if value is None:
+        return {
+            'gt': Q(**{field + '__isnull': False}),
+            'gte': Q(),
+            'lt': Q(pk__in=[]),
+            'lte': Q(**{field + '__isnull': True}),
+            'exact': Q(**{field + '__isnull': True}),
+        }[lookup]
+    condition = Q(**{field + '__' + lookup: value})
+    if lookup in ('lt', 'lte'):
+        condition |= Q(**{field + '__isnull': True})
+    return condition
+
+def keyset_filter(ordering:list, values:list, reverse:bool = False, nullable:tuple = ()) -> Q:
+    '''
+    Returns the filter for the rows after (or before, when reverse) the values on the ordering
+    The first field is also bounded by itself so the database can seek the index
+    The nullable fields may have NULL values (see keyset_condition)
+    '''
+    lookups = []
+    for o in ordering:
+        descending = o.startswith('-')
+        if reverse:
+            descending = not descending
+        lookups.append((o.lstrip('-'), 'lt' if descending else 'gt'))
+
+    keyset = Q()
+    for i, (field, lookup) in enumerate(lookups):
+        condition = keyset_condition(field, lookup, values[i], field in nullable)
+        for j, (previous_field, _) in enumerate(lookups[:i]):
+            condition &= keyset_condition(previous_field, 'exact', values[j], previous_field in nullable)
+        keyset |= condition
+
+    first_field, first_lookup = lookups[0]
+    return keyset_condition(first_field, first_lookup + 'e', values[0], first_field in nullable) & keyset
+
+def cursor_fields(queryset) -> list:
+    '''
+    Returns the fields needed to build the cursors of a queryset
+    '''
+    return [o.lstrip('-') for o in cursor_ordering(queryset)]
+
+def cursor_queryset(queryset, cursor:str = None) -> tuple:
+    '''
+    Returns the queryset of the page after (or before) the cursor, its ordering and the direction
+    Raises ValueError if the cursor is not valid
+    '''
+    ordering = cursor_ordering(queryset)
+    direction = CURSOR_NEXT
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        direction, values = decode_cursor(cursor, queryset.model, ordering)
+        nullable = tuple(f for f in cursor_fields(queryset) if queryset.model._meta.get_field(f).null)
+        queryset = queryset.filter(keyset_filter(ordering, values, reverse=direction == CURSOR_PREVIOUS, nullable=nullable))
+    if direction == CURSOR_PREVIOUS:
+        queryset = queryset.reverse()
+    return queryset, ordering, direction
+
+def cursor_page(items:list, ordering:list, direction:str, cursor:str, page_size:int) -> tuple:
+    '''
+    Returns the items of a page (read with one more item, to know if there are more) and the next and previous cursors
+    '''
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if direction == CURSOR_PREVIOUS:
+        items.reverse()
+        next_cursor = encode_cursor(items[-1], ordering, CURSOR_NEXT) if items else ''
+        previous_cursor = encode_cursor(items[0], ordering, CURSOR_PREVIOUS) if has_more else ''
+    else:
+        next_cursor = encode_cursor(items[-1], ordering, CURSOR_NEXT) if has_more else ''
+        previous_cursor = encode_cursor(items[0], ordering, CURSOR_PREVIOUS) if cursor and items else ''
+    return items, next_cursor, previous_cursor
+
+def paginate_cursor(queryset, cursor:str = None, page_size:int = None) -> tuple:
+    '''
+    Returns the items of a page after (or before) the cursor, the next and the previous cursors
+    The keyset pagination costs the same for any page deep and it is stable during inserts.
+    Raises ValueError if the cursor is not valid
+    '''
+    pg_size = page_size if page_size else PAGE_SIZE
+    queryset, ordering, direction = cursor_queryset(queryset, cursor)
+    items = list(queryset[:pg_size + 1])
+    return cursor_page(items, ordering, direction, cursor, pg_size)
+
+async def apaginate_cursor(queryset, cursor:str = None, page_size:int = None) -> tuple:
+    '''
+    The async version of paginate_cursor (Django's async ORM)
+    '''
+    pg_size = page_size if page_size else PAGE_SIZE
+    queryset, ordering, direction = cursor_queryset(queryset, cursor)
+    items = [item async for item in queryset[:pg_size + 1]]
+    return cursor_page(items, ordering, direction, cursor, pg_size)
@@ -0,0 +1,48 @@
+from django.db import connections
+
+import re
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+def explain(sql:str, params:list = None, using:str = 'default') -> list:
+    '''
+    Returns the details (lines) of the EXPLAIN QUERY PLAN of a query
+    '''
+    with connections[using].cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params or [])
+        return [row[-1] for row in cursor.fetchall()]
+
+def explain_queryset(queryset) -> list:
+    '''
+    Returns the details of the EXPLAIN QUERY PLAN of a queryset
+    '''
+    sql, params = queryset.query.sql_with_params()
+    return explain(sql, params, using=queryset.db)
+
+def plan_problems(details:list) -> list:
+    '''
+    Returns the steps of a query plan that read the whole table (without an index)
+    or sort the rows in a temp B-tree
+    The virtual tables (full-text index) are not considered
+    '''
+    problems = []
+    for detail in details:
+        if FULL_SCAN.match(detail) or TEMP_SORT in detail:
+            problems.append(detail)
+    return problems
+
+def query_plan_problems(queries:list, using:str = 'default') -> dict:
+    '''
+    Returns the plan problems of the SELECTs of a list of captured queries
+    (eg.: django.test.utils.CaptureQueriesContext.captured_queries) by sql
+    '''
+    problems = {}
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        _problems = plan_problems(explain(sql, using=using))
+        if _problems:
+            problems[sql] = _problems
+    return problems
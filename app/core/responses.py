@@ -0,0 +1,260 @@
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+
+from core.models import Part, WordFrequency
+from core.words import tokenize
+from core.errors import error_dict
+from core.serializers import part_rows, encode_rows, encode_object, parse_fields, instance_row, PART_FIELDS
+from core.counts import cached_count, count_mode, COUNT_MODES, COUNT_NONE
+from core.export import EXPORT_FORMATS
+from core.search import search_field, search_value
+from core.paging import paginate_queryset, paginate_without_count, paginate_cursor, apaginate_cursor, page_size_or_default, cursor_fields
+
+from collections import Counter
+from urllib.parse import quote
+
+# The request parsing and the responses shared by the sync (core.views) and the async (core.async_views) APIs
+
+MIN_SIZE_WORD = 3
+WORDS_MOST_COMMON_LIMIT = 5
+WORDS_MAX_LIMIT = getattr(settings, 'WORDS_MAX_LIMIT', 100)
+PAGE_SIZE = 10
+
+def error_response(_exception):
+    '''
+    Returns the {error, field} response of an exception related to a Part field
+    or a 500 response for any other exception
+    '''
+    _error_dict = error_dict(_exception)
+    if not _error_dict['field']:
+        response = HttpResponse()
+        response.status_code = 500
+        response.text = 'An exception has occured'
+        return response
+    return JsonResponse(data=_error_dict, safe=False)
+
+def invalid_search_field_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The parameter is not a search field. The coiches are: {fields}' .format(
+        fields = ', '.join(Part.SEARCH_FIELDS)
+    )
+    return response
+
+def invalid_search_value_response(param):
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The value is not valid for {param}'.format(param=param)
+    return response
+
+def invalid_search_response(param, value):
+    '''
+    Returns the 400 response of an invalid param or value of a search by param/value (None if they are valid)
+    Without param there is no search (all the parts)
+    '''
+    if param is None:
+        return None
+    try:
+        search_field(param)
+    except ValueError:
+        return invalid_search_field_response()
+    try:
+        search_value(param, value)
+    except ValueError:
+        return invalid_search_value_response(param)
+    return None
+
+def invalid_fields_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The fields are not valid. The coiches are: {fields}'.format(
+        fields = ', '.join(PART_FIELDS)
+    )
+    return response
+
+def invalid_count_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The count is not valid. The coiches are: {modes}'.format(
+        modes = ', '.join(COUNT_MODES)
+    )
+    return response
+
+def invalid_cursor_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The cursor is not valid'
+    return response
+
+def no_words_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The query has no words to search for'
+    return response
+
+def invalid_words_params_response():
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The min_size and the limit are not valid. They must be integers (0 or more)'
+    return response
+
+def invalid_list_params_response(fields=None, count=None):
+    '''
+    Returns the 400 response of the invalid fields or count of a list request (None if they are valid)
+    '''
+    try:
+        parse_fields(fields)
+    except ValueError:
+        return invalid_fields_response()
+    try:
+        count_mode(count)
+    except ValueError:
+        return invalid_count_response()
+    return None
+
+def invalid_export_format_response(export_format):
+    '''
+    Returns the 400 response of an unknown export format (None if it is valid)
+    '''
+    if export_format in EXPORT_FORMATS:
+        return None
+    response = HttpResponse()
+    response.status_code = 400
+    response.content = 'The format is not valid. The coiches are: {formats}'.format(
+        formats = ', '.join(EXPORT_FORMATS)
+    )
+    return response
+
+def export_response(stream, export_format):
+    '''
+    Returns the streaming response of an export (stream: the blocks of core.export, sync or async)
+    '''
+    response = StreamingHttpResponse(stream, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = 'attachment; filename="parts.{format}"'.format(format=export_format)
+    return response
+
+def page_url(url, page, **params):
+    '''
+    Returns the url of a page; the other params (eg.: page_size) are kept when they were requested
+    '''
+    _url = url + ('&' if '?' in url else '?') + 'page=' + str(page)
+    for param, value in params.items():
+        if value:
+            _url += '&' + param + '=' + quote(str(value), safe=',')
+    return _url
+
+def page_data(queryset, url, page=1, page_size=None, fields=None, count=None, count_key=None):
+    '''
+    Returns the paginated result of a queryset
+    Only the items of the requested page are fetched and serialized
+    The count (mode: exact, estimate or none) is cached by count_key (see core.counts);
+    without count the pages are None
+    Raises ValueError if the fields or the count are not valid
+    '''
+    _fields = parse_fields(fields)
+    mode = count_mode(count)
+    pg_size = page_size_or_default(page_size, PAGE_SIZE)
+    rows = part_rows(queryset, _fields)
+    if mode == COUNT_NONE:
+        items, has_next = paginate_without_count(rows, page, pg_size)
+        data = page_dict(items, None, url, page, page_size, fields, count, has_next)
+        return data, None, _fields
+
+    total = cached_count(queryset, count_key, mode) if count_key else None
+    items, pages, total = paginate_queryset(rows, page, pg_size, total)
+    data = page_dict(items, pages, url, page, page_size, fields, count)
+    return data, total, _fields
+
+def page_dict(items, pages, url, page=1, page_size=None, fields=None, count=None, has_next=False):
+    '''
+    Returns the page structure (items, pages, current_page, next_page, previous_page)
+    Without pages (not counted) the next page is given by has_next
+    '''
+    data = {}
+    has_next = page < pages if pages is not None else has_next
+    data['items'] = items
+    data['pages'] = pages
+    data['current_page'] = page
+    data['next_page'] = page_url(url, page+1, page_size=page_size, fields=fields, count=count) if has_next else ''
+    data['previous_page'] = page_url(url, page-1, page_size=page_size, fields=fields, count=count) if page > 1 else ''
+    return data
+
+def cursor_data(queryset, cursor, page_size=None, fields=None):
+    '''
+    Returns the keyset paginated result of a queryset
+    Only the requested fields (and the ones of the cursor) are read
+    Raises ValueError if the cursor or the fields are not valid
+    '''
+    _fields = parse_fields(fields)
+    pg_size = page_size_or_default(page_size, PAGE_SIZE)
+    items, next_cursor, prev_cursor = paginate_cursor(cursor_projection(queryset, _fields), cursor, pg_size)
+    return cursor_dict(items, next_cursor, prev_cursor, _fields), _fields
+
+async def acursor_data(queryset, cursor, page_size=None, fields=None):
+    '''
+    The async version of cursor_data
+    '''
+    _fields = parse_fields(fields)
+    pg_size = page_size_or_default(page_size, PAGE_SIZE)
+    items, next_cursor, prev_cursor = await apaginate_cursor(cursor_projection(queryset, _fields), cursor, pg_size)
+    return cursor_dict(items, next_cursor, prev_cursor, _fields), _fields
+
+def cursor_projection(queryset, fields):
+    return queryset.only(*(set(fields) | set(cursor_fields(queryset))))
+
+def cursor_dict(items, next_cursor, prev_cursor, fields):
+    data = {}
+    data['items'] = [instance_row(p, fields) for p in items]
+    data['next_cursor'] = next_cursor
+    data['prev_cursor'] = prev_cursor
+    return data
+
+def json_response(data, fields=None, rows_key='items'):
+    '''
+    Returns the JSON response of data; the data[rows_key] are part rows (see core.serializers.part_rows)
+    encoded without model instances
+    '''
+    rows = data.get(rows_key)
+    encoded = {rows_key: encode_rows(rows, fields or PART_FIELDS)} if rows is not None else {}
+    return HttpResponse(encode_object(data, encoded), content_type='application/json')
+
+def search_page_response(data, total, fields=None):
+    '''
+    Returns the response of a page of a search by param/value (an empty list when nothing was found)
+    '''
+    if not total and not data['items']:
+        return JsonResponse([], safe=False)
+    return json_response(data, fields)
+
+def words_params(min_size:str = None, limit:str = None) -> tuple:
+    '''
+    Returns the valid min_size and limit of the most common words (the defaults when not defined)
+    The limit is limited to WORDS_MAX_LIMIT
+    Raises ValueError if they are not integers or are negative
+    '''
+    _min_size = int(min_size) if min_size else MIN_SIZE_WORD
+    _limit = int(limit) if limit else WORDS_MOST_COMMON_LIMIT
+    if _min_size < 0 or _limit < 0:
+        raise ValueError(min_size if _min_size < 0 else limit)
+    return _min_size, min(_limit, WORDS_MAX_LIMIT)
+
+def common_words(min_size:int = MIN_SIZE_WORD, limit:int = WORDS_MOST_COMMON_LIMIT):
+    '''
+    Returns the (word, count) of the most common words of all parts
+    The words are counted by the WordFrequency table (kept updated by the parts writes)
+    '''
+    return WordFrequency.objects.filter(
+        length__gt=min_size
+    ).order_by('-count', 'word').values_list('word', 'count')[:limit]
+
+def part_words_response(part, sku, min_size:int = MIN_SIZE_WORD, limit:int = WORDS_MOST_COMMON_LIMIT):
+    '''
+    Returns the response of the most common words of a part description (an empty object if there is no part)
+    '''
+    if not part:
+        return JsonResponse(data={})
+    counts = Counter([w for w in tokenize(part.description) if len(w) > min_size])
+    res = {}
+    for k, v in counts.most_common(limit):
+        res[k] = v
+    return JsonResponse(data={'part_sku': sku, 'most_common_words': res })
@@ -0,0 +1,143 @@
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from core.models import Part
+
+import re
+
+FTS_TABLE = 'core_part_fts'
+FTS_COLUMNS = ('name', 'description')
+QUERY_TERMS = re.compile(r'"([^"]*)"|(\S+)')
+
+def quote_term(term:str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def fts_query(text:str, prefix:bool = False, column:str = None) -> str:
+    '''
+    Returns a safe FTS5 MATCH expression of a user query
+    The "quoted" parts are phrases and the words ending with * are prefixes;
+    all the terms must match. If prefix, every word is a prefix.
+    Returns '' if there is no term in the query
+    '''
+    terms = []
+    for phrase, word in QUERY_TERMS.findall(text or ''):
+        if phrase:
+            if re.search(r'\w', phrase):
+                terms.append(quote_term(phrase))
+            continue
+        is_prefix = prefix or word.endswith('*')
+        word = word.rstrip('*')
+        if not re.search(r'\w', word):
+            continue
+        terms.append(quote_term(word) + ('*' if is_prefix else ''))
+    if not terms:
+        return ''
+    expression = ' '.join(terms)
+    if column:
+        expression = column + ' : (' + expression + ')'
+    return expression
+
+def match_ids(expression:str) -> RawSQL:
+    '''
+    Returns the subquery of the parts ids matching a MATCH expression (to be used with id__in)
+    '''
+    return RawSQL('SELECT rowid FROM ' + FTS_TABLE + ' WHERE ' + FTS_TABLE + ' MATCH %s', [expression])
+
+class SearchResult:
+    '''
+    The parts matching a MATCH expression, ordered by rank (bm25)
+    It supports count() and slicing, so it can be paginated as a queryset
+    '''
+    db = 'default'
+
+    def __init__(self, expression:str, fields:tuple = None):
+        self.expression = expression
+        self.fields = fields
+
+    def values_list(self, *fields):
+        '''
+        Returns the result as rows (tuples) of the fields instead of model instances
+        '''
+        return SearchResult(self.expression, fields)
+
+    def count(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(*) FROM ' + FTS_TABLE + ' WHERE ' + FTS_TABLE + ' MATCH %s',
+                [self.expression]
+            )
+            return cursor.fetchone()[0]
+
+    def ids(self, offset:int, limit:int) -> list:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM ' + FTS_TABLE + ' WHERE ' + FTS_TABLE + ' MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, items:slice) -> list:
+        start = items.start or 0
+        ids = self.ids(start, items.stop - start)
+        if self.fields is None:
+            parts = Part.objects.in_bulk(ids)
+        else:
+            rows = Part.objects.filter(id__in=ids).order_by().values_list('id', *self.fields)
+            parts = {row[0]: row[1:] for row in rows}
+        return [parts[i] for i in ids if i in parts]
+
+def search_field(param:str) -> str:
+    '''
+    Returns the param of a search by param/value
+    Raises ValueError if the param is not a search field
+    '''
+    if param not in Part.SEARCH_FIELDS:
+        raise ValueError(param)
+    return param
+
+def search_value(param:str, value:str):
+    '''
+    Returns the value of a search by param/value converted to the type of the field (eg.: an int for weight_ounces)
+    Raises ValueError if the value is not valid for the field
+    '''
+    try:
+        return Part._meta.get_field(search_field(param)).to_python(value)
+    except ValidationError:
+        raise ValueError(value)
+
+def search_filter(param, value):
+    '''
+    Returns the filter args of a search by param/value
+    Raises ValueError if the param is not a search field or the value is not valid for it
+    '''
+    value = search_value(param, value)
+    if param == 'description':
+        # the words of the value are searched (as prefixes) in the full-text index
+        expression = fts_query(value, prefix=True, column='description')
+        if expression:
+            return {'id__in': match_ids(expression)}
+        param = param + '__icontains'
+    return {param: value}
+
+def search_queryset(param:str = None, value:str = None):
+    '''
+    Returns the parts of a search by param/value (all the parts without param)
+    Raises ValueError if the param is not a search field or the value is not valid for it
+    '''
+    if param is None:
+        return Part.objects.all()
+    return Part.objects.filter(**search_filter(param, value))
+
+def parameter_search(param, value, cursor:str = None):
+    '''
+    Returns the parts of a search by param/value; the description words are ordered by relevance
+    (the full-text index sorts the matches) unless they are paginated by cursor
+    Raises ValueError if the param is not a search field or the value is not valid for it
+    '''
+    parts = search_queryset(param, value)
+    if param == 'description' and cursor is None:
+        expression = fts_query(value, prefix=True, column='description')
+        if expression:
+            return SearchResult(expression)
+    return parts
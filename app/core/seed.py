@@ -0,0 +1,210 @@
+from django.db import connection, transaction
+
+from core.db import pragma_statements
+from core.words import update_word_counts
+
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import accumulate
+
+import calendar
+import os
+import random
+import time
+
+# Deterministic catalogs: the same seed and size always give the same parts,
+# and a smaller catalog is a prefix of a bigger one (the parts are generated by blocks)
+SEED = 20240101
+BLOCK_SIZE = 10000
+SKU_PREFIX = 'PU'
+# the skus of the seeded parts are in ['PU', 'PV'): a range seeks the unique sku index (LIKE 'PU%' can not,
+# as it is case insensitive in SQLite)
+SKU_RANGE = (SKU_PREFIX, SKU_PREFIX[:-1] + chr(ord(SKU_PREFIX[-1]) + 1))
+SEEDED_COUNT_SQL = 'SELECT COUNT(*) FROM core_part WHERE sku >= %s AND sku < %s'
+CREATED_SINCE = datetime(2024, 1, 1)
+CREATED_PERIOD = 2 * 365 * 24 * 3600 # seconds
+
+# The pragmas of a bulk load (see bulk_load): no fsync and the rollback journal in memory
+# (a crash during the load may corrupt the database, it is meant for new catalogs)
+BULK_LOAD_PRAGMAS = {'synchronous': 'off', 'journal_mode': 'memory', 'cache_size': -256000, 'temp_store': 'memory'}
+FTS_TABLE = 'core_part_fts'
+
+NAME_ADJECTIVES = [
+    'Heavy', 'Light', 'Compact', 'Reinforced', 'Precision', 'Industrial', 'Micro', 'Macro', 'Dual', 'Rotary',
+    'Thermal', 'Hydraulic', 'Magnetic', 'Flexible', 'Sealed', 'Threaded', 'Galvanized', 'Insulated', 'Modular', 'Adjustable',
+    'Anodized', 'Ceramic', 'Forged', 'Hardened', 'Low-profile', 'Quick-release', 'Self-locking', 'Spring-loaded', 'Tapered', 'Ventilated',
+]
+NAME_NOUNS = [
+    'coil', 'lever', 'bearing', 'gasket', 'bracket', 'valve', 'sensor', 'bolt', 'washer', 'spring',
+    'hinge', 'pulley', 'gear', 'shaft', 'clamp', 'fitting', 'flange', 'nozzle', 'relay', 'switch',
+    'chip', 'connector', 'coupling', 'damper', 'fuse', 'manifold', 'piston', 'rotor', 'sprocket', 'bushing',
+]
+DESCRIPTION_WORDS = [
+    'used', 'for', 'the', 'with', 'and', 'heavy', 'load', 'light', 'duty', 'steel', 'aluminum', 'brass', 'nickel', 'alloy',
+    'copper', 'plastic', 'rubber', 'ceramic', 'titanium', 'coated', 'tightly', 'wound', 'spring', 'attached', 'provide',
+    'inverse', 'leverage', 'computing', 'pressure', 'temperature', 'resistant', 'corrosion', 'vibration', 'high', 'low',
+    'speed', 'torque', 'precision', 'machined', 'standard', 'metric', 'imperial', 'thread', 'mount', 'panel', 'frame',
+    'engine', 'pump', 'motor', 'conveyor', 'hydraulic', 'pneumatic', 'electrical', 'assembly', 'replacement', 'kit',
+    'compatible', 'industrial', 'automotive', 'marine', 'outdoor', 'indoor', 'sealed', 'waterproof', 'dustproof', 'rated',
+    'volts', 'amps', 'watts', 'inch', 'millimeter', 'diameter', 'length', 'width', 'thickness', 'capacity', 'maximum',
+    'minimum', 'operating', 'range', 'designed', 'easy', 'installation', 'maintenance', 'free', 'long', 'life', 'durable',
+    'lightweight', 'compact', 'design', 'reduces', 'noise', 'friction', 'wear', 'improves', 'efficiency', 'performance',
+    'suitable', 'applications', 'systems', 'equipment', 'machinery', 'tools', 'vehicles', 'robotics', 'controls', 'sensors',
+]
+
+def zipf_weights(size:int) -> list:
+    # the first items are the most common (as the words of a real catalog)
+    return [1.0 / (rank + 1) for rank in range(size)]
+
+NAME_ADJECTIVE_WEIGHTS = list(accumulate(zipf_weights(len(NAME_ADJECTIVES))))
+NAME_NOUN_WEIGHTS = list(accumulate(zipf_weights(len(NAME_NOUNS))))
+DESCRIPTION_WEIGHTS = list(accumulate(zipf_weights(len(DESCRIPTION_WORDS))))
+CREATED_SINCE_TIMESTAMP = calendar.timegm(CREATED_SINCE.timetuple())
+SKU_LETTERS = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+
+def part_sku(index:int, rng) -> str:
+    # unique by the index; the random suffix only makes the skus less sequential
+    return '{prefix}{index:08d}{suffix}'.format(
+        prefix=SKU_PREFIX, index=index, suffix=''.join(rng.choice(SKU_LETTERS) for _ in range(3))
+    )
+
+def generate_block(block:int, seed:int = SEED) -> list:
+    '''
+    Returns the rows (name, sku, description, weight_ounces, is_active, created_at) of a block of parts
+    '''
+    rng = random.Random('{seed}:{block}'.format(seed=seed, block=block))
+    # the draws of rng.choices(population, cum_weights) inlined (the same parts, in half of the time)
+    _random = rng.random
+    adjectives, adjectives_total, adjectives_hi = NAME_ADJECTIVE_WEIGHTS, NAME_ADJECTIVE_WEIGHTS[-1], len(NAME_ADJECTIVES) - 1
+    nouns, nouns_total, nouns_hi = NAME_NOUN_WEIGHTS, NAME_NOUN_WEIGHTS[-1], len(NAME_NOUNS) - 1
+    words, words_total, words_hi = DESCRIPTION_WEIGHTS, DESCRIPTION_WEIGHTS[-1], len(DESCRIPTION_WORDS) - 1
+    rows = []
+    for index in range(block * BLOCK_SIZE, (block + 1) * BLOCK_SIZE):
+        name = (
+            NAME_ADJECTIVES[bisect(adjectives, _random() * adjectives_total, 0, adjectives_hi)] + ' ' +
+            NAME_NOUNS[bisect(nouns, _random() * nouns_total, 0, nouns_hi)]
+        )
+        description = ' '.join([
+            DESCRIPTION_WORDS[bisect(words, _random() * words_total, 0, words_hi)] for _ in range(rng.randint(4, 20))
+        ]).capitalize()
+        weight_ounces = min(500, max(1, int(rng.lognormvariate(2.5, 0.9))))
+        is_active = 1 if _random() < 0.9 else 0
+        created_at = time.gmtime(CREATED_SINCE_TIMESTAMP + rng.randrange(CREATED_PERIOD))
+        rows.append((name, part_sku(index, rng), description, weight_ounces, is_active, time.strftime('%Y-%m-%d %H:%M:%S', created_at)))
+    return rows
+
+def generate_parts(count:int, seed:int = SEED, start:int = 0, jobs:int = 1):
+    '''
+    Yields the rows of the parts start..count-1 of the catalog of a seed
+    With jobs > 1 the blocks are generated by that many processes (a few blocks ahead of the consumer)
+    '''
+    blocks = range(start // BLOCK_SIZE, (count + BLOCK_SIZE - 1) // BLOCK_SIZE)
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            for i in range(0, len(blocks), jobs * 2):
+                chunk = blocks[i:i + jobs * 2]
+                for block, rows in zip(chunk, executor.map(generate_block, chunk, [seed] * len(chunk))):
+                    yield from block_rows(block, rows, start, count)
+        return
+    for block in blocks:
+        yield from block_rows(block, generate_block(block, seed), start, count)
+
+def block_rows(block:int, rows:list, start:int, count:int):
+    first = block * BLOCK_SIZE
+    for offset, row in enumerate(rows):
+        if start <= first + offset < count:
+            yield row
+
+def seeded_count() -> int:
+    '''
+    Returns how many parts of the seeded catalog are on database
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(SEEDED_COUNT_SQL, SKU_RANGE)
+        return cursor.fetchone()[0]
+
+def insert_parts(rows, batch_size:int = BLOCK_SIZE, progress=None):
+    '''
+    Inserts part rows (executemany by batch, one transaction by batch) and updates the word frequency table
+    progress (optional) is called with the number of inserted rows after each batch
+    '''
+    inserted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            inserted += insert_batch(batch)
+            batch = []
+            if progress:
+                progress(inserted)
+    if batch:
+        inserted += insert_batch(batch)
+        if progress:
+            progress(inserted)
+    return inserted
+
+def insert_batch(batch:list) -> int:
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO core_part (name, sku, description, weight_ounces, is_active, created_at) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            batch
+        )
+        update_word_counts([], [row[2] for row in batch])
+    return len(batch)
+
+def seed_catalog(count:int, seed:int = SEED, batch_size:int = BLOCK_SIZE, progress=None, jobs:int = 1) -> int:
+    '''
+    Makes the seeded catalog have count parts (the missing ones are inserted)
+    Returns how many parts were inserted
+    '''
+    existent = seeded_count()
+    if existent >= count:
+        return 0
+    return insert_parts(generate_parts(count, seed, start=existent, jobs=jobs), batch_size, progress)
+
+def pragma_values(cursor, names) -> dict:
+    values = {}
+    for name in names:
+        cursor.execute('PRAGMA ' + name)
+        values[name] = cursor.fetchone()[0]
+    return values
+
+@contextmanager
+def bulk_load():
+    '''
+    Makes the inserts of the parts in the block faster: sets the BULK_LOAD_PRAGMAS and drops the part's
+    indexes (but the unique sku) and full-text triggers; at the end the indexes and triggers are created again,
+    the full-text index is rebuilt and the pragmas are restored
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE tbl_name = 'core_part' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        )
+        schema = cursor.fetchall()
+        # the pragmas can not be changed in a transaction (then only the indexes and triggers are dropped)
+        pragmas = {} if connection.in_atomic_block else BULK_LOAD_PRAGMAS
+        previous = pragma_values(cursor, pragmas)
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
+        for _type, name, _ in schema:
+            cursor.execute('DROP {type} IF EXISTS "{name}"'.format(type=_type.upper(), name=name))
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _type, _, sql in schema:
+                cursor.execute(sql)
+            if any(_type == 'trigger' for _type, _, _ in schema):
+                cursor.execute("INSERT INTO " + FTS_TABLE + "(" + FTS_TABLE + ") VALUES ('rebuild')")
+            for statement in pragma_statements(previous):
+                cursor.execute(statement)
+
+def catalog_path(db_dir:str, count:int, seed:int = SEED) -> str:
+    '''
+    Returns the SQLite file of the catalog of a size and seed (see the benchmark and load_test commands)
+    '''
+    return os.path.join(db_dir, 'catalog-{seed}-{count}.sqlite3'.format(seed=seed, count=count))
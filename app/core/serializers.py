@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import Substr
+
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+import json
+
+# the fields (and its order) of Part.to_dict
+PART_FIELDS = ('id', 'name', 'sku', 'description', 'weight_ounces', 'is_active', 'created_at', 'updated_at')
+INTEGER_FIELDS = ('id', 'weight_ounces', 'is_active')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+# the format of the datetimes stored by Django on SQLite ('YYYY-MM-DD HH:MM:SS[.ffffff]', in UTC)
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SQLITE_DATETIME_LENGTH = 19
+
+def parse_fields(fields:str = None) -> tuple:
+    '''
+    Returns the fields of a comma separated list (eg.: ?fields=sku,name) in the PART_FIELDS order
+    or all the PART_FIELDS if it is not defined
+    Raises ValueError if a field is not a Part's field
+    '''
+    if fields is None:
+        return PART_FIELDS
+    requested = set(f.strip() for f in fields.split(',') if f.strip())
+    if not requested or requested - set(PART_FIELDS):
+        raise ValueError(fields)
+    return tuple(f for f in PART_FIELDS if f in requested)
+
+def instance_row(instance, fields:tuple = PART_FIELDS) -> tuple:
+    '''
+    Returns a model instance as a row of the fields
+    '''
+    return tuple(getattr(instance, f) for f in fields)
+
+def sql_datetimes(queryset) -> bool:
+    '''
+    Verify if the datetimes can be formatted by the database (a substring of the stored text)
+    instead of parsing and formatting (strftime) them in Python
+    '''
+    return settings.FORMAT_DATETIME == SQLITE_DATETIME_FORMAT and connections[queryset.db].vendor == 'sqlite'
+
+def part_rows(queryset, fields:tuple = PART_FIELDS):
+    '''
+    Returns the queryset as a values_list of the fields (no model instances)
+    The datetimes come formatted from the database when it is possible (see sql_datetimes)
+    '''
+    if not sql_datetimes(queryset):
+        return queryset.values_list(*fields)
+    columns = [
+        Substr(f, 1, SQLITE_DATETIME_LENGTH) if f in DATETIME_FIELDS else f for f in fields
+    ]
+    return queryset.values_list(*columns)
+
+def encode_integer(value):
+    return 'null' if value is None else int.__repr__(value)
+
+def encode_string(value):
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+def encode_datetime(value):
+    if not value:
+        return '""'
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return encode_basestring_ascii(value.strftime(settings.FORMAT_DATETIME))
+
+def field_encoder(field:str):
+    if field in INTEGER_FIELDS:
+        return encode_integer
+    if field in DATETIME_FIELDS:
+        return encode_datetime
+    return encode_string
+
+@lru_cache(maxsize=64)
+def row_encoder(fields:tuple = PART_FIELDS):
+    '''
+    Returns a function that encodes a row (a tuple of the fields) as a JSON object
+    The output is the same of json.dumps(part.to_dict()) (the JsonResponse format)
+    '''
+    template = '{' + ', '.join(encode_basestring_ascii(f) + ': %s' for f in fields) + '}'
+    namespace = {'template': template}
+    values = []
+    for i, f in enumerate(fields):
+        namespace['encode_' + str(i)] = field_encoder(f)
+        values.append('encode_{i}(row[{i}])'.format(i=i))
+    # the encoder is compiled once by fields: no loop and no zip by row
+    source = 'def encode(row):\n    return template % (' + ', '.join(values) + ', )\n'
+    exec(source, namespace)
+    return namespace['encode']
+
+def row_dict(row, fields:tuple = PART_FIELDS) -> dict:
+    '''
+    Returns a row as a dict (the same of Part.to_dict)
+    '''
+    part = dict(zip(fields, row))
+    for f in DATETIME_FIELDS:
+        if f not in part:
+            continue
+        value = part[f]
+        if not value:
+            part[f] = ''
+        elif not isinstance(value, str):
+            part[f] = value.strftime(settings.FORMAT_DATETIME)
+    return part
+
+def encode_rows(rows, fields:tuple = PART_FIELDS) -> str:
+    '''
+    Returns a list of rows encoded as a JSON array
+    '''
+    encode = row_encoder(fields)
+    return '[' + ', '.join([encode(row) for row in rows]) + ']'
+
+def encode_object(data:dict, encoded:dict = None) -> str:
+    '''
+    Returns a dict encoded as a JSON object; the values in encoded are already JSON
+    (eg.: the encoded items of a page)
+    '''
+    encoded = encoded or {}
+    items = []
+    for key, value in data.items():
+        items.append(encode_basestring_ascii(key) + ': ' + (encoded[key] if key in encoded else json.dumps(value)))
+    return '{' + ', '.join(items) + '}'
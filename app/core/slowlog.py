@@ -0,0 +1,188 @@
+from django.conf import settings
+
+from core.metrics import current_request
+
+from logging.handlers import QueueHandler, QueueListener
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+LOGGER_NAME = 'core.slow_queries'
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+BLANKS = re.compile(r'\s+')
+
+_listener = {'pid': None, 'listener': None}
+_lock = threading.Lock()
+
+def slow_query_logger():
+    '''
+    Returns the slow query logger; its records are written to SLOW_QUERY_LOG by a thread
+    (the request does not wait for the file)
+    '''
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener['pid'] == os.getpid():
+        return logger
+    with _lock:
+        if _listener['pid'] != os.getpid():
+            path = settings.SLOW_QUERY_LOG
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            records = queue.Queue()
+            listener = QueueListener(records, logging.FileHandler(path))
+            listener.start()
+            logger.handlers = [QueueHandler(records)]
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _listener.update(pid=os.getpid(), listener=listener)
+    return logger
+
+def stop_slow_query_logger():
+    '''
+    Writes the pending records and stops the logger's thread
+    '''
+    with _lock:
+        if _listener['listener'] is not None and _listener['pid'] == os.getpid():
+            _listener['listener'].stop()
+        _listener.update(pid=None, listener=None)
+
+def fingerprint(sql:str) -> str:
+    '''
+    Returns the query without its values (the same fingerprint for the same query with other params)
+    '''
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    return BLANKS.sub(' ', sql).strip()
+
+def query_plan(connection, sql:str, params) -> list:
+    '''
+    Returns the details of the query plan of a query (by a cursor without the execute wrappers)
+    '''
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')):
+        return []
+    try:
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(connection.ops.explain_prefix + ' ' + sql, params or [])
+            return [str(row[-1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as _exception:
+        return ['EXPLAIN failed: ' + str(_exception)]
+
+def request_view() -> tuple:
+    '''
+    Returns the view name and the route of the current request (or None)
+    '''
+    stats = current_request.get()
+    request = stats.get('request') if stats else None
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    return match.url_name, request.path
+
+def slow_query_log(execute, sql, params, many, context):
+    '''
+    Execute wrapper (installed on every connection): logs the queries slower than SLOW_QUERY_THRESHOLD_MS
+    '''
+    if not getattr(settings, 'SLOW_QUERY_ENABLED', True):
+        return execute(sql, params, many, context)
+    rows = None
+    if many:
+        params, first, rows = first_params(params)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - start) * 1000
+        if duration >= getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100):
+            if many:
+                log_slow_query(context['connection'], sql, first, duration, rows)
+            else:
+                log_slow_query(context['connection'], sql, params, duration)
+
+def first_params(param_list) -> tuple:
+    '''
+    Returns the params of an executemany (the same values; an iterator is not consumed), its first parameter set
+    and the number of sets (None if it is not known)
+    '''
+    if isinstance(param_list, (list, tuple)):
+        return param_list, (param_list[0] if param_list else None), len(param_list)
+    param_list = iter(param_list)
+    first = next(param_list, None)
+    if first is None:
+        return [], None, 0
+    return itertools.chain([first], param_list), first, None
+
+def log_slow_query(connection, sql, params, duration:float, rows:int = None):
+    '''
+    Writes a slow query entry; the params of an executemany are its first parameter set
+    '''
+    view, path = request_view()
+    _fingerprint = fingerprint(sql)
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'duration_ms': round(duration, 3),
+        'fingerprint': hashlib.md5(_fingerprint.encode()).hexdigest()[:12],
+        'query': _fingerprint,
+        'sql': sql,
+        'params': params,
+        'view': view,
+        'path': path,
+        'plan': query_plan(connection, sql, params),
+    }
+    if rows is not None:
+        entry['rows'] = rows
+    slow_query_logger().info(json.dumps(entry, default=str))
+
+def install_slow_query_log(sender, connection, **kwargs):
+    '''
+    connection_created receiver: installs slow_query_log on the new connection
+    '''
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
+
+def read_slow_queries(path:str):
+    '''
+    Yields the entries of a slow query log file (the invalid lines are skipped)
+    '''
+    with open(path) as _file:
+        for line in _file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def worst_queries(entries, limit:int = 10) -> list:
+    '''
+    Returns the fingerprints of the entries ordered by their total time (the worst first)
+    with the count, total/mean/max duration, the views and the plan of the slowest run
+    '''
+    summary = {}
+    for entry in entries:
+        item = summary.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'query': entry['query'], 'count': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'plan': [],
+        })
+        item['count'] += 1
+        item['total_ms'] += entry['duration_ms']
+        if entry.get('view'):
+            item['views'].add(entry['view'])
+        if entry['duration_ms'] >= item['max_ms']:
+            item['max_ms'] = entry['duration_ms']
+            item['plan'] = entry.get('plan') or []
+    worst = sorted(summary.values(), key=lambda item: item['total_ms'], reverse=True)[:limit]
+    for item in worst:
+        item['mean_ms'] = round(item['total_ms'] / item['count'], 3)
+        item['total_ms'] = round(item['total_ms'], 3)
+        item['views'] = sorted(item['views'])
+    return worst
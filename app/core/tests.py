@@ -1,12 +1,48 @@
 
 import django
-from django.test import TestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, OperationalError
+from django.http import JsonResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+from asgiref.sync import sync_to_async
+
+from datetime import datetime, timedelta
+from io import StringIO
+from urllib.parse import parse_qsl
+from unittest import mock
+
+import asyncio
 import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
 import random
 from string import ascii_uppercase
 
-from core.models import Part
+from core.models import Part, WordFrequency
+from core.responses import WORDS_MAX_LIMIT
+from core.cache import response_cache, catalog_generation, sku_generation
+from core.serializers import part_rows, encode_rows, encode_object
+from core.queryplan import query_plan_problems, plan_problems, explain, explain_queryset
+from core.loadgen import run_load, run_open_loop, percentile
+from core.db import pragma_statements
+from core.writer import GroupCommitWriter, WRITER_STATS
+from core.counts import cached_count, acached_count, COUNT_ESTIMATE
+from core.metrics import metrics, collect as collect_metrics
+from core.slowlog import fingerprint, read_slow_queries, stop_slow_query_logger
+from core.imports import Checkpoint, import_file
+from core.seed import generate_block, generate_parts, seed_catalog, seeded_count, BLOCK_SIZE, SEEDED_COUNT_SQL, SKU_RANGE
+from core.views import create_part
+from core.export import export_stream, EXPORT_FORMATS
+from core.filters import parse_filters, indexed_orders, ORDER_BY
+from core.management.commands.load_test import parse_mix, request_mix, count_locked_errors
 
 SKU_MAX_SIZE = 30
 
@@ -392,3 +428,1433 @@ class PartTestCase(TestCase):
         part_dict = part.to_dict()
         self.assertDictContainsSubset({'name':'Heavy coil', 'sku': _sku, 'description': 'Tightly wound nickel-gravy alloy spring', 'weight_ounces':22, 'is_active':1}, part_dict)
 
+
+class PaginationTestCase(TestCase):
+    '''
+    Tests for the database pagination
+    '''
+    PARTS_GET_URL = '/api/parts'
+
+    def setUp(self):
+        for i in range(0, 12):
+            Part.objects.create(
+                name = 'Paged part {i:02d}'.format(i=i),
+                sku = get_a_random_sku(),
+                description = 'Some paged part',
+                weight_ounces = 10,
+                is_active = 1
+            )
+        return super().setUp()
+
+    def test_page_size(self):
+        total = Part.objects.count()
+        res = self.client.get(PaginationTestCase.PARTS_GET_URL + '?page=2&page_size=5')
+        result = res.json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(result.get('items')), 5)
+        self.assertEqual(result.get('pages'), (total + 4) // 5)
+        self.assertEqual(result.get('current_page'), 2)
+        self.assertEqual(result.get('next_page'), '/api/parts?page=3&page_size=5')
+        self.assertEqual(result.get('previous_page'), '/api/parts?page=1&page_size=5')
+
+    def test_pages_cover_all_items(self):
+        skus = []
+        page = 1
+        while True:
+            result = self.client.get(PaginationTestCase.PARTS_GET_URL + '?page={page}&page_size=4'.format(page=page)).json()
+            skus += [p.get('sku') for p in result.get('items')]
+            if not result.get('next_page'):
+                break
+            page += 1
+        self.assertEqual(sorted(skus), sorted(Part.objects.values_list('sku', flat=True)))
+
+    def test_page_queries(self):
+        # Only a COUNT and the page SELECT are executed
+        with self.assertNumQueries(2):
+            self.client.get(PaginationTestCase.PARTS_GET_URL + '?page=1&page_size=5')
+
+    def test_page_out_of_range(self):
+        result = self.client.get(PaginationTestCase.PARTS_GET_URL + '?page=1000').json()
+        self.assertIsNone(result.get('items'))
+        self.assertEqual(result.get('next_page'), '')
+
+class CursorPaginationTestCase(TestCase):
+    '''
+    Tests for the keyset (cursor) pagination
+    '''
+    PARTS_GET_URL = '/api/parts'
+
+    def setUp(self):
+        for i in range(0, 12):
+            Part.objects.create(
+                name = 'Cursor part {i:02d}'.format(i=i % 4), # repeated names to check the tie-breaker
+                sku = get_a_random_sku(),
+                description = 'Some cursor part',
+                weight_ounces = 7,
+                is_active = 1
+            )
+        return super().setUp()
+
+    def walk(self, url):
+        skus = []
+        result = self.client.get(url + '?cursor=&page_size=5').json()
+        pages = [result]
+        skus += [p.get('sku') for p in result.get('items')]
+        while result.get('next_cursor'):
+            result = self.client.get(url + '?page_size=5&cursor=' + result.get('next_cursor')).json()
+            pages.append(result)
+            skus += [p.get('sku') for p in result.get('items')]
+        return skus, pages
+
+    def test_cursor_walks_all_items_in_order(self):
+        skus, _ = self.walk(CursorPaginationTestCase.PARTS_GET_URL)
+        expected = list(Part.objects.order_by('name', '-created_at', 'id').values_list('sku', flat=True))
+        self.assertEqual(skus, expected)
+
+    def test_cursor_previous_page(self):
+        _, pages = self.walk(CursorPaginationTestCase.PARTS_GET_URL)
+        last = pages[-1]
+        result = self.client.get(CursorPaginationTestCase.PARTS_GET_URL + '?page_size=5&cursor=' + last.get('prev_cursor')).json()
+        self.assertEqual(result.get('items'), pages[-2].get('items'))
+        self.assertEqual(pages[0].get('prev_cursor'), '')
+
+    def test_cursor_stable_with_inserts(self):
+        url = CursorPaginationTestCase.PARTS_GET_URL + '/param=weight_ounces/value=7'
+        first = self.client.get(url + '?cursor=&page_size=5').json()
+        Part.objects.create(name='Aaa inserted part', sku=get_a_random_sku(), description='', weight_ounces=7)
+        second = self.client.get(url + '?page_size=5&cursor=' + first.get('next_cursor')).json()
+        first_skus = [p.get('sku') for p in first.get('items')]
+        self.assertFalse(set(first_skus) & set(p.get('sku') for p in second.get('items')))
+
+    def test_invalid_cursor(self):
+        res = self.client.get(CursorPaginationTestCase.PARTS_GET_URL + '?cursor=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+class ExportTestCase(TestCase):
+    '''
+    Tests for the streaming export
+    '''
+    EXPORT_URL = '/api/parts/export'
+
+    def test_export_ndjson(self):
+        res = self.client.get(ExportTestCase.EXPORT_URL + '?format=ndjson')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        parts = [json.loads(line) for line in lines]
+        self.assertEqual(len(parts), Part.objects.count())
+        part = Part.objects.get(sku=parts[0].get('sku'))
+        self.assertEqual(parts[0], part.to_dict())
+
+    def test_export_csv_filtered(self):
+        res = self.client.get(ExportTestCase.EXPORT_URL + '?format=csv&param=name&value=Macrochip')
+        self.assertEqual(res.status_code, 200)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,sku,description,weight_ounces,is_active,created_at,updated_at')
+        self.assertEqual(len(lines), Part.objects.filter(name='Macrochip').count() + 1)
+
+    def test_export_invalid_format(self):
+        res = self.client.get(ExportTestCase.EXPORT_URL + '?format=xml')
+        self.assertEqual(res.status_code, 400)
+
+class BulkCreateTestCase(TestCase):
+    '''
+    Tests for the bulk creation of parts
+    '''
+    PARTS_BULK = '/api/parts/bulk'
+
+    def part_data(self, **kwargs):
+        data = {
+            'name': 'some-bulk-part',
+            'sku': get_a_random_sku(),
+            'description': 'some description text',
+            'weight_ounces': 10,
+            'is_active': 1
+        }
+        data.update(kwargs)
+        return data
+
+    def test_bulk_create(self):
+        items = [self.part_data() for i in range(0, 20)]
+        with self.assertNumQueries(5): # IN query, savepoint, INSERT, word counts, release savepoint
+            res = self.client.post(BulkCreateTestCase.PARTS_BULK, data=json.dumps(items), content_type='application/json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'created': 20, 'errors': []})
+        self.assertEqual(Part.objects.filter(name='some-bulk-part').count(), 20)
+
+    def test_bulk_create_errors(self):
+        existent_sku = Part.objects.all().first().sku
+        repeated_sku = get_a_random_sku()
+        items = [
+            self.part_data(),
+            self.part_data(name=''),
+            self.part_data(sku=existent_sku),
+            self.part_data(description='text' * 1024),
+            self.part_data(sku=repeated_sku),
+            self.part_data(sku=repeated_sku),
+        ]
+        res = self.client.post(BulkCreateTestCase.PARTS_BULK, data=json.dumps(items), content_type='application/json')
+        result = res.json()
+        self.assertEqual(result.get('created'), 2)
+        self.assertEqual(
+            [(e.get('index'), e.get('field')) for e in result.get('errors')],
+            [(1, 'name'), (2, 'sku'), (3, 'description'), (5, 'sku')]
+        )
+        self.assertIsNotNone(Part.objects.filter(sku=repeated_sku).first())
+
+class BulkUpsertTestCase(TestCase):
+    '''
+    Tests for the bulk upsert (by sku) of parts
+    '''
+    PARTS_BULK = '/api/parts/bulk'
+
+    def test_bulk_upsert(self):
+        part = Part.objects.get(sku=PartsRequestsTestCase.SKU_SAMPLE)
+        unchanged = Part.objects.exclude(sku=part.sku).first()
+        new_sku = get_a_random_sku()
+        items = [
+            {'name': part.name, 'sku': part.sku, 'description': 'A new description', 'weight_ounces': 3, 'is_active': 1},
+            {'name': unchanged.name, 'sku': unchanged.sku, 'description': unchanged.description, 'weight_ounces': unchanged.weight_ounces, 'is_active': unchanged.is_active},
+            {'name': 'some-upsert-part', 'sku': new_sku, 'description': 'some text', 'weight_ounces': 1, 'is_active': 1},
+            {'name': '', 'sku': get_a_random_sku(), 'description': 'some text', 'weight_ounces': 1, 'is_active': 1},
+        ]
+        res = self.client.put(BulkUpsertTestCase.PARTS_BULK, data=json.dumps(items), content_type='application/json')
+        result = res.json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((result.get('created'), result.get('updated'), result.get('unchanged')), (1, 1, 1))
+        self.assertEqual([e.get('index') for e in result.get('errors')], [3])
+
+        part.refresh_from_db()
+        self.assertEqual(part.description, 'A new description')
+        self.assertEqual(part.weight_ounces, 3)
+        self.assertIsNotNone(part.updated_at)
+        updated_at = unchanged.updated_at
+        unchanged.refresh_from_db()
+        self.assertEqual(unchanged.updated_at, updated_at)
+        self.assertIsNotNone(Part.objects.filter(sku=new_sku).first())
+
+class SkusLookupTestCase(TestCase):
+    '''
+    Tests for the multi-sku lookup
+    '''
+    PARTS_SKUS_GET = '/api/parts/skus={skus}'
+    PARTS_SKUS_POST = '/api/parts/skus'
+
+    def test_skus_lookup(self):
+        skus = list(Part.objects.values_list('sku', flat=True)[:2])
+        with self.assertNumQueries(1):
+            res = self.client.get(SkusLookupTestCase.PARTS_SKUS_GET.format(skus=','.join(skus + ['SOME-INEXISTENT-SKU'])))
+        result = res.json()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sorted(result.get('parts').keys()), sorted(skus))
+        self.assertEqual(result.get('parts').get(skus[0]), Part.objects.get(sku=skus[0]).to_dict())
+        self.assertEqual(result.get('not_found'), ['SOME-INEXISTENT-SKU'])
+
+    def test_skus_lookup_post(self):
+        res = self.client.post(
+            SkusLookupTestCase.PARTS_SKUS_POST,
+            data=json.dumps({'skus': [PartsRequestsTestCase.SKU_SAMPLE, 'SOME-INEXISTENT-SKU']}),
+            content_type='application/json'
+        )
+        result = res.json()
+        self.assertEqual(list(result.get('parts').keys()), [PartsRequestsTestCase.SKU_SAMPLE])
+        self.assertEqual(result.get('not_found'), ['SOME-INEXISTENT-SKU'])
+
+class WordFrequencyTestCase(TestCase):
+    '''
+    Tests for the word frequency index
+    '''
+    PARTS_MOST_COMMON_WORDS = '/api/parts/mostcommonwords'
+
+    def count(self, word):
+        frequency = WordFrequency.objects.filter(word=word).first()
+        return frequency.count if frequency else 0
+
+    def test_word_counts_follow_writes(self):
+        part = Part.objects.create(name='Word part', sku=get_a_random_sku(), description='gizmo gizmo widget')
+        self.assertEqual(self.count('gizmo'), 2)
+        self.assertEqual(self.count('widget'), 1)
+
+        part = Part.objects.get(pk=part.pk)
+        part.description = 'gizmo sprocket'
+        part.save()
+        self.assertEqual(self.count('gizmo'), 1)
+        self.assertEqual(self.count('widget'), 0)
+        self.assertEqual(self.count('sprocket'), 1)
+
+        part.delete()
+        self.assertEqual(self.count('gizmo'), 0)
+        self.assertFalse(WordFrequency.objects.filter(word='sprocket').exists())
+
+    def test_most_common_words(self):
+        for i in range(0, 3):
+            Part.objects.create(name='Word part', sku=get_a_random_sku(), description='flange, flange and bracket.')
+        with self.assertNumQueries(1):
+            res = self.client.get(WordFrequencyTestCase.PARTS_MOST_COMMON_WORDS + '?min_size=4&limit=2')
+        result = res.json()
+        self.assertEqual(list(result.items()), [('flange', 6), ('bracket', 3)])
+
+    def test_most_common_words_params(self):
+        for query in ('?min_size=-1&limit=-5', '?limit=-1', '?min_size=abc', '?limit=1.5'):
+            res = self.client.get(WordFrequencyTestCase.PARTS_MOST_COMMON_WORDS + query)
+            self.assertEqual(res.status_code, 400)
+            res = self.client.get('/api/part/sku={sku}/mostcommonwords'.format(sku=PartsRequestsTestCase.SKU_SAMPLE) + query)
+            self.assertEqual(res.status_code, 400)
+
+        for i in range(0, WORDS_MAX_LIMIT + 1):
+            WordFrequency.objects.create(word='word{i}'.format(i=i), length=6, count=1)
+        res = self.client.get(WordFrequencyTestCase.PARTS_MOST_COMMON_WORDS + '?limit=100000')
+        self.assertEqual(len(res.json()), WORDS_MAX_LIMIT)
+
+    def test_word_counts_follow_bulk_writes(self):
+        sku = get_a_random_sku()
+        items = [{'name': 'Word part', 'sku': sku, 'description': 'cog cog', 'weight_ounces': 1, 'is_active': 1}]
+        self.client.post('/api/parts/bulk', data=json.dumps(items), content_type='application/json')
+        self.assertEqual(self.count('cog'), 2)
+        items[0]['description'] = 'cog'
+        self.client.put('/api/parts/bulk', data=json.dumps(items), content_type='application/json')
+        self.assertEqual(self.count('cog'), 1)
+
+    def test_rebuild_word_index(self):
+        expected = dict(WordFrequency.objects.values_list('word', 'count'))
+        WordFrequency.objects.all().delete()
+        call_command('rebuild_word_index', stdout=StringIO())
+        self.assertEqual(dict(WordFrequency.objects.values_list('word', 'count')), expected)
+
+class FullTextSearchTestCase(TestCase):
+    '''
+    Tests for the full-text search
+    '''
+    PARTS_SEARCH = '/api/parts/search?q={q}'
+
+    def setUp(self):
+        Part.objects.create(name='Flux capacitor', sku=get_a_random_sku(), description='Makes time travel possible with plutonium')
+        Part.objects.create(name='Plutonium cell', sku=get_a_random_sku(), description='A power source for the capacitor')
+        return super().setUp()
+
+    def search(self, q):
+        res = self.client.get(FullTextSearchTestCase.PARTS_SEARCH.format(q=q))
+        self.assertEqual(res.status_code, 200)
+        return [p.get('name') for p in res.json().get('items')]
+
+    def test_search_ranked(self):
+        # name and description are searched
+        self.assertEqual(sorted(self.search('plutonium')), ['Flux capacitor', 'Plutonium cell'])
+        self.assertEqual(self.search('capacitor power'), ['Plutonium cell'])
+
+    def test_search_prefix_and_phrase(self):
+        self.assertEqual(self.search('plut*'), self.search('plutonium'))
+        self.assertEqual(self.search('"time travel"'), ['Flux capacitor'])
+        self.assertEqual(self.search('"travel time"'), [])
+
+    def test_search_follows_writes(self):
+        part = Part.objects.get(name='Flux capacitor')
+        part.description = 'Now with hoverboard support'
+        part.save()
+        self.assertEqual(self.search('hoverboard'), ['Flux capacitor'])
+        self.assertEqual(self.search('"time travel"'), [])
+        part.delete()
+        self.assertEqual(self.search('hoverboard'), [])
+
+    def test_search_invalid_query(self):
+        res = self.client.get(FullTextSearchTestCase.PARTS_SEARCH.format(q='%22*%22'))
+        self.assertEqual(res.status_code, 400)
+
+    def test_description_search_uses_the_index(self):
+        res = self.client.get('/api/parts/param=description/value=plut')
+        self.assertEqual([p.get('name') for p in res.json().get('items')], ['Flux capacitor'])
+
+    def test_search_invalid_value(self):
+        for url in ('/api/parts/param=weight_ounces/value=abc', '/api/parts/export?format=csv&param=weight_ounces&value=abc',
+                    '/api/parts/facets?param=weight_ounces&value=abc'):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 400, url)
+            self.assertEqual(res.content, b'The value is not valid for weight_ounces', url)
+        res = self.client.get('/api/parts/param=weight/value=1')
+        self.assertTrue(res.content.startswith(b'The parameter is not a search field'))
+
+class QueryPlanTestCase(TestCase):
+    '''
+    Checks the query plans of the endpoints: no full table scan and no temp B-tree sort
+    '''
+    ENDPOINTS = [
+        '/api/parts',
+        '/api/parts?page=2&page_size=1',
+        '/api/parts?cursor=&page_size=1',
+        '/api/part/sku=OWDD823011DJSD',
+        '/api/parts/param=name/value=Macrochip',
+        '/api/parts/param=sku/value=OWDD823011DJSD',
+        '/api/parts/param=weight_ounces/value=22',
+        '/api/parts/param=weight_ounces/value=22?cursor=',
+        '/api/parts/param=description/value=heavy',
+        '/api/parts/search?q=heavy',
+        '/api/parts/skus=OWDD823011DJSD,SDJDDH8223DHJ',
+        '/api/parts/mostcommonwords',
+        '/api/part/sku=OWDD823011DJSD/mostcommonwords',
+        '/api/parts/facets',
+        '/api/parts/filter?is_active=1&weight_ounces__gte=10&weight_ounces__lt=30',
+        '/api/parts/filter?name__prefix=Heavy&order_by=-name',
+        '/api/parts/filter?sku__prefix=OWDD&order_by=sku',
+        '/api/parts/filter?created_at__gte=2020-01-01&order_by=-created_at',
+        '/api/parts/filter?updated_at__lt=2020-01-01&order_by=updated_at&cursor=',
+        '/api/parts/filter?order_by=-updated_at&cursor=',
+        '/api/parts/filter?order_by=-name&cursor=',
+    ]
+
+    def assertQueryPlans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(query_plan_problems(context.captured_queries), {}, url)
+
+    def test_query_plans(self):
+        for url in QueryPlanTestCase.ENDPOINTS:
+            self.assertQueryPlans(url)
+
+    def test_cursor_query_plan(self):
+        url = '/api/parts/param=weight_ounces/value=22?page_size=1&cursor='
+        Part.objects.create(name='Heavy coil', sku=get_a_random_sku(), description='Another coil', weight_ounces=22)
+        result = self.client.get(url).json()
+        self.assertQueryPlans(url + result.get('next_cursor'))
+
+    def test_problems_are_detected(self):
+        scan = explain_queryset(Part.objects.filter(description__icontains='heavy').order_by())
+        sort = explain_queryset(Part.objects.filter(weight_ounces=22).order_by('description'))
+        self.assertTrue(plan_problems(scan))
+        self.assertTrue(plan_problems(sort))
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTestCase(TestCase):
+    '''
+    Tests for the responses cache
+    '''
+    def setUp(self):
+        response_cache().clear()
+        metrics.reset()
+        return super().setUp()
+
+    def test_cached_list(self):
+        url = '/api/parts?page_size=2'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(metrics.data()['cache'], {'hit': 1, 'miss': 1})
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.client.get('/api/parts?page_size=1&page=1')
+        res = self.client.get('/api/parts?page=1&page_size=1')
+        self.assertEqual(res['X-Cache'], 'HIT')
+        res = self.client.get('/api/parts?page=2&page_size=1')
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_the_catalog(self):
+        url = '/api/parts/param=name/value=Gadget'
+        self.assertEqual(self.client.get(url).json(), [])
+        self.client.post('/api/part/new', data=json.dumps({
+            'name': 'Gadget', 'sku': get_a_random_sku(), 'description': 'A gadget', 'weight_ounces': 1, 'is_active': 1
+        }), content_type='application/json')
+        res = self.client.get(url)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json().get('items')), 1)
+
+    def test_writes_invalidate_the_part_only(self):
+        sku = PartsRequestsTestCase.SKU_SAMPLE
+        other = Part.objects.exclude(sku=sku).first()
+        self.client.get('/api/part/sku=' + sku)
+        self.client.get('/api/part/sku=' + other.sku)
+        part = Part.objects.get(sku=sku)
+        self.client.put('/api/part/sku=' + sku, data=json.dumps({
+            'name': part.name, 'sku': sku, 'description': 'A cached description', 'weight_ounces': 5, 'is_active': 1
+        }), content_type='application/json')
+        res = self.client.get('/api/part/sku=' + sku)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json().get('description'), 'A cached description')
+        self.assertEqual(self.client.get('/api/part/sku=' + other.sku)['X-Cache'], 'HIT')
+
+        self.client.delete('/api/part/sku=' + sku)
+        self.assertEqual(self.client.get('/api/part/sku=' + sku).status_code, 404)
+
+    def test_generations_are_not_culled_with_the_responses(self):
+        generation = catalog_generation()
+        part_generation = sku_generation(PartsRequestsTestCase.SKU_SAMPLE)
+        for i in range(0, 20):
+            response_cache().set('filler-{i}'.format(i=i), i)
+        response_cache().clear()
+        self.assertEqual(catalog_generation(), generation)
+        self.assertEqual(sku_generation(PartsRequestsTestCase.SKU_SAMPLE), part_generation)
+
+@override_settings(COUNT_CACHE_ENABLED=True)
+class CountCacheTestCase(TestCase):
+    '''
+    Tests for the cached counts of the pages (?count=exact|estimate|none)
+    '''
+    def setUp(self):
+        response_cache().clear()
+        return super().setUp()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            result = self.client.get(url).json()
+        return result, len([q for q in context.captured_queries if 'COUNT(' in q['sql']])
+
+    def create_part(self, name):
+        Part.objects.create(name=name, sku=get_a_random_sku(), description='A counted part', weight_ounces=1)
+
+    def test_exact_count_is_cached_by_filter(self):
+        result, counts = self.count_queries('/api/parts?page_size=2')
+        self.assertEqual(counts, 1)
+        self.assertEqual(result['pages'], -(-Part.objects.count() // 2))
+        _, counts = self.count_queries('/api/parts?page_size=2&page=2')
+        self.assertEqual(counts, 0)
+        _, counts = self.count_queries('/api/parts/param=name/value=Macrochip')
+        self.assertEqual(counts, 1)
+
+    async def test_async_count_shares_the_cache(self):
+        queryset = Part.objects.filter(name='Macrochip')
+        expected = await queryset.acount()
+        self.assertEqual(await acached_count(queryset, 'param:name=Macrochip'), expected)
+        await sync_to_async(self.create_part)('Macrochip')
+        self.assertEqual(await sync_to_async(cached_count)(queryset, 'param:name=Macrochip', COUNT_ESTIMATE), expected)
+        self.assertEqual(await acached_count(queryset, 'param:name=Macrochip'), expected + 1)
+
+    def test_writes_invalidate_the_exact_count(self):
+        url = '/api/parts/param=name/value=Counted part'
+        self.assertEqual(self.client.get(url).json(), [])
+        self.create_part('Counted part')
+        self.assertEqual(self.client.get(url + '?page_size=1').json()['pages'], 1)
+        self.create_part('Counted part')
+        self.assertEqual(self.client.get(url + '?page_size=1').json()['pages'], 2)
+
+    def test_estimate_count(self):
+        url = '/api/parts/param=name/value=Counted part?page_size=1'
+        self.create_part('Counted part')
+        self.assertEqual(self.client.get(url).json()['pages'], 1)
+        self.create_part('Counted part')
+        result, counts = self.count_queries(url + '&count=estimate')
+        self.assertEqual((result['pages'], counts), (1, 0)) # the last count
+        self.assertEqual(self.client.get(url + '&count=exact').json()['pages'], 2)
+
+    def test_no_count(self):
+        result, counts = self.count_queries('/api/parts?page_size=2&count=none')
+        self.assertEqual(counts, 0)
+        self.assertEqual(result['pages'], None)
+        self.assertEqual(len(result['items']), 2)
+        self.assertEqual(result['next_page'], '/api/parts?page=2&page_size=2&count=none')
+        last_page = -(-Part.objects.count() // 2)
+        result = self.client.get('/api/parts?page_size=2&count=none&page={page}'.format(page=last_page)).json()
+        self.assertEqual(result['next_page'], '')
+        result, counts = self.count_queries('/api/parts/search?q=heavy&count=none')
+        self.assertEqual(counts, 0)
+
+    def test_invalid_count(self):
+        for url in ['/api/parts?count=all', '/api/parts/search?q=heavy&count=1', '/api/parts/param=name/value=A?count=x']:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+class ConditionalGetTestCase(TestCase):
+    '''
+    Tests for the conditional GET (ETag/Last-Modified)
+    '''
+    def test_part_not_modified(self):
+        url = '/api/part/sku=' + PartsRequestsTestCase.SKU_SAMPLE
+        res = self.client.get(url)
+        self.assertTrue(res.has_header('ETag'))
+        self.assertTrue(res.has_header('Last-Modified'))
+        with self.assertNumQueries(1): # only the version of the part is read
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+
+    def test_part_modified(self):
+        url = '/api/part/sku=' + PartsRequestsTestCase.SKU_SAMPLE
+        etag = self.client.get(url)['ETag']
+        part = Part.objects.get(sku=PartsRequestsTestCase.SKU_SAMPLE)
+        part.weight_ounces = 3
+        part.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        last_modified = res['Last-Modified']
+        part.updated_at = timezone.now() + timedelta(seconds=5)
+        part.save()
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, 200)
+
+    def test_list_not_modified(self):
+        url = '/api/parts?page_size=2'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        Part.objects.create(name='Etag part', sku=get_a_random_sku(), description='')
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+class SerializerTestCase(TestCase):
+    '''
+    Tests for the rows serializer (it must have the same output of Part.to_dict + JsonResponse)
+    '''
+    def setUp(self):
+        Part.objects.create(name='Ünïcode "quoted" \\ part', sku=get_a_random_sku(), description='Line\nbreak\ttab', weight_ounces=0)
+        part = Part.objects.create(name='Updated part', sku=get_a_random_sku(), description='', weight_ounces=12)
+        part.updated_at = timezone.now()
+        part.save()
+        return super().setUp()
+
+    def assertSameOutput(self):
+        queryset = Part.objects.all()
+        expected = JsonResponse([p.to_dict() for p in queryset], safe=False).content
+        self.assertEqual(encode_rows(part_rows(queryset)).encode(), expected)
+
+    def test_same_output(self):
+        self.assertSameOutput()
+
+    @override_settings(FORMAT_DATETIME='%d/%m/%Y %H:%M')
+    def test_same_output_other_datetime_format(self):
+        self.assertSameOutput()
+
+    def test_same_page_output(self):
+        queryset = Part.objects.all()
+        data = {'items': None, 'pages': 1, 'current_page': 1, 'next_page': '/api/parts?page=2&fields=ñame', 'previous_page': ''}
+        expected = json.dumps(dict(data, items=[p.to_dict() for p in queryset]))
+        self.assertEqual(encode_object(data, {'items': encode_rows(part_rows(queryset))}), expected)
+
+    def test_same_response(self):
+        url = '/api/parts/param=name/value=Updated part'
+        data = self.client.get(url).json()
+        expected = [Part.objects.get(name='Updated part').to_dict()]
+        self.assertEqual(data.get('items'), expected)
+        res = self.client.get('/api/part/sku=' + expected[0]['sku'])
+        self.assertEqual(res.content, JsonResponse(expected[0]).content)
+
+    def test_bench_serialization(self):
+        out = StringIO()
+        call_command('bench_serialization', rows=50, repeat=1, stdout=out)
+        self.assertIn('same output: True', out.getvalue())
+
+class SparseFieldsTestCase(TestCase):
+    '''
+    Tests for the sparse fieldsets (?fields=)
+    '''
+    FIELDS = 'sku,name,weight_ounces'
+
+    def assertOnlyFields(self, url, items_key='items'):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        result = res.json()
+        items = result.get(items_key) if items_key else [result]
+        if isinstance(items, dict):
+            items = list(items.values())
+        self.assertTrue(items)
+        for item in items:
+            self.assertEqual(sorted(item.keys()), ['name', 'sku', 'weight_ounces'])
+        for query in context.captured_queries:
+            self.assertNotIn('"core_part"."description"', query['sql'].split(' FROM ')[0])
+        return result
+
+    def test_fields_on_the_endpoints(self):
+        fields = SparseFieldsTestCase.FIELDS
+        self.assertOnlyFields('/api/parts?fields=' + fields)
+        self.assertOnlyFields('/api/parts?cursor=&fields=' + fields)
+        self.assertOnlyFields('/api/parts/param=name/value=Macrochip?fields=' + fields)
+        self.assertOnlyFields('/api/parts/search?q=heavy&fields=' + fields)
+        self.assertOnlyFields('/api/part/sku=OWDD823011DJSD?fields=' + fields, items_key=None)
+        self.assertOnlyFields('/api/parts/skus=OWDD823011DJSD,SDJDDH8223DHJ?fields=' + fields, items_key='parts')
+
+    def test_fields_are_kept_on_the_links(self):
+        result = self.client.get('/api/parts?page_size=1&fields=' + SparseFieldsTestCase.FIELDS).json()
+        self.assertEqual(result.get('next_page'), '/api/parts?page=2&page_size=1&fields=' + SparseFieldsTestCase.FIELDS)
+
+    def test_invalid_fields(self):
+        for url in ['/api/parts?fields=sku,password', '/api/part/sku=OWDD823011DJSD?fields=', '/api/parts/skus=A?fields=_state']:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+@override_settings(ROOT_URLCONF='parts_unlimited.urls_async')
+class AsyncViewsTestCase(TestCase):
+    '''
+    Tests for the async mode (core.async_views)
+    '''
+    READ_URLS = [
+        '/api/parts',
+        '/api/parts?page=2&page_size=3&fields=sku,name',
+        '/api/parts?cursor=',
+        '/api/part/sku=OWDD823011DJSD',
+        '/api/parts/param=name/value=Macrochip',
+        '/api/parts/param=description/value=heavy',
+        '/api/parts/search?q=heavy',
+        '/api/parts/mostcommonwords',
+        '/api/part/sku=OWDD823011DJSD/mostcommonwords',
+    ]
+
+    def test_same_responses_of_the_sync_views(self):
+        for url in AsyncViewsTestCase.READ_URLS:
+            res = self.client.get(url)
+            with self.settings(ROOT_URLCONF='parts_unlimited.urls'):
+                expected = self.client.get(url)
+            self.assertEqual(res.status_code, expected.status_code, url)
+            self.assertEqual(res.content, expected.content, url)
+
+    async def test_errors(self):
+        self.assertEqual((await self.async_client.get('/api/part/sku=NOSUCHSKU')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/parts?fields=password')).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/parts/param=sku2/value=X')).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/parts/param=weight_ounces/value=abc')).status_code, 400)
+
+    async def test_conditional_get(self):
+        res = await self.async_client.get('/api/part/sku=OWDD823011DJSD')
+        self.assertTrue(res.has_header('ETag'))
+        res = await self.async_client.get('/api/part/sku=OWDD823011DJSD', headers={'If-None-Match': res['ETag']})
+        self.assertEqual(res.status_code, 304)
+
+    async def test_write_endpoints(self):
+        sku = get_a_random_sku()
+        data = {'name': 'Async part', 'sku': sku, 'description': 'An async written part', 'weight_ounces': 3, 'is_active': 1}
+        res = await self.async_client.post('/api/part/new', data, content_type='application/json')
+        self.assertEqual(res.json().get('sku'), sku)
+        res = await self.async_client.post('/api/part/new', data, content_type='application/json')
+        self.assertEqual(res.json().get('field'), 'sku')
+
+        data['name'] = 'Async part updated'
+        res = await self.async_client.put('/api/part/sku=' + sku, data, content_type='application/json')
+        self.assertEqual(res.json().get('name'), 'Async part updated')
+        self.assertTrue(await WordFrequency.objects.filter(word='async').aexists())
+
+        res = await self.async_client.delete('/api/part/sku=' + sku)
+        self.assertEqual(res.json().get('sku'), sku)
+        self.assertFalse(await Part.objects.filter(sku=sku).aexists())
+
+    async def test_export_streams_from_an_async_generator(self):
+        for export_format in EXPORT_FORMATS:
+            res = await self.async_client.get('/api/parts/export?format=' + export_format)
+            self.assertEqual(res.status_code, 200)
+            self.assertTrue(res.is_async)
+            content = b''.join([block async for block in res.streaming_content]).decode()
+            expected = await sync_to_async(lambda: ''.join(export_stream(Part.objects.all(), export_format)))()
+            self.assertEqual(content, expected)
+        res = await self.async_client.get('/api/parts/export?format=xml')
+        self.assertEqual(res.status_code, 400)
+
+    def test_sync_paths_are_kept(self):
+        self.assertEqual(self.client.get('/api/parts/skus=OWDD823011DJSD').status_code, 200)
+        self.assertEqual(self.client.get('/api/parts/facets').status_code, 200)
+
+class LoadGeneratorTestCase(TestCase):
+    '''
+    Tests for the keep-alive load generator (core.loadgen)
+    '''
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_keep_alive_clients(self):
+        connections = []
+
+        async def handle(reader, writer):
+            connections.append(writer)
+            while await reader.readline():
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+                await writer.drain()
+            writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await run_load('http://127.0.0.1:{port}'.format(port=port), ['/api/parts'], clients=50, requests=4)
+
+        result = asyncio.run(scenario())
+        self.assertEqual(result['connected'], 50)
+        self.assertEqual(len(connections), 50)
+        self.assertEqual(result['requests'], 200)
+        self.assertEqual(result['statuses'], {200: 200})
+        self.assertEqual(result['errors'], 0)
+
+    def test_open_loop_mix(self):
+        received = []
+
+        async def handle(reader, writer):
+            # answers each request and closes the connection after the writes (as a sync worker)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode().split(' ')
+                length = 0
+                while (header := await reader.readline()) not in (b'\r\n', b''):
+                    if header.lower().startswith(b'content-length'):
+                        length = int(header.split(b':')[1])
+                body = await reader.readexactly(length)
+                received.append((method, path, body))
+                if method == 'GET':
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+                else:
+                    writer.write(b'HTTP/1.1 500 Internal Server Error\r\nConnection: close\r\nContent-Length: 0\r\n\r\n')
+                await writer.drain()
+                if method != 'GET':
+                    break
+            writer.close()
+
+        async def scenario():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                requests = request_mix(parse_mix('read=1,write=1'), size=100)
+                return await run_open_loop('http://127.0.0.1:{port}'.format(port=port), requests, rate=200, duration=0.5)
+
+        result = asyncio.run(scenario())
+        self.assertEqual(result['total']['requests'], 100)
+        self.assertEqual(len(received), 100)
+        self.assertEqual(result['read']['errors'], 0)
+        self.assertEqual(result['write']['errors'], result['write']['requests'])
+        self.assertEqual(result['total']['statuses'], {'200': result['read']['requests'], '500': result['write']['requests']})
+        self.assertTrue(all(body for method, _, body in received if method in ('POST', 'PUT')))
+        self.assertTrue(result['total']['p50_ms'] <= result['total']['p99_ms'] <= result['total']['p999_ms'])
+
+    def test_invalid_mix(self):
+        self.assertEqual(parse_mix('read=70,search=20,write=10'), {'read': 70, 'search': 20, 'write': 10})
+        for mix in ('read=70,delete=30', 'read=x', 'read=0'):
+            with self.assertRaises(ValueError):
+                parse_mix(mix)
+
+    def test_count_locked_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '2024-01-01.log'), 'w') as _file:
+                _file.write(
+                    'ERROR:root:Traceback (most recent call last):\n'
+                    'sqlite3.OperationalError: database is locked\n'
+                    'django.db.utils.OperationalError: database is locked\n'
+                    'database is locked\n'
+                    'ERROR:root:Traceback (most recent call last):\n'
+                    'ValueError: other\n'
+                    'ERROR:root:Traceback (most recent call last):\n'
+                    'django.db.utils.OperationalError: database is locked\n'
+                )
+            self.assertEqual(count_locked_errors(directory), 2)
+
+class SqliteTuningTestCase(TestCase):
+    '''
+    Tests for the SQLite tuning profile (settings.SQLITE_PRAGMAS)
+    '''
+    def test_pragmas_of_the_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], django.conf.settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2) # memory
+
+    def test_invalid_pragmas(self):
+        with self.assertRaises(ValueError):
+            pragma_statements({'journal_mode': 'wal; DROP TABLE core_part'})
+        with self.assertRaises(ValueError):
+            pragma_statements({'writable_schema': 1})
+
+    def read_while_writing(self, pragmas):
+        '''
+        A writer holds its transaction (with more changes than its page cache) while a reader
+        (on another thread and connection, without busy timeout) reads the table
+        Returns the rows read or the error
+        '''
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'parts.sqlite3')
+        writer = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for statement in pragma_statements(pragmas):
+            writer.execute(statement)
+        writer.execute('CREATE TABLE part (id INTEGER PRIMARY KEY, name TEXT)')
+        writer.execute("INSERT INTO part (name) VALUES ('committed')")
+        writer.execute('PRAGMA cache_size = 1')
+        writer.execute('BEGIN')
+        writer.executemany('INSERT INTO part (name) VALUES (?)', [('x' * 500,)] * 2000)
+
+        result = {}
+        def read():
+            reader = sqlite3.connect(path, timeout=0)
+            try:
+                result['rows'] = reader.execute('SELECT count(*) FROM part').fetchone()[0]
+            except sqlite3.OperationalError as _exception:
+                result['error'] = str(_exception)
+            reader.close()
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        writer.execute('COMMIT')
+        writer.close()
+        return result
+
+    def test_readers_are_not_blocked_by_writers(self):
+        result = self.read_while_writing({'journal_mode': 'delete'})
+        self.assertIn('locked', result.get('error', ''))
+        result = self.read_while_writing(django.conf.settings.SQLITE_PRAGMAS)
+        self.assertEqual(result, {'rows': 1}) # the committed rows only
+
+class GroupCommitTestCase(TransactionTestCase):
+    '''
+    Tests for the group commit writer (core.writer); the writer thread has its own connection,
+    so the writes are really committed
+    '''
+    serialized_rollback = True
+
+    def part_data(self, **data):
+        return dict({'name': 'Batched part', 'sku': get_a_random_sku(), 'description': 'A batched part',
+                     'weight_ounces': 1, 'is_active': 1}, **data)
+
+    def submit_all(self, writer, items):
+        results = [None] * len(items)
+        def submit(index):
+            try:
+                results[index] = writer.submit(create_part, items[index])
+            except Exception as _exception:
+                results[index] = _exception
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(len(items))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_writes_are_batched(self):
+        writer = GroupCommitWriter(window=0.2, max_size=100)
+        items = [self.part_data() for _ in range(10)]
+        batches = WRITER_STATS['batches']
+        results = self.submit_all(writer, items)
+        self.assertEqual([r.get('sku') for r in results], [i['sku'] for i in items])
+        self.assertLess(WRITER_STATS['batches'] - batches, 10)
+        self.assertEqual(Part.objects.filter(sku__in=[i['sku'] for i in items]).count(), 10)
+
+    def test_errors_are_returned_to_their_callers(self):
+        writer = GroupCommitWriter(window=0.2, max_size=100)
+        items = [self.part_data(), self.part_data(name=''), self.part_data()]
+        items.append(dict(items[0]))
+        results = self.submit_all(writer, items)
+        self.assertEqual(results[0].get('sku'), items[0]['sku'])
+        self.assertEqual(str(results[1]), 'Name can not be empty')
+        self.assertEqual(results[2].get('sku'), items[2]['sku'])
+        self.assertEqual(results[3].get('field'), 'sku')
+        self.assertFalse(Part.objects.filter(sku=items[1]['sku']).exists())
+        self.assertEqual(Part.objects.filter(sku__in=[items[0]['sku'], items[2]['sku']]).count(), 2)
+
+    def test_a_failed_batch_does_not_stop_the_writer(self):
+        writer = GroupCommitWriter(window=0.01, max_size=100)
+        with mock.patch('core.writer.close_old_connections', side_effect=OperationalError('disk I/O error')):
+            with self.assertRaises(OperationalError):
+                writer.submit(create_part, self.part_data())
+        data = self.part_data()
+        self.assertEqual(writer.submit(create_part, data).get('sku'), data['sku'])
+
+    def test_callers_do_not_wait_forever(self):
+        writer = GroupCommitWriter(window=0.01, max_size=100, timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            writer.submit(time.sleep, 0.3)
+
+    async def test_async_callers_do_not_wait_forever(self):
+        writer = GroupCommitWriter(window=0.01, max_size=100, timeout=0.05)
+        with self.assertRaises(asyncio.TimeoutError):
+            await writer.asubmit(time.sleep, 0.3)
+        # the write was not cancelled: the writer sets its result and goes on
+        writer.timeout = 5
+        self.assertIsNone(await writer.asubmit(time.sleep, 0))
+        self.assertTrue(writer.thread.is_alive())
+
+    @override_settings(WRITE_COALESCING=True, ROOT_URLCONF='parts_unlimited.urls_async')
+    async def test_async_writes_are_coalesced(self):
+        data = self.part_data()
+        writes = WRITER_STATS['writes']
+        res = await self.async_client.post('/api/part/new', data, content_type='application/json')
+        self.assertEqual(res.json().get('sku'), data['sku'])
+        res = await self.async_client.delete('/api/part/sku=' + data['sku'])
+        self.assertEqual(res.json(), {'message': 'Part deleted', 'sku': data['sku']})
+        self.assertEqual(WRITER_STATS['writes'] - writes, 2)
+
+    @override_settings(WRITE_COALESCING=True)
+    def test_same_api_responses(self):
+        data = self.part_data()
+        res = self.client.post('/api/part/new', data, content_type='application/json')
+        self.assertEqual(res.json().get('sku'), data['sku'])
+        res = self.client.post('/api/part/new', data, content_type='application/json')
+        self.assertEqual(res.json(), {'error': 'Part sku already exists', 'field': 'sku'})
+        res = self.client.post('/api/part/new', self.part_data(weight_ounces=-1), content_type='application/json')
+        self.assertEqual(res.json().get('field'), 'weight_ounces')
+        data['name'] = 'Batched part updated'
+        res = self.client.put('/api/part/sku=' + data['sku'], data, content_type='application/json')
+        self.assertEqual(res.json().get('name'), 'Batched part updated')
+        res = self.client.delete('/api/part/sku=' + data['sku'])
+        self.assertEqual(res.json(), {'message': 'Part deleted', 'sku': data['sku']})
+
+class MetricsTestCase(TestCase):
+    '''
+    Tests for the request metrics (/api/metrics)
+    '''
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.reset()
+        return super().setUp()
+
+    def metric(self, text, line_start):
+        values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_start)]
+        self.assertEqual(len(values), 1, line_start)
+        return float(values[0])
+
+    def test_metrics_by_route(self):
+        self.client.get('/api/part/sku=OWDD823011DJSD')
+        res = self.client.get('/api/part/sku=SDJDDH8223DHJ')
+        self.client.get('/api/part/sku=NOSUCHSKU')
+        text = self.client.get('/api/metrics').content.decode()
+
+        route = 'route="/api/part/sku={sku}",method="GET"'
+        self.assertEqual(self.metric(text, 'http_requests_total{' + route + ',status="200"}'), 2)
+        self.assertEqual(self.metric(text, 'http_requests_total{' + route + ',status="404"}'), 1)
+        self.assertEqual(self.metric(text, 'http_request_duration_seconds_count{' + route + '}'), 3)
+        self.assertEqual(self.metric(text, 'http_request_duration_seconds_bucket{' + route + ',le="+Inf"}'), 3)
+        self.assertGreaterEqual(self.metric(text, 'db_queries_total{' + route + '}'), 3)
+        self.assertGreater(self.metric(text, 'http_response_bytes_total{' + route + '}'), len(res.content))
+        self.assertNotIn('OWDD823011DJSD', text)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+
+    def test_metrics_of_all_the_processes(self):
+        self.client.get('/api/parts')
+        other_process = {
+            'requests': {'/api/parts\tGET\t200': 4},
+            'durations': {'/api/parts\tGET': [4] + [0] * 11 + [0.01]},
+            'response_bytes': {'/api/parts\tGET': 100},
+            'queries': {'/api/parts\tGET': 8},
+            'query_seconds': {'/api/parts\tGET': 0.002},
+            'cache': {'hit': 3, 'miss': 1},
+        }
+        with open(os.path.join(self.directory, '1-other.json'), 'w') as _file:
+            json.dump(other_process, _file)
+        text = self.client.get('/api/metrics').content.decode()
+        route = 'route="/api/parts",method="GET"'
+        self.assertEqual(self.metric(text, 'http_requests_total{' + route + ',status="200"}'), 5)
+        self.assertEqual(self.metric(text, 'http_request_duration_seconds_count{' + route + '}'), 5)
+        self.assertGreaterEqual(self.metric(text, 'http_request_duration_seconds_bucket{' + route + ',le="0.005"}'), 4)
+        self.assertGreaterEqual(self.metric(text, 'response_cache_lookups_total{result="hit"}'), 3)
+
+    def test_files_of_the_processes_gone_are_removed(self):
+        self.client.get('/api/parts')
+        path = os.path.join(self.directory, '1-gone.json')
+        with open(path, 'w') as _file:
+            json.dump({'requests': {'/api/parts\tGET\t200': 4}}, _file)
+        old = time.time() - settings.METRICS_FILE_TIMEOUT - 1
+        os.utime(path, (old, old))
+        text = self.client.get('/api/metrics').content.decode()
+        self.assertEqual(self.metric(text, 'http_requests_total{route="/api/parts",method="GET",status="200"}'), 1)
+        self.assertFalse(os.path.exists(path))
+
+        own = os.path.join(self.directory, metrics.filename)
+        os.utime(own, (old, old))
+        metrics.flush()
+        self.assertGreater(os.path.getmtime(own), old)
+
+    def test_streaming_responses(self):
+        res = self.client.get('/api/parts/export?format=ndjson')
+        size = len(b''.join(res.streaming_content))
+        res.close()
+        text = self.client.get('/api/metrics').content.decode()
+        route = 'route="/api/parts/export",method="GET"'
+        self.assertEqual(self.metric(text, 'http_response_bytes_total{' + route + '}'), size)
+        self.assertGreaterEqual(self.metric(text, 'db_queries_total{' + route + '}'), 1)
+        self.assertEqual(self.metric(text, 'http_requests_total{' + route + ',status="200"}'), 1)
+
+    @override_settings(ROOT_URLCONF='parts_unlimited.urls_async')
+    async def test_async_streaming_responses(self):
+        res = await self.async_client.get('/api/parts/export?format=csv')
+        size = len(b''.join([block async for block in res.streaming_content]))
+        data = await sync_to_async(collect_metrics)()
+        key = '/api/parts/export\tGET'
+        self.assertEqual(data['response_bytes'][key], size)
+        self.assertGreaterEqual(data['queries'][key], 1)
+
+class SlowQueryLogTestCase(TestCase):
+    '''
+    Tests for the slow query log (core.slowlog); with a 0ms threshold every query is logged
+    '''
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'slow_queries.log')
+        override = override_settings(SLOW_QUERY_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(stop_slow_query_logger)
+        stop_slow_query_logger()
+        return super().setUp()
+
+    def test_slow_queries_are_logged(self):
+        self.client.get('/api/parts/param=name/value=Macrochip')
+        stop_slow_query_logger() # writes the pending records
+        entries = [e for e in read_slow_queries(self.path) if e['view'] == 'parts_by_parameters']
+        self.assertTrue(entries)
+        entry = entries[-1]
+        self.assertEqual(entry['path'], '/api/parts/param=name/value=Macrochip')
+        self.assertIn('Macrochip', entry['params'])
+        self.assertTrue(entry['plan'])
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+
+    def test_executemany_is_logged_with_its_first_params(self):
+        sql = 'UPDATE core_part SET weight_ounces = %s WHERE sku = %s'
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(5, 'OWDD823011DJSD'), (6, 'SDJDDH8223DHJ')])
+            cursor.executemany(sql, ((w, 'OWDD823011DJSD') for w in (7, 8)))
+        stop_slow_query_logger()
+        entries = [e for e in read_slow_queries(self.path) if e['sql'] == sql]
+        self.assertEqual([(e['params'], e.get('rows')) for e in entries], [([5, 'OWDD823011DJSD'], 2), ([7, 'OWDD823011DJSD'], None)])
+        self.assertIn('SEARCH core_part USING INDEX', ' '.join(entries[0]['plan']))
+        self.assertEqual(Part.objects.get(sku='OWDD823011DJSD').weight_ounces, 8) # the generator was not consumed
+
+    def test_threshold(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=60000):
+            self.client.get('/api/parts')
+        stop_slow_query_logger()
+        self.assertFalse(os.path.exists(self.path) and list(read_slow_queries(self.path)))
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'x''y' AND b IN (%s, %s, %s) AND c > 10"),
+            fingerprint("SELECT *  FROM t WHERE a = 'z' AND b IN (%s) AND c > 2"),
+        )
+
+    def test_summary_command(self):
+        for value in ['Macrochip', 'Heavy coil', 'Macrochip']:
+            self.client.get('/api/parts/param=name/value=' + value)
+        stop_slow_query_logger()
+        out = StringIO()
+        call_command('slow_queries', file=self.path, limit=3, stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 queries', output) # the same fingerprint for the 3 values
+        self.assertIn('views: parts_by_parameters', output)
+        self.assertIn('SEARCH core_part USING INDEX', output)
+
+class BenchmarkTestCase(TestCase):
+    '''
+    Tests for the benchmark command and the deterministic catalogs (core.seed)
+    '''
+    def test_deterministic_catalog(self):
+        first = list(generate_parts(25, seed=7))
+        self.assertEqual(first, list(generate_parts(25, seed=7)))
+        self.assertEqual(first[10:], list(generate_parts(25, seed=7, start=10)))
+        self.assertEqual(first, list(generate_parts(25, seed=7, jobs=2)))
+        self.assertNotEqual(first, list(generate_parts(25, seed=8)))
+        self.assertEqual(len({row[1] for row in generate_parts(BLOCK_SIZE + 5)}), BLOCK_SIZE + 5)
+
+    def test_seeded_count_uses_the_sku_index(self):
+        plan = explain(SEEDED_COUNT_SQL, list(SKU_RANGE))
+        self.assertEqual(plan_problems(plan), [])
+        self.assertIn('sqlite_autoindex_core_part_1', plan[0])
+        Part.objects.create(name='Not seeded', sku='pu-lowercase', description='A part')
+        seed_catalog(5)
+        self.assertEqual(seeded_count(), 5)
+
+    def test_seed_catalog(self):
+        self.assertEqual(seed_catalog(30), 30)
+        self.assertEqual(seed_catalog(40), 10)
+        self.assertEqual(seed_catalog(20), 0)
+        self.assertEqual(Part.objects.filter(sku__startswith='PU').count(), 40)
+        word = WordFrequency.objects.order_by('-count').first()
+        self.assertTrue(word.count > 0)
+
+    def test_seed_parts_command(self):
+        def schema():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT type, name FROM sqlite_master WHERE tbl_name = 'core_part' ORDER BY name")
+                return cursor.fetchall()
+
+        before = schema()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        call_command('seed_parts', count=50, batch_size=20, jobs=1, stdout=StringIO())
+        self.assertEqual(Part.objects.filter(sku__startswith='PU').count(), 50)
+        self.assertEqual(schema(), before)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], synchronous)
+
+        # the full-text index was rebuilt and its triggers work again
+        name = generate_block(0)[0][0]
+        response = self.client.get('/api/parts/search?q=' + name.split()[-1])
+        self.assertTrue(json.loads(response.content)['items'])
+        Part.objects.create(name='Bulk load zymurgic part', sku='SEED-NEW', description='Zymurgic', weight_ounces=1)
+        response = self.client.get('/api/parts/search?q=zymurgic')
+        self.assertEqual([item['sku'] for item in json.loads(response.content)['items']], ['SEED-NEW'])
+
+        out = StringIO()
+        call_command('seed_parts', count=40, stdout=out)
+        self.assertIn('already has 50', out.getvalue())
+
+    def test_benchmark_command(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, 'results.json')
+        call_command('benchmark', sizes='30', repeat=2, in_place=True, output=output, stdout=StringIO())
+        with open(output) as _file:
+            results = json.load(_file)['results']['30']
+        for case in ['list', 'deep_page', 'search_name', 'search_sku', 'search_weight_ounces', 'search_description',
+                     'sku_get', 'create', 'update', 'delete', 'most_common_words', 'part_most_common_words']:
+            self.assertEqual(results[case]['status'], 200, case)
+            self.assertIn('p95_ms', results[case])
+            self.assertIn('peak_kb', results[case])
+        self.assertFalse(Part.objects.filter(sku__startswith='BENCH-').exists())
+
+        out = StringIO()
+        call_command('benchmark', sizes='30', repeat=2, in_place=True, case=['list'], baseline=output, tolerance=1000, stdout=out)
+        self.assertIn('No regressions', out.getvalue())
+
+class ImportTestCase(TestCase):
+    '''
+    Tests for the import_parts command (core.imports)
+    '''
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_file(self, name:str, content:str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as _file:
+            _file.write(content)
+        return path
+
+    def test_import_ndjson(self):
+        Part.objects.create(name='Existent part', sku='IMP-1', description='Old description', weight_ounces=1)
+        lines = [
+            json.dumps({'name': 'Existent part', 'sku': 'IMP-1', 'description': 'New description', 'weight_ounces': 1, 'is_active': 1}),
+            json.dumps({'name': 'New part', 'sku': 'IMP-2', 'description': 'A new part', 'weight_ounces': 3, 'is_active': 1}),
+            '{not json',
+            json.dumps({'name': '', 'sku': 'IMP-3', 'description': 'No name', 'weight_ounces': 3, 'is_active': 1}),
+            json.dumps({'name': 'Bad weight', 'sku': 'IMP-4', 'description': 'x', 'weight_ounces': 'heavy', 'is_active': 1}),
+        ]
+        path = self.write_file('parts.ndjson', '\n'.join(lines) + '\n')
+        out = StringIO()
+        call_command('import_parts', path, batch_size=2, stdout=out)
+        self.assertIn('1 created, 1 updated, 0 unchanged, 3 rejected', out.getvalue())
+        self.assertEqual(Part.objects.get(sku='IMP-1').description, 'New description')
+        self.assertTrue(Part.objects.filter(sku='IMP-2').exists())
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+        with open(path + '.errors.ndjson') as _file:
+            errors = [json.loads(line) for line in _file]
+        self.assertEqual([e['field'] for e in errors], ['', 'name', 'weight_ounces'])
+        self.assertEqual(errors[0]['record'], '{not json')
+        self.assertEqual(errors[1]['record']['sku'], 'IMP-3')
+
+    def test_import_the_export(self):
+        Part.objects.all().delete()
+        Part.objects.create(name='Exported part', sku='EXP-1', description='Line one,\n"line" two', weight_ounces=4)
+        response = self.client.get('/api/parts/export?format=csv')
+        content = b''.join(response.streaming_content).decode()
+        Part.objects.all().delete()
+        path = self.write_file('parts.csv', content)
+        call_command('import_parts', path, stdout=StringIO())
+        part = Part.objects.get(sku='EXP-1')
+        self.assertEqual(part.description, 'Line one,\n"line" two')
+        self.assertEqual(part.weight_ounces, 4)
+
+        out = StringIO()
+        call_command('import_parts', path, stdout=out)
+        self.assertIn('0 created, 0 updated, 1 unchanged', out.getvalue())
+
+    def test_resume_from_checkpoint(self):
+        lines = [
+            json.dumps({'name': 'Part {i}'.format(i=i), 'sku': 'RES-{i}'.format(i=i), 'description': 'Resumed', 'weight_ounces': i, 'is_active': 1})
+            for i in range(7)
+        ]
+        path = self.write_file('parts.jsonl', '\n'.join(lines) + '\n')
+        checkpoint = Checkpoint(path + '.checkpoint', path)
+
+        def crash(checkpoint):
+            raise KeyboardInterrupt()
+        with open(path + '.errors.ndjson', 'w') as errors_file:
+            with self.assertRaises(KeyboardInterrupt):
+                import_file(path, checkpoint, errors_file, batch_size=3, progress=crash)
+        self.assertEqual(Part.objects.filter(sku__startswith='RES-').count(), 3)
+
+        out = StringIO()
+        call_command('import_parts', path, batch_size=3, stdout=out)
+        self.assertIn('Resuming at byte', out.getvalue())
+        self.assertIn('7 created, 0 updated', out.getvalue())
+        self.assertEqual(Part.objects.filter(sku__startswith='RES-').count(), 7)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+        # a checkpoint of another file (or of a changed file) is not used
+        Checkpoint(path + '.checkpoint', self.write_file('other.ndjson', lines[0] + '\n')).save()
+        with self.assertRaises(CommandError):
+            call_command('import_parts', path, stdout=StringIO())
+        call_command('import_parts', path, restart=True, stdout=StringIO())
+
+    def test_invalid_format(self):
+        with self.assertRaises(CommandError):
+            call_command('import_parts', self.write_file('parts.xml', '<parts/>'), stdout=StringIO())
+
+class FacetsTestCase(TestCase):
+    '''
+    Tests for the facets endpoint (core.facets)
+    '''
+    def setUp(self):
+        Part.objects.all().delete()
+        for sku, weight, is_active, created_at in [
+            ('FAC-1', 3, 1, '2024-01-01 10:00:00'),
+            ('FAC-2', 12, 1, '2024-01-01 23:59:59'),
+            ('FAC-3', 12, 0, '2024-01-02 00:00:00'),
+            ('FAC-4', 60, 1, '2024-02-10 08:00:00'),
+        ]:
+            Part.objects.create(
+                name='Facet part', sku=sku, description='A heavy part' if weight > 10 else 'A light part',
+                weight_ounces=weight, is_active=is_active,
+                created_at=datetime.fromisoformat(created_at + '+00:00')
+            )
+        return super().setUp()
+
+    def test_facets(self):
+        data = self.client.get('/api/parts/facets?weight_buckets=0,10,50').json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['is_active'], {'0': 1, '1': 3})
+        self.assertEqual(data['weight_ounces'], [
+            {'from': 0, 'to': 10, 'count': 1},
+            {'from': 10, 'to': 50, 'count': 2},
+            {'from': 50, 'to': None, 'count': 1},
+        ])
+        self.assertEqual(data['created_at'], [
+            {'date': '2024-01-01', 'count': 2},
+            {'date': '2024-01-02', 'count': 1},
+            {'date': '2024-02-10', 'count': 1},
+        ])
+        data = self.client.get('/api/parts/facets?created=month').json()
+        self.assertEqual(data['created_at'], [{'date': '2024-01', 'count': 3}, {'date': '2024-02', 'count': 1}])
+        self.assertEqual(sum(bucket['count'] for bucket in data['weight_ounces']), 4)
+
+    def test_filtered_facets(self):
+        data = self.client.get('/api/parts/facets?param=weight_ounces&value=12').json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['is_active'], {'0': 1, '1': 1})
+        data = self.client.get('/api/parts/facets?q=heavy&created=year').json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['created_at'], [{'date': '2024', 'count': 3}])
+
+    def test_invalid_facets(self):
+        for url in [
+            '/api/parts/facets?weight_buckets=10,5',
+            '/api/parts/facets?weight_buckets=a,b',
+            '/api/parts/facets?created=week',
+            '/api/parts/facets?param=color&value=red',
+            '/api/parts/facets?q=*',
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+class FilterTestCase(TestCase):
+    '''
+    Tests for the multi-predicate filters (core.filters)
+    '''
+    def setUp(self):
+        Part.objects.all().delete()
+        for name, sku, weight, is_active, created_at in [
+            ('Heavy coil', 'FIL-1', 22, 1, '2024-01-01 10:00:00'),
+            ('Heavy plate', 'FIL-2', 40, 1, '2024-01-02 00:00:00'),
+            ('Heavy rod', 'FIL-3', 12, 0, '2024-01-03 12:00:00'),
+            ('Light chip', 'FLT-4', 2, 1, '2024-02-10 08:00:00'),
+        ]:
+            Part.objects.create(
+                name=name, sku=sku, description='A filtered part', weight_ounces=weight, is_active=is_active,
+                created_at=datetime.fromisoformat(created_at + '+00:00')
+            )
+        return super().setUp()
+
+    def skus(self, url):
+        return [item['sku'] for item in self.client.get(url).json()['items']]
+
+    def test_filters(self):
+        self.assertEqual(self.skus('/api/parts/filter?name__prefix=Heavy&is_active=1'), ['FIL-1', 'FIL-2'])
+        self.assertEqual(self.skus('/api/parts/filter?weight_ounces__gte=12&weight_ounces__lt=40'), ['FIL-3', 'FIL-1'])
+        self.assertEqual(self.skus('/api/parts/filter?sku__prefix=FIL-&weight_ounces=40'), ['FIL-2'])
+        self.assertEqual(self.skus('/api/parts/filter?created_at__gte=2024-01-02&created_at__lt=2024-02-01'), ['FIL-2', 'FIL-3'])
+        self.assertEqual(self.skus('/api/parts/filter?created_at__gt=2024-01-01T10:00:00'), ['FIL-2', 'FIL-3', 'FLT-4'])
+        self.assertEqual(self.skus('/api/parts/filter?name__prefix=heavy'), [])
+
+    def test_order_and_pages(self):
+        self.assertEqual(self.skus('/api/parts/filter?order_by=-weight_ounces'), ['FIL-2', 'FIL-1', 'FIL-3', 'FLT-4'])
+        self.assertEqual(self.skus('/api/parts/filter?is_active=1&order_by=-created_at'), ['FLT-4', 'FIL-2', 'FIL-1'])
+        data = self.client.get('/api/parts/filter?is_active=1&order_by=weight_ounces&page_size=2').json()
+        self.assertEqual(data['pages'], 2)
+        self.assertEqual(self.skus(data['next_page']), ['FIL-2'])
+        data = self.client.get('/api/parts/filter?sku__prefix=FIL-&order_by=sku&page_size=2&cursor=').json()
+        self.assertEqual([item['sku'] for item in data['items']], ['FIL-1', 'FIL-2'])
+        data = self.client.get('/api/parts/filter?sku__prefix=FIL-&order_by=sku&page_size=2&cursor=' + data['next_cursor']).json()
+        self.assertEqual([item['sku'] for item in data['items']], ['FIL-3'])
+
+    def test_cursor_pages_with_nulls(self):
+        # FIL-1 and FLT-4 are never updated (NULL), FIL-2 and FIL-3 have the same updated_at
+        updated_at = datetime.fromisoformat('2024-03-01 10:00:00+00:00')
+        Part.objects.filter(sku__in=['FIL-2', 'FIL-3']).update(updated_at=updated_at)
+        Part.objects.create(name='Heavy bar', sku='FIL-5', description='A filtered part', weight_ounces=5,
+                            updated_at=updated_at - timedelta(days=1))
+        for order_by in ('updated_at', '-updated_at'):
+            expected = [p.sku for p in Part.objects.order_by(*ORDER_BY[order_by], 'id')]
+            url = '/api/parts/filter?order_by=' + order_by + '&page_size=2&cursor='
+            pages = [self.client.get(url).json()]
+            while pages[-1]['next_cursor']:
+                res = self.client.get(url + pages[-1]['next_cursor'])
+                self.assertEqual(res.status_code, 200, order_by)
+                pages.append(res.json())
+            self.assertEqual([item['sku'] for page in pages for item in page['items']], expected, order_by)
+
+            previous = []
+            page = pages[-1]
+            while page['prev_cursor']:
+                page = self.client.get(url + page['prev_cursor']).json()
+                previous = [item['sku'] for item in page['items']] + previous
+            self.assertEqual(previous, expected[:-len(pages[-1]['items'])], order_by)
+
+    def test_orders_read_the_index_of_the_filters(self):
+        for query in ['', 'is_active=1', 'weight_ounces__gte=10&weight_ounces__lte=30', 'weight_ounces=22',
+                      'name__prefix=Heavy', 'sku__prefix=FIL-', 'created_at__gte=2024-01-02', 'updated_at__lt=2024-01-02',
+                      'is_active=1&weight_ounces__gte=10', 'weight_ounces=22&name__prefix=Heavy']:
+            indexed = indexed_orders(parse_filters(dict(parse_qsl(query))))
+            for order_by in ORDER_BY:
+                url = '/api/parts/filter?' + query + '&order_by=' + order_by + '&cursor='
+                with CaptureQueriesContext(connection) as context:
+                    res = self.client.get(url)
+                if order_by not in indexed:
+                    self.assertEqual(res.status_code, 400, url)
+                    self.assertTrue(res.content.startswith(b'The order is not indexed for the filters'), url)
+                    continue
+                self.assertEqual(res.status_code, 200, url)
+                plan = explain(context.captured_queries[-1]['sql'])
+                self.assertEqual(plan_problems(plan), [], url)
+                if query and query != 'is_active=1':
+                    self.assertTrue(plan[0].startswith('SEARCH'), url)
+
+        self.assertEqual(self.client.get('/api/parts/filter?weight_ounces__gte=10&order_by=name').status_code, 400)
+        self.assertEqual(self.client.get('/api/parts/filter?created_at__gte=2024-01-02&order_by=weight_ounces').status_code, 400)
+        self.assertEqual(self.client.get('/api/parts/filter?weight_ounces=22&order_by=-name').status_code, 200)
+
+    def test_single_query(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/parts/filter?is_active=1&weight_ounces__gte=10&name__prefix=Heavy&count=none')
+        parts_queries = [query for query in context.captured_queries if 'core_part' in query['sql']]
+        self.assertEqual(len(parts_queries), 1)
+
+    def test_invalid_filters(self):
+        for url in [
+            '/api/parts/filter?description=heavy',
+            '/api/parts/filter?weight_ounces__in=1,2',
+            '/api/parts/filter?name__icontains=heavy',
+            '/api/parts/filter?weight_ounces__gte=heavy',
+            '/api/parts/filter?created_at__gte=yesterday',
+            '/api/parts/filter?name__prefix=',
+            '/api/parts/filter?order_by=description',
+            '/api/parts/filter?fields=color',
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 400, url)
@@ -7,7 +7,24 @@ from ninja import NinjaAPI
 from ninja import Schema
 
 from core.models import Part
-from core.paging import paginate_items
+from core.search import SearchResult, fts_query, match_ids, search_queryset, parameter_search
+from core.cache import cached_response
+from core.conditional import conditional_part, conditional_catalog
+from core.serializers import part_rows, row_encoder, encode_object, parse_fields
+from core.export import export_stream
+from core.bulk import create_parts, upsert_parts, parts_by_skus
+from core.writer import write
+from core.metrics import collect as collect_metrics, render as render_metrics
+from core.facets import facets, weight_edges, created_interval, CREATED_INTERVALS
+from core.filters import parse_filters, filter_queryset, filter_choices, filter_index, indexed_orders, order_by_fields, ORDER_BY
+from core.responses import (
+    error_response, invalid_search_response, invalid_fields_response,
+    invalid_cursor_response, invalid_list_params_response, invalid_words_params_response, invalid_export_format_response, no_words_response,
+    page_data, cursor_data, json_response, search_page_response, export_response, common_words, words_params, part_words_response,
+)
+
+from typing import List
+from urllib.parse import quote, urlencode
 
 import json
 import sys
@@ -18,9 +35,9 @@ logging.basicConfig(
     filename = settings.LOG_FILENAME
 )
 
-MIN_SIZE_WORD = 3
-WORDS_MOST_COMMON_LIMIT = 5
-PAGE_SIZE = 10
+# the params of /api/parts/filter that are not filters
+FILTER_RESERVED_PARAMS = ('order_by', 'page', 'page_size', 'cursor', 'fields', 'count')
+
 class PartSchema(Schema):
     name: str
     sku: str
@@ -28,6 +45,9 @@ class PartSchema(Schema):
     weight_ounces: int
     is_active: int
 
+class SkusSchema(Schema):
+    skus: List[str]
+
 api = NinjaAPI(
     openapi_extra={
         'info': {
@@ -47,30 +67,39 @@ def existent_part(sku):
     '''
     return Part.objects.filter(sku=sku).count() > 0
 
-
 @api.get('/parts')
-def parts(request, page=1):
-    data = {}
+@conditional_catalog
+@cached_response()
+def parts(request, page=1, page_size:int = None, cursor:str = None, fields:str = None, count:str = None):
     parts = Part.objects.all()
-    parts_collection = [
-        p.to_dict() for p in parts    
-    ]
-    items, pages = paginate_items(parts_collection, page_size=PAGE_SIZE)
-    data['items'] = items.get(page)
-    data['pages'] = pages
-    data['current_page'] = page
-    data['next_page'] = '/api/parts?page=' + str(page+1) if page < pages else ''
-    data['previous_page'] = '/api/parts?page=' + str(page-1) if page > 1 else ''
-    response = JsonResponse(data, safe=False)    
+    invalid = invalid_list_params_response(fields, count)
+    if invalid:
+        return invalid
+
+    if cursor is not None:
+        try:
+            data, _fields = cursor_data(parts, cursor, page_size, fields)
+        except ValueError:
+            return invalid_cursor_response()
+        return json_response(data, _fields)
+
+    data, _, _fields = page_data(parts, '/api/parts', page, page_size, fields, count, count_key='parts')
+    response = json_response(data, _fields)
     return response
 
 @api.get('/part/sku={sku}')
-def parts_by_sku(request, sku):
+@conditional_part
+@cached_response(sku_arg='sku')
+def parts_by_sku(request, sku, fields:str = None):
     response = HttpResponse()
     try:
-        part = Part.objects.get(sku=sku)
-        data = part.to_dict()
-        response = JsonResponse(data, safe=False)
+        _fields = parse_fields(fields)
+        row = part_rows(Part.objects.filter(sku=sku), _fields).first()
+        if row is None:
+            raise Part.DoesNotExist()
+        response = HttpResponse(row_encoder(_fields)(row), content_type='application/json')
+    except ValueError:
+        response = invalid_fields_response()
     except Part.DoesNotExist:
         response.status_code = 404
     except Exception as _exception:
@@ -80,43 +109,252 @@ def parts_by_sku(request, sku):
     
     return response
 
+def skus_data(skus, fields=None):
+    '''
+    Returns the parts found by a list of skus and the skus not found
+    Raises ValueError if the fields are not valid
+    '''
+    _fields = parse_fields(fields)
+    found = parts_by_skus(skus, rows=True, fields=_fields)
+    encode = row_encoder(_fields)
+    parts = encode_object(dict.fromkeys(found), {sku: encode(row) for sku, row in found.items()})
+    data = {
+        'parts': None,
+        'not_found': [sku for sku in dict.fromkeys(skus) if sku not in found]
+    }
+    return encode_object(data, {'parts': parts})
+
+@api.get('/parts/skus={skus}')
+@conditional_catalog
+@cached_response()
+def parts_by_skus_list(request, skus, fields:str = None):
+    '''
+    Returns the parts of a comma separated list of skus
+    '''
+    response = HttpResponse()
+    try:
+        skus = [sku for sku in skus.split(',') if sku]
+        response = HttpResponse(skus_data(skus, fields), content_type='application/json')
+    except ValueError:
+        response = invalid_fields_response()
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.post('/parts/skus')
+def parts_by_skus_body(request, data: SkusSchema, fields:str = None):
+    '''
+    Returns the parts of a list of skus sent in the request's body (for long lists)
+    '''
+    response = HttpResponse()
+    try:
+        response = HttpResponse(skus_data(data.skus, fields), content_type='application/json')
+    except ValueError:
+        response = invalid_fields_response()
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
 @api.get('/parts/param={param}/value={value}')
-def parts_by_parameters(request, param, value, page=1):
+@conditional_catalog
+@cached_response()
+def parts_by_parameters(request, param, value, page=1, page_size:int = None, cursor:str = None, fields:str = None, count:str = None):
     response = HttpResponse()
-    args = dict()
     data = {}
+    url = '/api/parts/param={param}/value={value}'.format(param=param, value=value)
     try:
-        if param not in Part.SEARCH_FIELDS:
-            response = HttpResponse()
+        invalid = invalid_search_response(param, value)
+        if invalid:
+            return invalid
+        parts = parameter_search(param, value, cursor)
+        invalid = invalid_list_params_response(fields, count)
+        if invalid:
+            return invalid
+
+        if cursor is not None:
+            try:
+                data, _fields = cursor_data(parts, cursor, page_size, fields)
+            except ValueError:
+                return invalid_cursor_response()
+            return json_response(data, _fields)
+
+        count_key = 'param:{param}={value}'.format(param=param, value=value)
+        data, total, _fields = page_data(parts, url, page, page_size, fields, count, count_key)
+        return search_page_response(data, total, _fields)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response        
+
+@api.get('/parts/search')
+@conditional_catalog
+@cached_response()
+def search_parts(request, q:str, page=1, page_size:int = None, fields:str = None, count:str = None):
+    '''
+    Full-text search on the parts names and descriptions, ordered by relevance
+    Supports "phrase queries" and prefix* queries
+    '''
+    response = HttpResponse()
+    try:
+        expression = fts_query(q)
+        if not expression:
+            return no_words_response()
+        invalid = invalid_list_params_response(fields, count)
+        if invalid:
+            return invalid
+
+        url = '/api/parts/search?q=' + quote(q)
+        data, _, _fields = page_data(SearchResult(expression), url, page, page_size, fields, count, 'search:' + q)
+        response = json_response(data, _fields)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.get('/parts/filter')
+@conditional_catalog
+@cached_response()
+def filter_parts(request, order_by:str = None, page=1, page_size:int = None, cursor:str = None, fields:str = None, count:str = None):
+    '''
+    Returns the parts matching all the filters of the query string (eg.: ?is_active=1&weight_ounces__gte=10&name__prefix=Heavy)
+    in one query read through the index of the ordering; the fields and lookups are the ones of core.filters.FILTER_LOOKUPS
+    '''
+    response = HttpResponse()
+    try:
+        params = {key: value for key, value in request.GET.items() if key not in FILTER_RESERVED_PARAMS}
+        try:
+            args = parse_filters(params)
+        except KeyError:
+            response.status_code = 400
+            response.content = 'The filter is not valid. The coiches are: {filters}'.format(filters=filter_choices())
+            return response
+        except ValueError as _exception:
+            response.status_code = 400
+            response.content = 'The value of {key} is not valid'.format(key=_exception)
+            return response
+        try:
+            ordering = order_by_fields(order_by, args)
+        except ValueError:
+            response.status_code = 400
+            response.content = 'The order is not valid. The coiches are: {orders}'.format(orders=', '.join(ORDER_BY))
+            return response
+        try:
+            index = filter_index(order_by, args)
+        except ValueError:
             response.status_code = 400
-            response.content = 'The parameter is not a search field. The coiches are: {fields}' .format(
-                fields = ', '.join(Part.SEARCH_FIELDS)
+            response.content = 'The order is not indexed for the filters. The coiches are: {orders}'.format(
+                orders=', '.join(indexed_orders(args))
             )
             return response
-        if param == 'description':
-            param = param + '__icontains'
-        
-        args[param] = value        
-        parts = Part.objects.filter(**args)
-        if not parts:
-            data = []
-            response = JsonResponse(data, safe=False)
+        invalid = invalid_list_params_response(fields, count)
+        if invalid:
+            return invalid
+
+        parts = filter_queryset(Part.objects.all(), args, index).order_by(*ordering)
+        if cursor is not None:
+            try:
+                data, _fields = cursor_data(parts, cursor, page_size, fields)
+            except ValueError:
+                return invalid_cursor_response()
+            return json_response(data, _fields)
+
+        query = urlencode(sorted(params.items()))
+        url_query = urlencode(sorted(params.items()) + ([('order_by', order_by)] if order_by else []))
+        url = '/api/parts/filter' + ('?' + url_query if url_query else '')
+        data, _, _fields = page_data(parts, url, page, page_size, fields, count, 'filter:' + query)
+        response = json_response(data, _fields)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.get('/parts/facets')
+@conditional_catalog
+@cached_response()
+def parts_facets(request, param:str = None, value:str = None, q:str = None, weight_buckets:str = None, created:str = None):
+    '''
+    Counts of the parts by is_active, by weight bucket (weight_buckets: the comma separated edges)
+    and by creation date (created: day, month or year)
+    The parts can be filtered as in the search by param/value or by a full-text query (q)
+    '''
+    response = HttpResponse()
+    try:
+        invalid = invalid_search_response(param, value)
+        if invalid:
+            return invalid
+        parts = search_queryset(param, value)
+        if q is not None:
+            expression = fts_query(q)
+            if not expression:
+                return no_words_response()
+            parts = parts.filter(id__in=match_ids(expression))
+        try:
+            edges = weight_edges(weight_buckets)
+        except ValueError:
+            response.status_code = 400
+            response.content = 'The weight buckets are not valid. Eg.: 0,10,20,50 (ascending weights)'
             return response
-        
-        parts_collection = [p.to_dict() for p in parts]
-        items, pages = paginate_items(parts_collection, page_size=PAGE_SIZE)
-        data['items'] = items.get(page)
-        data['pages'] = pages
-        data['current_page'] = page
-        data['next_page'] = ('/api/parts/param={param}/value={value}?page=' + str(page+1) if page < pages else '').format(param=param, value=value)
-        data['previous_page'] = ('/api/parts/param={param}/value={value}?page=' + str(page-1) if page > 1 else '').format(param=param, value=value)
-        response = JsonResponse(data, safe=False)
-        return response
+        try:
+            interval = created_interval(created)
+        except ValueError:
+            response.status_code = 400
+            response.content = 'The created interval is not valid. The coiches are: {intervals}'.format(
+                intervals = ', '.join(CREATED_INTERVALS)
+            )
+            return response
+
+        response = JsonResponse(data=facets(parts, edges, interval))
     except Exception as _exception:
         trace = traceback.format_exc()
         logging.error(trace + '\n' + str(_exception))
         response.status_code = 500
-    return response        
+    return response
+
+@api.get('/parts/export')
+def export_parts(request, format:str = 'ndjson', param:str = None, value:str = None):
+    '''
+    Streams the whole catalog (or the parts found by param/value) as NDJSON or CSV
+    '''
+    invalid = invalid_export_format_response(format)
+    if invalid:
+        return invalid
+    invalid = invalid_search_response(param, value)
+    if invalid:
+        return invalid
+    parts = search_queryset(param, value)
+    return export_response(export_stream(parts, format), format)
+
+def create_part(data):
+    '''
+    Creates a part; returns the part or the error (as dict)
+    The mutations are run by core.writer.write (they may be batched with other requests' mutations)
+    '''
+    if existent_part(data.get('sku')):
+        return {'error': 'Part sku already exists', 'field': 'sku'}
+    return Part.objects.create(**data).to_dict()
+
+def update_part_by_sku(sku, data):
+    part = Part.objects.filter(sku=sku).first()
+    if not part:
+        return {'error': 'Part sku does not exists', 'field': 'sku'}
+    part.__dict__.update(data)
+    part.updated_at = timezone.now()
+    part.save()
+    return part.to_dict()
+
+def delete_part_by_sku(sku):
+    part = Part.objects.filter(sku=sku).first()
+    if not part:
+        return {'error': 'Part sku does not exists', 'field': 'sku'}
+    part.delete()
+    return {'message':'Part deleted', 'sku': sku}
 
 @api.post('/part/new')
 def new_part(request, part: PartSchema):
@@ -128,132 +366,107 @@ def new_part(request, part: PartSchema):
             return response
         
         data = json.loads(request.body)    
-        response = JsonResponse(data = {'error': 'Part sku already exists', 'field': 'sku'})
-        if not existent_part(data.get('sku')):
-            new_part = Part.objects.create(**data)
-            response = JsonResponse(
-                data=new_part.to_dict(),
-                safe=False
-            )
+        response = JsonResponse(
+            data=write(create_part, data),
+            safe=False
+        )
     except Exception as _exception:
         trace = traceback.format_exc()
         logging.error(trace + '\n' + str(_exception))
-        _error = str(_exception).lower()
-        error_dict = {
-            'error': _error,
-            'field': ''
-        }
-        if ('name' not in _error) \
-            and ('weight_ounces' not in _error) \
-            and ('description' not in _error) \
-            and ('sku' not in _error):
-            response = HttpResponse()
-            response.status_code = 500
-            response.text = 'An exception has occured'
-        else:
-            if 'name' in _error:
-                error_dict['field'] = 'name'
-            elif 'weight_ounces' in _error:
-                error_dict['field'] = 'weight_ounces'
-            elif 'description' in _error:
-                error_dict['field'] = 'description'
-            elif 'sku' in _error:
-                error_dict['field'] = 'sku'
-            response = JsonResponse(data=error_dict, safe=False)
+        response = error_response(_exception)
     return response    
     
+@api.post('/parts/bulk')
+def new_parts(request, parts: List[PartSchema]):
+    '''
+    Creates a list of parts in a single transaction
+    The invalid items are reported by index and are not created
+    '''
+    response = HttpResponse()
+    try:
+        created, errors = create_parts([p.dict() for p in parts])
+        response = JsonResponse(data={'created': len(created), 'errors': errors}, safe=False)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
+@api.put('/parts/bulk')
+def upsert_parts_by_sku(request, parts: List[PartSchema]):
+    '''
+    Creates or updates (by sku) a list of parts
+    The unchanged parts are not written
+    '''
+    response = HttpResponse()
+    try:
+        counts, errors = upsert_parts([p.dict() for p in parts])
+        response = JsonResponse(data=dict(counts, errors=errors), safe=False)
+    except Exception as _exception:
+        trace = traceback.format_exc()
+        logging.error(trace + '\n' + str(_exception))
+        response.status_code = 500
+    return response
+
 @api.put('/part/sku={sku}')
 def update_part(request, sku, part:PartSchema):
     response = HttpResponse()
     try:
         data = json.loads(request.body)    
-        response = JsonResponse(data={'error': 'Part sku does not exists', 'field': 'sku'})
-        if not existent_part(sku):
-            return response
-        
-        part = Part.objects.filter(sku=sku).first()
-        part.__dict__.update(data)
-        part.updated_at = timezone.now()
-        part.save()
-        response = JsonResponse(data=part.to_dict(), safe=False)
+        response = JsonResponse(data=write(update_part_by_sku, sku, data), safe=False)
     
     except Exception as _exception:
         trace = traceback.format_exc()
         logging.error(trace + '\n' + str(_exception))
-        _error = str(_exception).lower()
-        error_dict = {
-            'error': _error,
-            'field': ''
-        }
-        if ('name' not in _error) \
-            and ('weight_ounces' not in _error) \
-            and ('description' not in _error) \
-            and ('sku' not in _error):
-            response = HttpResponse()
-            response.status_code = 500
-            response.text = 'An exception has occured'
-        else:
-            if 'name' in _error:
-                error_dict['field'] = 'name'
-            elif 'weight_ounces' in _error:
-                error_dict['field'] = 'weight_ounces'
-            elif 'description' in _error:
-                error_dict['field'] = 'description'
-            elif 'sku' in _error:
-                error_dict['field'] = 'sku'
-            response = JsonResponse(data=error_dict, safe=False)
+        response = error_response(_exception)
     return response
 
 @api.delete('/part/sku={sku}')
 def delete_part(request, sku):
     response = HttpResponse()
     try:
-        response = JsonResponse(data={'error': 'Part sku does not exists', 'field': 'sku'})
-        if not existent_part(sku):
-            return response
-        
-        part = Part.objects.filter(sku=sku).first()        
-        part.delete()
-        response = JsonResponse(data={'message':'Part deleted', 'sku': sku})
+        response = JsonResponse(data=write(delete_part_by_sku, sku))
     
     except Exception as _exception:
         trace = traceback.format_exc()
         logging.error(trace + '\n' + str(_exception))
     return response
 
+@api.get('/metrics')
+def metrics(request):
+    '''
+    Latency, SQL queries, response bytes and status codes by route (of all the workers), in the Prometheus text format
+    '''
+    return HttpResponse(render_metrics(collect_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @api.get('/parts/mostcommonwords')
-def most_common_words(request):
+@conditional_catalog
+@cached_response()
+def most_common_words(request, min_size:str = None, limit:str = None):
     '''
     Return the most common words in all parts
+    The words are counted by the WordFrequency table (kept updated by the parts writes)
     '''
-    descriptions = ''.join(Part.objects.all().values_list('description', flat=True))
-    res = dict()
-    for d in descriptions.split(' '):
-        if d not in res and len(d) > MIN_SIZE_WORD:
-            res[d] = descriptions.count(d)
-    sorted_items = sorted(res.items(), key=lambda x : x[1], reverse=True)
+    try:
+        min_size, limit = words_params(min_size, limit)
+    except ValueError:
+        return invalid_words_params_response()
     res = {}
-    for k, v in sorted_items[0:WORDS_MOST_COMMON_LIMIT]:
+    for k, v in common_words(min_size, limit):
         res[k] = v
     response = JsonResponse(data=res)
     return response
 
 @api.get('part/sku={sku}/mostcommonwords')
-def most_commom_words_by_part(request, sku):
+@conditional_part
+@cached_response(sku_arg='sku')
+def most_commom_words_by_part(request, sku, min_size:str = None, limit:str = None):
     '''
     Return the most common words in a especific part description
     '''
+    try:
+        min_size, limit = words_params(min_size, limit)
+    except ValueError:
+        return invalid_words_params_response()
     part = Part.objects.filter(sku=sku).first()
-    if not part:
-        response = JsonResponse(data={})
-        return response
-    res = {}
-    for d in part.description.split(' '):
-        if d not in res and len(d) > MIN_SIZE_WORD:
-            res[d] = part.description.count(d)
-    sorted_res = sorted(res.items(), key=lambda x: x[1], reverse=True)
-    res = {}
-    for k, v in sorted_res[0:WORDS_MOST_COMMON_LIMIT]:
-        res[k] = v
-    response = JsonResponse(data={'part_sku': sku, 'most_common_words': res })
-    return response    
+    return part_words_response(part, sku, min_size, limit)
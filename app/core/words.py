@@ -0,0 +1,49 @@
+from django.db import connection
+
+from collections import Counter
+
+WORDS_TABLE = 'core_wordfrequency'
+PUNCTUATION = '.,;:!?()[]{}"\''
+
+def tokenize(text:str) -> list:
+    '''
+    Returns the words of a text (split by blanks, without the surrounding punctuation)
+    '''
+    if not text:
+        return []
+    words = [w.strip(PUNCTUATION) for w in text.split()]
+    return [w for w in words if w]
+
+def word_counts(texts) -> Counter:
+    '''
+    Returns the word counts of a list of texts
+    '''
+    counts = Counter()
+    for text in texts:
+        counts.update(tokenize(text))
+    return counts
+
+def update_word_counts(old_texts, new_texts):
+    '''
+    Updates the word frequency table with the difference between the old and the new texts
+    (eg.: the descriptions before and after a write)
+    Only the changed words are written; the words without occurrences are removed
+    '''
+    diff = word_counts(new_texts)
+    diff.subtract(word_counts(old_texts))
+    changes = [(word, len(word), count) for word, count in diff.items() if count]
+    if not changes:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO ' + WORDS_TABLE + ' (word, length, count) VALUES (%s, %s, %s) '
+            'ON CONFLICT(word) DO UPDATE SET count = count + excluded.count',
+            changes
+        )
+        removed = [word for word, _, count in changes if count < 0]
+        if removed:
+            cursor.execute(
+                'DELETE FROM ' + WORDS_TABLE + ' WHERE count <= 0 AND word IN (' + ', '.join(['%s'] * len(removed)) + ')',
+                removed
+            )
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from asgiref.sync import sync_to_async
+
+from core.cache import deferred_invalidation
+
+from collections import Counter
+from concurrent.futures import Future
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+WRITE_BATCH_WINDOW = getattr(settings, 'WRITE_BATCH_WINDOW', 0.005) # seconds
+WRITE_BATCH_SIZE = getattr(settings, 'WRITE_BATCH_SIZE', 100)
+WRITE_TIMEOUT = getattr(settings, 'WRITE_TIMEOUT', 30) # seconds a caller waits for its write
+
+# batches and writes committed by the writer of this process
+WRITER_STATS = Counter()
+
+class GroupCommitWriter:
+    '''
+    Single writer of a process: the submitted mutations are run by one thread,
+    batched in one transaction (one commit) within a time window or a size limit
+    Each mutation runs in its own savepoint, so an error rolls back that mutation only
+    and is raised to its caller; the results are returned after the commit
+    '''
+    def __init__(self, window:float = WRITE_BATCH_WINDOW, max_size:int = WRITE_BATCH_SIZE, timeout:float = WRITE_TIMEOUT):
+        self.window = window
+        self.max_size = max_size
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def start(self):
+        with self.lock:
+            # a forked worker (eg.: gunicorn --preload) starts its own thread
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='group-commit-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        '''
+        Runs function(*args, **kwargs) in the next batch and returns its result (or raises its exception)
+        Raises TimeoutError if the write is not done in timeout seconds (it may still be committed later)
+        '''
+        self.start()
+        future = Future()
+        self.queue.put((function, args, kwargs, future))
+        return future.result(timeout=self.timeout)
+
+    async def asubmit(self, function, *args, **kwargs):
+        '''
+        The async version of submit: the caller's event loop goes on while the write is waited (no thread)
+        '''
+        self.start()
+        future = Future()
+        self.queue.put((function, args, kwargs, future))
+        # shielded: a timeout must not cancel the future, the writer still sets its result
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+
+    def next_batch(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def commit(self, batch:list):
+        results = []
+        try:
+            close_old_connections()
+            # the cached responses are invalidated once by batch, after the commit
+            with deferred_invalidation(), transaction.atomic():
+                for function, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, function(*args, **kwargs), None))
+                    except Exception as _exception:
+                        results.append((future, None, _exception))
+        except Exception as _exception:
+            # the commit (or the connection) has failed: no mutation of the batch was written
+            for _, _, _, future in batch:
+                future.set_exception(_exception)
+            return
+
+        WRITER_STATS['batches'] += 1
+        WRITER_STATS['writes'] += len(batch)
+        for future, result, _exception in results:
+            if _exception is not None:
+                future.set_exception(_exception)
+            else:
+                future.set_result(result)
+
+    def run(self):
+        while True:
+            self.commit(self.next_batch())
+
+writer = GroupCommitWriter()
+
+def write(function, *args, **kwargs):
+    '''
+    Runs a mutation: by the group commit writer if settings.WRITE_COALESCING is on,
+    otherwise directly
+    '''
+    if not getattr(settings, 'WRITE_COALESCING', False):
+        return function(*args, **kwargs)
+    return writer.submit(function, *args, **kwargs)
+
+async def awrite(function, *args, **kwargs):
+    '''
+    The async version of write: the write is waited without a thread when it is run by the group commit writer;
+    otherwise the mutation (sync ORM code in a transaction) is run in a thread
+    '''
+    if not getattr(settings, 'WRITE_COALESCING', False):
+        return await sync_to_async(function)(*args, **kwargs)
+    return await writer.asubmit(function, *args, **kwargs)
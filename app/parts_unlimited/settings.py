@@ -14,6 +14,7 @@ from datetime import datetime
 from pathlib import Path
 import os
 import sys
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +57,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'parts_unlimited.urls'
+# The API mode: 'sync' (WSGI workers) or 'async' (async views, served by an ASGI server)
+# See deploy/supervisord.asgi.conf
+API_MODE = os.environ.get('API_MODE', 'sync')
+
+ROOT_URLCONF = 'parts_unlimited.urls_async' if API_MODE == 'async' else 'parts_unlimited.urls'
 
 TEMPLATES = [
     {
@@ -82,10 +88,37 @@ WSGI_APPLICATION = 'parts_unlimited.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # persistent connections (seconds; 0 closes the connection at the end of each request)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# SQLite tuning profile
+# The pragmas are set on every new connection (see core.db.set_sqlite_pragmas)
+# WAL lets the readers go on while a writer is working; busy_timeout makes the writers wait
+# for the lock instead of failing with "database is locked"
+# DB_PROFILE=default keeps the SQLite defaults (rollback journal, no busy timeout)
+DB_PROFILE = os.environ.get('DB_PROFILE', 'production')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)), # ms
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)), # bytes
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)), # negative: KiB
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'memory'),
+} if DB_PROFILE == 'production' else {}
+
+# Group commit: the part's writes (new, update, delete) of a process are batched
+# in one transaction by a single writer thread (see core/writer.py)
+# Only useful with workers serving concurrent requests (gthread or uvicorn workers): a sync worker has one write by batch
+WRITE_COALESCING = os.environ.get('WRITE_COALESCING', '0') == '1'
+WRITE_BATCH_WINDOW = float(os.environ.get('WRITE_BATCH_WINDOW', 0.005)) # seconds
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', 100))
+WRITE_TIMEOUT = float(os.environ.get('WRITE_TIMEOUT', 30)) # seconds
+
 if 'test' in sys.argv:    
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -93,6 +126,55 @@ if 'test' in sys.argv:
     }
 
 
+# Cache
+# The file based cache is shared by all the gunicorn workers
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# When the responses cache is full, 1/CULL_FREQUENCY of its entries (random ones) are removed.
+# The generations of the catalog and of the parts (core/cache.py) are in their own cache, sized for the catalog:
+# they are never culled with the responses (a lost generation would drop all the responses cached under it)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 50000)),
+            'CULL_FREQUENCY': int(os.environ.get('CACHE_CULL_FREQUENCY', 4)),
+        },
+    },
+    'generations': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('GENERATION_CACHE_LOCATION', os.path.join(BASE_DIR, '_cache', 'generations')),
+        'OPTIONS': {
+            # one generation by part read since its last write, and the catalog's
+            'MAX_ENTRIES': int(os.environ.get('GENERATION_CACHE_MAX_ENTRIES', 2000000)),
+        },
+    },
+}
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+
+# The counts of the lists and searches (for the pages) are cached by filter (see core/counts.py)
+# The clients can choose the count by request: ?count=exact|estimate|none
+COUNT_CACHE_ENABLED = os.environ.get('COUNT_CACHE_ENABLED', '1') == '1'
+COUNT_MODE_DEFAULT = os.environ.get('COUNT_MODE_DEFAULT', 'exact')
+COUNT_ESTIMATE_TIMEOUT = int(os.environ.get('COUNT_ESTIMATE_TIMEOUT', 300))
+
+if 'test' in sys.argv:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+    CACHES['generations'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'generations',
+    }
+    # enabled by the cache tests only (the cache is not rolled back with the database)
+    RESPONSE_CACHE_ENABLED = False
+    COUNT_CACHE_ENABLED = False
+
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -138,6 +220,25 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FORMAT_DATE = '%Y-%m-%d'
 FORMAT_DATETIME = '%Y-%m-%d %H:%M:%S'
-LOG_PATH = os.path.join(BASE_DIR, '_logs')
+LOG_PATH = os.environ.get('LOG_PATH', os.path.join(BASE_DIR, '_logs'))
 LOG_FILENAME = LOG_PATH + '/' + datetime.now().strftime(FORMAT_DATE) + '.log'
 PAGE_SIZE_DEFAULT = 10
+
+# Metrics (see core/metrics.py and /api/metrics)
+# Each process writes its metrics at METRICS_DIR (every METRICS_FLUSH_INTERVAL seconds); the endpoint sums them
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, '_metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+# the files not written (or touched) for METRICS_FILE_TIMEOUT seconds are of processes that are gone: they are removed
+METRICS_FILE_TIMEOUT = float(os.environ.get('METRICS_FILE_TIMEOUT', 60.0))
+if 'test' in sys.argv:
+    METRICS_DIR = os.path.join(tempfile.gettempdir(), 'parts_unlimited_metrics_test')
+
+# Slow query log (see core/slowlog.py): the queries slower than SLOW_QUERY_THRESHOLD_MS
+# are written (with the view, the params and the EXPLAIN QUERY PLAN) as JSON lines at SLOW_QUERY_LOG
+# The worst queries can be listed with: python manage.py slow_queries
+SLOW_QUERY_ENABLED = os.environ.get('SLOW_QUERY_ENABLED', '1') == '1'
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join(LOG_PATH, 'slow_queries.log'))
+if 'test' in sys.argv:
+    SLOW_QUERY_ENABLED = False
@@ -0,0 +1,13 @@
+"""parts_unlimited URL Configuration of the async mode (settings.API_MODE = 'async')
+
+The async API is matched first; the paths it does not declare
+(docs, bulk, skus, filter, facets) are served by the sync API
+"""
+from django.urls import path
+
+from core.async_views import api as async_api
+from parts_unlimited.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', async_api.urls),
+] + sync_urlpatterns